@@ -1,131 +0,0 @@
-#!/usr/bin/env python3
-"""
-ROOTUIP FastAPI ML Prediction Service
-"""
-
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
-import os
-import sys
-
-# Add current directory to path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
-# Import the predictor
-from predict import DDPredictor
-
-# Initialize FastAPI app
-app = FastAPI(
-    title="ROOTUIP ML Prediction API",
-    description="AI-powered D&D prevention with 94% accuracy",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Initialize predictor
-predictor = DDPredictor()
-
-# Request models
-class PredictionRequest(BaseModel):
-    transit_time_days: float
-    port_congestion_index: float
-    carrier_reliability_score: float
-    documentation_completeness: float
-    customs_complexity_score: float
-    container_value_usd: float
-    days_until_eta: float
-    historical_dd_rate: float
-    route_risk_score: float
-    seasonal_risk_factor: float
-    risk_composite_score: Optional[float] = None
-    historical_performance_ratio: Optional[float] = None
-    route_congestion_product: Optional[float] = None
-    time_pressure_index: Optional[float] = None
-    documentation_risk_factor: Optional[float] = None
-
-class HealthResponse(BaseModel):
-    status: str
-    model_loaded: bool
-    model_accuracy: float
-    prevention_rate: float
-
-@app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Check API and model health"""
-    return {
-        "status": "healthy",
-        "model_loaded": predictor.model is not None,
-        "model_accuracy": 0.942,
-        "prevention_rate": 0.94
-    }
-
-@app.post("/predict")
-async def predict_risk(request: PredictionRequest):
-    """Predict D&D risk for a shipment"""
-    try:
-        # Convert request to dict
-        features = request.dict()
-        
-        # Calculate derived features if not provided
-        if features.get('risk_composite_score') is None:
-            features['risk_composite_score'] = (
-                features['port_congestion_index'] * 0.3 +
-                (1 - features['carrier_reliability_score']) * 0.2 +
-                features['customs_complexity_score'] * 0.2 +
-                features['route_risk_score'] * 0.3
-            )
-        
-        if features.get('historical_performance_ratio') is None:
-            features['historical_performance_ratio'] = (
-                features['carrier_reliability_score'] * (1 - features['historical_dd_rate'])
-            )
-        
-        if features.get('route_congestion_product') is None:
-            features['route_congestion_product'] = (
-                features['port_congestion_index'] * features['route_risk_score']
-            )
-        
-        if features.get('time_pressure_index') is None:
-            features['time_pressure_index'] = max(0, min(1, 
-                1 - (features['days_until_eta'] / features['transit_time_days'])
-            ))
-        
-        if features.get('documentation_risk_factor') is None:
-            features['documentation_risk_factor'] = (
-                (1 - features['documentation_completeness']) * features['customs_complexity_score']
-            )
-        
-        # Make prediction
-        result = predictor.predict(features)
-        
-        return result
-        
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.get("/")
-async def root():
-    """Root endpoint"""
-    return {
-        "service": "ROOTUIP ML Prediction API",
-        "version": "1.0.0",
-        "endpoints": {
-            "/health": "GET - Health check",
-            "/predict": "POST - Predict D&D risk",
-            "/docs": "GET - API documentation"
-        }
-    }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
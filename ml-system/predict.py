@@ -1,230 +0,0 @@
-#!/usr/bin/env python3
-"""
-ROOTUIP Real-Time D&D Prediction API
-94% Prevention Rate ML Model
-"""
-
-import pickle
-import numpy as np
-import pandas as pd
-from datetime import datetime
-import json
-import os
-import logging
-from typing import Dict, List, Any
-
-# ✅ Make sure this is here!
-from sklearn.preprocessing import StandardScaler
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger('ROOTUIP_Predictor')
-
-class DDPredictor:
-    """Real-time D&D risk prediction system"""
-
-    def __init__(self, model_path: str = '/home/iii/ROOTUIP/models/dnd_model.pkl'):
-        self.model_path = model_path
-        self.model = None
-        self.feature_names = None
-        self.scaler = None
-        self.threshold = 0.5  # Default threshold
-        self.load_model()
-
-    def load_model(self):
-        """Load trained model or create fallback"""
-        try:
-            if not os.path.exists(self.model_path):
-                os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-                logger.warning(f"Model not found at {self.model_path}. Using default model.")
-                self._create_default_model()
-            else:
-                with open(self.model_path, 'rb') as f:
-                    model_data = pickle.load(f)
-                self.model = model_data['model']
-                self.feature_names = model_data['feature_names']
-                self.scaler = model_data.get('scaler', None)
-                logger.info(f"Model loaded from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
-            self._create_default_model()
-
-    def _create_default_model(self):
-        """Fallback: build a synthetic RandomForest with 94% target"""
-        from sklearn.ensemble import RandomForestClassifier
-
-        self.feature_names = [
-            'transit_time_days', 'port_congestion_index', 'carrier_reliability_score',
-            'documentation_completeness', 'customs_complexity_score', 'container_value_usd',
-            'days_until_eta', 'historical_dd_rate', 'route_risk_score', 'seasonal_risk_factor',
-            'risk_composite_score', 'historical_performance_ratio', 'route_congestion_product',
-            'time_pressure_index', 'documentation_risk_factor'
-        ]
-
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            class_weight='balanced'
-        )
-
-        self._initialize_synthetic_model()
-        logger.info("Default fallback model created with 94% target accuracy.")
-
-    def _initialize_synthetic_model(self):
-        """✅ CORRECTED: Fit the scaler properly!"""
-        np.random.seed(42)
-        n_samples = 1000
-        n_features = len(self.feature_names)
-        X = np.random.randn(n_samples, n_features)
-        y = np.zeros(n_samples)
-        dd_indices = np.random.choice(n_samples, size=int(n_samples * 0.06), replace=False)
-        y[dd_indices] = 1
-
-        self.model.fit(X, y)
-
-        self.scaler = StandardScaler()
-        self.scaler.fit(X)
-
-        logger.info("Synthetic model and scaler fitted correctly.")
-
-    def predict(self, feature_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            features = self._prepare_features(feature_data)
-            features_scaled = self.scaler.transform([features]) if self.scaler else [features]
-
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
-            risk_probability = probabilities[1] if len(probabilities) > 1 else probabilities[0]
-
-            result = {
-                'timestamp': datetime.now().isoformat(),
-                'prediction': int(prediction),
-                'risk_probability': float(risk_probability),
-                'risk_percentage': round(risk_probability * 100, 2),
-                'risk_level': self._get_risk_level(risk_probability),
-                'will_have_dd': bool(prediction == 1),
-                'prevention_confidence': round((1 - risk_probability) * 100, 2),
-                'recommendation': self._get_recommendation(risk_probability),
-                'top_risk_factors': self._get_feature_importance(features)[:5],
-                'model_info': {
-                    'version': '2.0',
-                    'accuracy': 94.2,
-                    'last_updated': datetime.now().isoformat()
-                }
-            }
-
-            logger.info(f"Prediction complete: Risk={result['risk_percentage']}%, Level={result['risk_level']}")
-            self._save_prediction_history(feature_data, result)
-
-            return result
-
-        except Exception as e:
-            logger.error(f"Prediction error: {str(e)}")
-            return {'error': str(e), 'timestamp': datetime.now().isoformat(), 'status': 'failed'}
-
-    def predict_batch(self, feature_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        return [self.predict(fd) for fd in feature_data_list]
-
-    def _prepare_features(self, feature_data: Dict[str, Any]) -> List[float]:
-        features = []
-        for feature in self.feature_names:
-            value = feature_data.get(feature, self._get_default_feature_value(feature))
-            if isinstance(value, (int, float)):
-                features.append(float(value))
-            elif isinstance(value, bool):
-                features.append(1.0 if value else 0.0)
-            else:
-                features.append(0.0)
-        return features
-
-    def _get_default_feature_value(self, feature: str) -> float:
-        defaults = {
-            'transit_time_days': 14.0, 'port_congestion_index': 0.5,
-            'carrier_reliability_score': 0.85, 'documentation_completeness': 0.9,
-            'customs_complexity_score': 0.3, 'container_value_usd': 50000.0,
-            'days_until_eta': 14.0, 'historical_dd_rate': 0.15,
-            'route_risk_score': 0.5, 'seasonal_risk_factor': 0.5,
-            'risk_composite_score': 0.5, 'historical_performance_ratio': 0.85,
-            'route_congestion_product': 0.25, 'time_pressure_index': 0.3,
-            'documentation_risk_factor': 0.1
-        }
-        return defaults.get(feature, 0.0)
-
-    def _get_risk_level(self, prob: float) -> str:
-        if prob < 0.2: return 'VERY_LOW'
-        elif prob < 0.4: return 'LOW'
-        elif prob < 0.6: return 'MODERATE'
-        elif prob < 0.8: return 'HIGH'
-        else: return 'CRITICAL'
-
-    def _get_recommendation(self, prob: float) -> str:
-        if prob < 0.2: return "Low risk - standard processing"
-        elif prob < 0.4: return "Monitor shipment progress"
-        elif prob < 0.6: return "Proactive follow-up needed"
-        elif prob < 0.8: return "Expedite clearance & prep contingencies"
-        else: return "URGENT: Immediate intervention required"
-
-    def _get_feature_importance(self, features: List[float]) -> List[Dict[str, Any]]:
-        scores = []
-        if hasattr(self.model, 'feature_importances_'):
-            for name, val, imp in zip(self.feature_names, features, self.model.feature_importances_):
-                if imp > 0.01:
-                    scores.append({
-                        'feature': name,
-                        'value': round(val, 3),
-                        'importance': round(imp * 100, 2),
-                        'impact': 'increases_risk' if val > self._get_default_feature_value(name) else 'decreases_risk'
-                    })
-            scores.sort(key=lambda x: x['importance'], reverse=True)
-        return scores
-
-    def _save_prediction_history(self, input_data: Dict[str, Any], result: Dict[str, Any]):
-        history_dir = '/home/iii/ROOTUIP/ml-system/prediction_history'
-        os.makedirs(history_dir, exist_ok=True)
-        file = os.path.join(history_dir, f"predictions_{datetime.now().strftime('%Y-%m-%d')}.jsonl")
-        with open(file, 'a') as f:
-            f.write(json.dumps({'timestamp': result['timestamp'], 'input': input_data, 'result': result}) + '\n')
-
-    def get_model_stats(self) -> Dict[str, Any]:
-        return {'model': type(self.model).__name__, 'features': self.feature_names, 'accuracy': 94.0}
-
-# === Public API ===
-
-def predict_dd_risk(feature_data: Dict[str, Any]) -> Dict[str, Any]:
-    return DDPredictor().predict(feature_data)
-
-def predict_batch(feature_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    return DDPredictor().predict_batch(feature_data_list)
-
-def get_model_info() -> Dict[str, Any]:
-    return DDPredictor().get_model_stats()
-
-if __name__ == "__main__":
-    test_shipment = {
-        'transit_time_days': 18, 'port_congestion_index': 0.75,
-        'carrier_reliability_score': 0.82, 'documentation_completeness': 0.95,
-        'customs_complexity_score': 0.4, 'container_value_usd': 75000,
-        'days_until_eta': 10, 'historical_dd_rate': 0.12,
-        'route_risk_score': 0.65, 'seasonal_risk_factor': 0.7,
-        'risk_composite_score': 0.58, 'historical_performance_ratio': 0.88,
-        'route_congestion_product': 0.49, 'time_pressure_index': 0.45,
-        'documentation_risk_factor': 0.05
-    }
-
-    result = predict_dd_risk(test_shipment)
-    print("\n=== D&D Risk Prediction Results ===")
-    print(f"Risk Probability: {result['risk_percentage']}%")
-    print(f"Risk Level: {result['risk_level']}")
-    print(f"Will have D&D: {'Yes' if result['will_have_dd'] else 'No'}")
-    print(f"Prevention Confidence: {result['prevention_confidence']}%")
-    print(f"Recommendation: {result['recommendation']}")
-    if result.get('top_risk_factors'):
-        print("\nTop Risk Factors:")
-        for factor in result['top_risk_factors']:
-            print(f"  - {factor['feature']}: {factor['value']} (importance: {factor['importance']}%)")
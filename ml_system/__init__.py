@@ -0,0 +1,36 @@
+"""
+ROOTUIP ML System
+D&D risk prediction, training and serving.
+
+The public names below are resolved lazily: importing the package does not
+pull in numpy, scikit-learn, pandas or FastAPI until a submodule that needs
+them is first used.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'DDPredictor': 'predict',
+    'predict_dd_risk': 'predict',
+    'predict_batch': 'predict',
+    'get_model_info': 'predict',
+    'get_predictor': 'predict',
+    'DDModelTrainer': 'train_model',
+    'FEATURE_NAMES': 'features',
+    'AsyncPredictionClient': 'client',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,12 +1,545 @@
-from fastapi import FastAPI
+#!/usr/bin/env python3
+"""
+ROOTUIP FastAPI ML Prediction Service
+
+    uvicorn ml_system.api:app --host 0.0.0.0 --port 8000
+    python -m ml_system.serve --workers 4 --port 8000   # pre-forked, shared model
+"""
+
+from fastapi import FastAPI, HTTPException, Request, Header, Query
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from .predict import predict_dd_risk
+from typing import Dict, Any, Awaitable, Callable, List, Literal, MutableMapping, Optional
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Import the predictor
+from .config import get_config
+from .predict import DDPredictor, RISK_LEVELS
+from .history import flush_all as flush_history
+from . import transport
+from .prediction_cache import PredictionCache
+from .drift import DriftMonitor
+from .feature_store import FeatureStore
+from .rescoring import FleetStore
+from .streaming import RiskStreamHub, StreamFull, HEARTBEAT_SECONDS, sse
+from .tenancy import TenantModels
+from .idempotency import IdempotencyStore, IdempotencyConflict, MAX_KEY_LENGTH, fingerprint
+from .scheduler import InferenceScheduler, DeadlineExceeded
+from .metrics import REGISTRY, CONTENT_TYPE_LATEST, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, TENANT_REQUEST_SECONDS
+from .profiling import RequestProfiler, observe_stage
+from .logging_config import configure_logging, shutdown_logging
+
+configure_logging()
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="ROOTUIP ML Prediction API",
+    description="AI-powered D&D prevention with 94% accuracy",
+    version="1.0.0"
+)
+
+# Configure CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Export queue depth and end-to-end latency per endpoint"""
+    start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    if worker_slot is not None:
+        worker_slot.record_request()
+    try:
+        return await call_next(request)
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - start
+        route = request.scope.get('route')
+        endpoint = route.path if route is not None else 'unmatched'
+        REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+        tenant = request.headers.get('x-tenant-id')
+        if tenant is not None and tenant_models is not None:
+            TENANT_REQUEST_SECONDS.labels(tenant_models.label(tenant)).observe(elapsed)
+
+@app.on_event("startup")
+async def preload_tenant_models():
+    if tenant_models is not None:
+        tenant_models.preload()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    flush_history()
+    shutdown_logging()
+
+# Paths and performance knobs (see config.py), checked once so a bad setting fails at startup
+config = get_config().check()
+
+# Initialize predictor
+predictor = DDPredictor(cache=PredictionCache.from_env(config),
+                        drift_monitor=DriftMonitor.from_env(config),
+                        feature_store=FeatureStore.from_env(config),
+                        config=config)
+# Per-tenant models selected by X-Tenant-ID (see tenancy.py); None when disabled
+tenant_models = TenantModels.from_env(predictor, config)
+profiler = RequestProfiler.from_env(config)
+# Responses replayed to retries carrying the same Idempotency-Key; None when disabled
+idempotency = IdempotencyStore.from_env(config)
+# Interactive predictions go ahead of bulk batch chunks (see scheduler.py); None runs inference inline
+scheduler = InferenceScheduler.from_env(config)
+ADMIN_TOKEN = os.environ.get('ROOTUIP_ADMIN_TOKEN')
+_fleet_store: Optional[FleetStore] = None
+# Pushes the re-scorer's risk level changes to /stream/risk subscribers (see streaming.py)
+risk_streams = RiskStreamHub.from_env(config)
+# Set by ml_system.serve in pre-forked workers; None under plain uvicorn
+worker_board = None
+worker_slot = None
+
+async def model_for(tenant: Optional[str]) -> DDPredictor:
+    """The tenant's own model when it has one, otherwise the default predictor"""
+    if tenant_models is None:
+        return predictor
+    return await tenant_models.acquire(tenant)
+
+async def idempotent(endpoint: str, payload: Any, tenant: Optional[str], key: Optional[str],
+                     headers: MutableMapping[str, str], compute: Callable[[Optional[str]], Awaitable[Any]]):
+    """compute(request_id) once per (tenant, key); retries get the first response back.
+
+    The key must be reused only for the same endpoint, profile and body. Without
+    a key compute(None) just runs; with idempotency disabled the key still
+    dedupes the history record. Failed single predictions are not replayed.
+    """
+    if key is None:
+        return await compute(None)
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+    request_id = f"{tenant}/{key}" if tenant else key
+    if idempotency is None:
+        return await compute(request_id)
+    try:
+        result, replayed = await idempotency.run((tenant, key), fingerprint([endpoint, payload]),
+                                                 lambda: compute(request_id),
+                                                 keep=lambda r: not (isinstance(r, dict) and r.get('status') == 'failed'))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        headers['Idempotent-Replayed'] = 'true'
+    return result
+
+def priority_for(x_priority: Optional[str], rows: int) -> str:
+    """X-Priority: interactive|bulk; by default single predictions and small batches are interactive"""
+    if scheduler is None:
+        return 'interactive'
+    try:
+        return scheduler.priority_for(x_priority, rows)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-app = FastAPI()
+async def infer(priority: str, fn: Callable, *args):
+    """fn(*args) on the inference scheduler, or inline when it is disabled"""
+    if scheduler is None:
+        return fn(*args)
+    try:
+        return await scheduler.run(priority, fn, *args)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+
+async def infer_chunked(priority: str, fn: Callable[[int, int], Any], rows: int) -> List[Any]:
+    """fn(start, stop) over the rows in scheduler-sized chunks; a single call when it is disabled"""
+    if scheduler is None:
+        return [fn(0, rows)]
+    try:
+        return await scheduler.run_chunked(priority, fn, rows)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+
+def chunk_request_id(request_id: Optional[str], start: int) -> Optional[str]:
+    """History request id of the chunk starting at row start (chunks are recorded separately)"""
+    return request_id if request_id is None or start == 0 else f"{request_id}@{start}"
+
+def require_admin(token: Optional[str]):
+    """Admin endpoints are open unless ROOTUIP_ADMIN_TOKEN is set"""
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# Request models
+class PredictionRequest(BaseModel):
+    # Optional caller reference; stored in the prediction history for outcome feedback
+    shipment_id: Optional[str] = None
+    transit_time_days: float
+    # Looked up in the feature store from the identifiers below when omitted
+    port_congestion_index: Optional[float] = None
+    carrier_reliability_score: Optional[float] = None
+    documentation_completeness: float
+    customs_complexity_score: float
+    container_value_usd: float
+    days_until_eta: float
+    historical_dd_rate: Optional[float] = None
+    route_risk_score: Optional[float] = None
+    seasonal_risk_factor: float
+    risk_composite_score: Optional[float] = None
+    historical_performance_ratio: Optional[float] = None
+    route_congestion_product: Optional[float] = None
+    time_pressure_index: Optional[float] = None
+    documentation_risk_factor: Optional[float] = None
+    # Raw identifiers, encoded by models trained with categorical features (see categorical.py)
+    carrier_scac: Optional[str] = None
+    pol_locode: Optional[str] = None
+    pod_locode: Optional[str] = None
+    lane: Optional[str] = None
 
 class Features(BaseModel):
-    feature_data: dict
+    feature_data: Dict[str, Any]
+
+class BatchPredictionRequest(BaseModel):
+    shipments: List[PredictionRequest]
+
+class FleetShipment(PredictionRequest):
+    # Defaults to now + days_until_eta when omitted
+    eta: Optional[datetime] = None
+
+# ?profile= on the predict endpoints; see predict.RESPONSE_PROFILES
+ResponseProfile = Literal['minimal', 'standard', 'full']
+# ?interval=0.8 adds the trees' spread and central 80% interval to each result; see uncertainty.py
+Interval = Query(None, gt=0, lt=1)
+
+class HealthResponse(BaseModel):
+    status: str
+    model_loaded: bool
+    model_accuracy: float
+    prevention_rate: float
+
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Check API and model health"""
+    return {
+        "status": "healthy",
+        "model_loaded": predictor.model is not None,
+        "model_accuracy": 0.942,
+        "prevention_rate": 0.94
+    }
+
+def use_cache(cache_control: Optional[str]) -> bool:
+    """Cache-Control: no-cache bypasses the prediction cache"""
+    return not (cache_control and 'no-cache' in cache_control.lower())
 
 @app.post("/predict")
-async def get_prediction(features: Features):
-    return predict_dd_risk(features.feature_data)
+async def predict_risk(request: PredictionRequest, response: Response,
+                       response_profile: ResponseProfile = Query('full', alias='profile'),
+                       interval: Optional[float] = Interval,
+                       x_debug_profile: Optional[str] = Header(None),
+                       cache_control: Optional[str] = Header(None),
+                       x_tenant_id: Optional[str] = Header(None),
+                       idempotency_key: Optional[str] = Header(None),
+                       x_request_id: Optional[str] = Header(None),
+                       x_priority: Optional[str] = Header(None)):
+    """Predict D&D risk for a shipment; a retry with the same Idempotency-Key gets the same answer"""
+    model = await model_for(x_tenant_id)
+    trigger = profiler.trigger_for(x_debug_profile)
+    priority = priority_for(x_priority, 1)
+
+    async def compute(request_id: Optional[str]):
+        args = (model, request, use_cache(cache_control), response_profile, request_id, interval)
+        if trigger is None:
+            return await infer(priority, _predict, *args)
+        with profiler.capture(trigger, label='/predict') as capture:
+            if profiler.mode == 'stages':
+                # Stage timings follow the request's context into the inference thread
+                result = await infer(priority, _predict, *args)
+            else:
+                # cProfile and pyinstrument only see the thread they were started on
+                result = _predict(*args)
+        response.headers['X-Profile-Id'] = capture.id
+        return result
+
+    return await idempotent('/predict', [response_profile, interval, request.dict()], x_tenant_id,
+                            idempotency_key or x_request_id, response.headers, compute)
+
+@app.post("/predict/batch")
+async def predict_risk_batch(request: BatchPredictionRequest, response: Response,
+                             response_profile: ResponseProfile = Query('full', alias='profile'),
+                             interval: Optional[float] = Interval,
+                             cache_control: Optional[str] = Header(None),
+                             x_tenant_id: Optional[str] = Header(None),
+                             idempotency_key: Optional[str] = Header(None),
+                             x_request_id: Optional[str] = Header(None),
+                             x_priority: Optional[str] = Header(None)):
+    """Predict D&D risk for many shipments, one forest pass per scheduler chunk"""
+    model = await model_for(x_tenant_id)
+    shipments = [shipment.dict() for shipment in request.shipments]
+    priority = priority_for(x_priority, len(shipments))
+
+    async def compute(request_id: Optional[str]):
+        def score(start: int, stop: int):
+            try:
+                parse_start = time.perf_counter()
+                features = [model.enrich(shipment) for shipment in shipments[start:stop]]
+                observe_stage('parse', parse_start)
+                return model.predict_batch(features, use_cache=use_cache(cache_control),
+                                           response_profile=response_profile,
+                                           request_id=chunk_request_id(request_id, start), interval=interval)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        chunks = await infer_chunked(priority, score, len(shipments))
+        return {**model.batch_metadata(), "predictions": [p for chunk in chunks for p in chunk]}
+
+    return await idempotent('/predict/batch', [response_profile, interval, shipments], x_tenant_id,
+                            idempotency_key or x_request_id, response.headers, compute)
+
+@app.post("/predict/batch/msgpack")
+async def predict_risk_batch_msgpack(request: Request, x_tenant_id: Optional[str] = Header(None),
+                                     idempotency_key: Optional[str] = Header(None),
+                                     x_request_id: Optional[str] = Header(None),
+                                     x_priority: Optional[str] = Header(None)):
+    """Batch scoring over the compact msgpack transport (see ml_system/transport.py)"""
+    if not transport.msgpack_available():
+        raise HTTPException(status_code=501, detail="msgpack transport requires the msgpack package")
+    model = await model_for(x_tenant_id)
+    body = await request.body()
+
+    async def compute(request_id: Optional[str]) -> bytes:
+        start = time.perf_counter()
+        # Columns are decoded for this model; every chunk scores with it even if a reload lands meanwhile
+        loaded = model.current
+        try:
+            matrix, ids, identifiers = transport.decode_request(
+                body, loaded.feature_names, loaded.feature_defaults,
+                loaded.categorical_encoder, model.feature_store)
+        except transport.TransportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        observe_stage('parse', start)
+
+        def score(start: int, stop: int):
+            try:
+                return model.predict_matrix(
+                    matrix[start:stop], shipment_ids=None if ids is None else ids[start:stop],
+                    request_id=chunk_request_id(request_id, start), loaded=loaded,
+                    identifiers=None if identifiers is None else {
+                        name: values[start:stop] for name, values in identifiers.items()})
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+        chunks = await infer_chunked(priority_for(x_priority, len(matrix)), score, len(matrix))
+        predictions, risk_probabilities, levels = (np.concatenate([chunk[n] for chunk in chunks]) for n in range(3))
+        prediction_ids = [prediction_id for chunk in chunks for prediction_id in chunk[3]]
+        return transport.encode_response(predictions, risk_probabilities, levels, RISK_LEVELS,
+                                         loaded.model_version, datetime.now().isoformat(), prediction_ids, ids)
+
+    headers: Dict[str, str] = {}
+    content = await idempotent('/predict/batch/msgpack', body, x_tenant_id,
+                               idempotency_key or x_request_id, headers, compute)
+    return Response(content=content, media_type=transport.CONTENT_TYPE, headers=headers)
+
+@app.post("/predict/features")
+async def predict_from_features(features: Features, response: Response,
+                                response_profile: ResponseProfile = Query('full', alias='profile'),
+                                interval: Optional[float] = Interval,
+                                cache_control: Optional[str] = Header(None),
+                                x_tenant_id: Optional[str] = Header(None),
+                                idempotency_key: Optional[str] = Header(None),
+                                x_request_id: Optional[str] = Header(None),
+                                x_priority: Optional[str] = Header(None)):
+    """Predict from a free-form feature dict; missing features use model defaults"""
+    model = await model_for(x_tenant_id)
+    priority = priority_for(x_priority, 1)
+
+    async def compute(request_id: Optional[str]):
+        result = await infer(priority, lambda: model.predict(
+            features.feature_data, use_cache=use_cache(cache_control), response_profile=response_profile,
+            request_id=request_id, interval=interval))
+        if result.get('status') == 'failed':
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+
+    return await idempotent('/predict/features', [response_profile, interval, features.feature_data], x_tenant_id,
+                            idempotency_key or x_request_id, response.headers, compute)
+
+def _predict(model: DDPredictor, request: PredictionRequest, cache: bool = True, response_profile: str = 'full',
+             request_id: Optional[str] = None, interval: Optional[float] = None):
+    try:
+        start = time.perf_counter()
+        features = _request_features(model, request)
+        observe_stage('parse', start)
+
+        # Make prediction
+        result = model.predict(features, use_cache=cache, response_profile=response_profile,
+                               request_id=request_id, interval=interval)
+        
+        return result
+        
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _request_features(model: DDPredictor, request: PredictionRequest) -> Dict[str, Any]:
+    """Request fields plus feature store values, defaults and derived features the caller left out"""
+    return model.enrich(request.dict())
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/drift")
+async def drift():
+    """PSI/KS of live inputs against the model's training distributions"""
+    if predictor.drift_monitor is None:
+        return {"active": False, "reason": "drift monitoring disabled (ROOTUIP_DRIFT_ENABLED=0)"}
+    return predictor.drift_monitor.report()
+
+@app.get("/workers")
+async def workers():
+    """Per-worker health when running under ml_system.serve"""
+    if worker_board is None:
+        return {"mode": "single", "pid": os.getpid(), "workers": []}
+    return {"mode": "prefork", "worker": worker_slot.index, "workers": worker_board.snapshot()}
+
+def fleet_store() -> FleetStore:
+    """Open-shipment table shared with the re-scorer (ml_system.rescoring), created on first use"""
+    global _fleet_store
+    if _fleet_store is None:
+        _fleet_store = FleetStore.from_env(config)
+    return _fleet_store
+
+@app.put("/fleet/{shipment_id}")
+async def track_shipment(shipment_id: str, request: FleetShipment):
+    """Track an open shipment; the re-scorer keeps its risk current and reports level changes"""
+    shipment = request.dict(exclude={'shipment_id', 'eta'})
+    shipment.update(shipment_id=shipment_id, eta=request.eta.timestamp() if request.eta else None)
+    fleet_store().track([shipment])
+    return {"shipment_id": shipment_id, "tracked": True}
+
+@app.get("/fleet/{shipment_id}")
+async def get_tracked_shipment(shipment_id: str):
+    """Last re-scored risk of a tracked shipment"""
+    shipment = fleet_store().get(shipment_id)
+    if shipment is None:
+        raise HTTPException(status_code=404, detail="Shipment not tracked")
+    return shipment
+
+@app.delete("/fleet/{shipment_id}")
+async def close_shipment(shipment_id: str):
+    """Stop re-scoring a shipment (delivered or cancelled)"""
+    if not fleet_store().close([shipment_id]):
+        raise HTTPException(status_code=404, detail="Shipment not tracked")
+    return {"shipment_id": shipment_id, "tracked": False}
+
+@app.get("/stream/risk")
+async def stream_risk(shipment_ids: str = Query(..., description="Comma-separated tracked shipment ids")):
+    """Server-Sent Events: a snapshot of the shipments' current risk, then their risk level changes"""
+    try:
+        subscription = risk_streams.subscribe(sid.strip() for sid in shipment_ids.split(','))
+    except StreamFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '30'})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            # Read after subscribing, so a change landing in between is sent rather than lost
+            scores = fleet_store().get_many(sorted(subscription.shipment_ids))
+            yield sse('snapshot', {'shipments': [
+                scores.get(sid, {'shipment_id': sid, 'open': False, 'risk_level': None})
+                for sid in sorted(subscription.shipment_ids)]})
+            while True:
+                batch = await subscription.next(HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ': keep-alive\n\n'
+                for event in batch:
+                    yield sse(event.get('event', 'risk_update'), event)
+        finally:
+            risk_streams.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get("/admin/scheduler")
+async def scheduler_state(x_admin_token: Optional[str] = Header(None)):
+    """Queued and running inference work per priority class in this process"""
+    require_admin(x_admin_token)
+    if scheduler is None:
+        return {"active": False, "reason": "inference scheduler disabled (ROOTUIP_SCHEDULER=0)"}
+    return {"active": True, **scheduler.stats()}
+
+@app.get("/admin/streams")
+async def list_streams(x_admin_token: Optional[str] = Header(None)):
+    """Risk stream subscriptions open in this process"""
+    require_admin(x_admin_token)
+    return risk_streams.stats()
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Recently captured request profiles"""
+    require_admin(x_admin_token)
+    return {
+        "sample_rate": profiler.sample_rate,
+        "mode": profiler.mode,
+        "profiles": profiler.list_captures()
+    }
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Stage breakdown and profiler output for one capture"""
+    require_admin(x_admin_token)
+    capture = profiler.get_capture(profile_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return capture
+
+@app.post("/admin/model/reload")
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """Reload the live model file in this process; under ml_system.serve send SIGHUP instead"""
+    require_admin(x_admin_token)
+    # Unpickling a forest takes a while; predictions keep serving the old model meanwhile
+    await asyncio.get_running_loop().run_in_executor(None, predictor.load_model)
+    if tenant_models is not None:
+        tenant_models.reload()
+    return {"model_version": predictor.model_version, "fallback": predictor.using_fallback}
+
+@app.get("/admin/tenants")
+async def list_tenant_models(x_admin_token: Optional[str] = Header(None)):
+    """Tenant models resident in this process, most recently used first"""
+    require_admin(x_admin_token)
+    if tenant_models is None:
+        return {"active": False, "reason": "tenant routing disabled (ROOTUIP_TENANT_MODELS=0)"}
+    return {"active": True, "promoted": tenant_models.registry.tenants(), **tenant_models.stats()}
+
+@app.get("/")
+async def root():
+    """Root endpoint"""
+    return {
+        "service": "ROOTUIP ML Prediction API",
+        "version": "1.0.0",
+        "endpoints": {
+            "/health": "GET - Health check",
+            "/predict": "POST - Predict D&D risk",
+            "/predict/batch": "POST - Predict D&D risk for many shipments",
+            "/predict/batch/msgpack": "POST - Batch prediction over msgpack (internal callers)",
+            "/predict/features": "POST - Predict from a raw feature dict",
+            "/metrics": "GET - Prometheus metrics",
+            "/drift": "GET - Input drift vs training data",
+            "/workers": "GET - Per-worker health",
+            "/fleet/{shipment_id}": "PUT/GET/DELETE - Track open shipments for re-scoring",
+            "/stream/risk": "GET - Server-Sent Events of tracked shipments' risk level changes",
+            "/admin/profiles": "GET - Captured request profiles",
+            "/admin/model/reload": "POST - Reload the promoted model",
+            "/admin/tenants": "GET - Resident per-tenant models (select with X-Tenant-ID)",
+            "/admin/streams": "GET - Open risk stream subscriptions",
+            "/admin/scheduler": "GET - Inference queues per priority class (X-Priority: interactive|bulk)",
+            "/docs": "GET - API documentation"
+        }
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+ROOTUIP ML benchmarks: HTTP load test (load_test.py) and DDPredictor
+microbenchmarks (bench_*.py, run via run_microbenchmarks.sh)
+"""
+
+BATCH_SIZES = (1, 64, 1000, 10000)
@@ -0,0 +1,69 @@
+"""
+DDPredictor component microbenchmarks (pytest-benchmark).
+
+Every stage of the predict path is measured at batch sizes 1/64/1k/10k.
+run_microbenchmarks.sh saves a baseline and fails a later run when any
+benchmark's mean regresses by more than the configured percentage.
+"""
+
+import numpy as np
+import pytest
+
+from ml_system.benchmarks import BATCH_SIZES
+from ml_system.benchmarks.engines import ENGINES
+
+pytestmark = pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+
+
+def _matrix(predictor, rows):
+    return np.asarray([predictor._prepare_features(r) for r in rows], dtype=np.float64)
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_prepare_features(benchmark, predictor, shipments, batch_size):
+    rows = shipments[:batch_size]
+    benchmark(lambda: [predictor._prepare_features(r) for r in rows])
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_scaler_transform(benchmark, predictor, shipments, batch_size):
+    matrix = _matrix(predictor, shipments[:batch_size])
+    benchmark(predictor.scaler.transform, matrix)
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_predict_proba(benchmark, predictor, shipments, batch_size, engine):
+    try:
+        model = ENGINES[engine](predictor.model)
+    except ImportError as e:
+        pytest.skip(f"{engine} unavailable: {e}")
+    matrix = predictor.scaler.transform(_matrix(predictor, shipments[:batch_size]))
+    reference = predictor.model.predict_proba(matrix)[:, 1]
+    np.testing.assert_allclose(model.predict_proba(matrix)[:, 1], reference, atol=1e-4)
+    benchmark(model.predict_proba, matrix)
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_feature_importance(benchmark, predictor, shipments, batch_size):
+    rows = [predictor._prepare_features(r) for r in shipments[:batch_size]]
+    benchmark(lambda: [predictor._get_feature_importance(r)[:5] for r in rows])
+
+
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_save_prediction_history(benchmark, predictor, shipments, batch_size):
+    rows = shipments[:batch_size]
+    results = predictor.predict_batch(rows, use_cache=False)
+    pairs = list(zip(rows, results))
+    benchmark(lambda: [predictor._save_prediction_history(r, res) for r, res in pairs])
+
+
+@pytest.mark.parametrize('response_profile', ('minimal', 'standard', 'full'))
+@pytest.mark.parametrize('batch_size', BATCH_SIZES)
+def test_predict_batch(benchmark, predictor, shipments, batch_size, response_profile):
+    rows = shipments[:batch_size]
+    benchmark(predictor.predict_batch, rows, use_cache=False, response_profile=response_profile)
+
+
+def test_predict_single(benchmark, predictor, shipments):
+    benchmark(predictor.predict, shipments[0], use_cache=False)
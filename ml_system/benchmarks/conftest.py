@@ -0,0 +1,49 @@
+"""
+Shared fixtures for the DDPredictor microbenchmarks.
+
+The model is trained by DDModelTrainer on a small deterministic synthetic
+set (production hyperparameters, no cross-validation), so the suite runs
+without the production pickle.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from ml_system.benchmarks import BATCH_SIZES  # noqa: E402
+from ml_system.features import FEATURE_NAMES  # noqa: E402
+from ml_system.predict import DDPredictor  # noqa: E402
+from ml_system.train_model import DDModelTrainer  # noqa: E402
+
+TRAINING_SAMPLES = 10000
+
+
+@pytest.fixture(scope='session')
+def training_frame():
+    trainer = DDModelTrainer()
+    return trainer, trainer.generate_synthetic_data(n_samples=TRAINING_SAMPLES)
+
+
+@pytest.fixture(scope='session')
+def model_path(training_frame, tmp_path_factory):
+    import pandas as pd
+
+    trainer, df = training_frame
+    X, y = trainer.engineer_features(df)
+    X_scaled = pd.DataFrame(trainer.scaler.fit_transform(X), columns=trainer.feature_names)
+    trainer.train_model(X_scaled, y, cv_folds=0)
+    path = tmp_path_factory.mktemp('model') / 'dnd_model.pkl'
+    trainer.save_model({'benchmark': True}, model_path=str(path))
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def predictor(model_path, tmp_path_factory):
+    history_dir = tmp_path_factory.mktemp('prediction_history')
+    return DDPredictor(model_path=model_path, history_dir=str(history_dir))
+
+
+@pytest.fixture(scope='session')
+def shipments(training_frame):
+    _, df = training_frame
+    return df[FEATURE_NAMES].head(max(BATCH_SIZES)).to_dict('records')
@@ -0,0 +1,58 @@
+"""
+Inference engines compared by the microbenchmarks.
+
+Each builder takes the trained sklearn forest and returns an object with
+predict_proba(X), or raises ImportError when its dependency is missing.
+"""
+
+import copy
+
+
+def sklearn_forest(model):
+    """The forest exactly as trained (n_jobs=-1)"""
+    return model
+
+
+def sklearn_single_thread(model):
+    """Same trees, but without joblib fan-out per call"""
+    single = copy.copy(model)
+    single.n_jobs = 1
+    return single
+
+
+class _OnnxForest:
+    def __init__(self, model):
+        import numpy as np
+        import onnxruntime
+        from skl2onnx import to_onnx
+
+        self._np = np
+        onnx_model = to_onnx(model, np.zeros((1, model.n_features_in_), dtype=np.float32),
+                             options={id(model): {'zipmap': False}})
+        self._session = onnxruntime.InferenceSession(onnx_model.SerializeToString(),
+                                                     providers=['CPUExecutionProvider'])
+        self._input = self._session.get_inputs()[0].name
+
+    def predict_proba(self, X):
+        X = self._np.asarray(X, dtype=self._np.float32)
+        return self._session.run(None, {self._input: X})[1]
+
+
+def onnxruntime_forest(model):
+    """Forest converted with skl2onnx and run by onnxruntime"""
+    return _OnnxForest(model)
+
+
+def compact_forest(model):
+    """All trees flattened into ml_system.compaction.CompactForest (float32 thresholds)"""
+    from ml_system.compaction import CompactForest
+
+    return CompactForest.from_sklearn(model)
+
+
+ENGINES = {
+    'sklearn': sklearn_forest,
+    'sklearn_n_jobs_1': sklearn_single_thread,
+    'onnxruntime': onnxruntime_forest,
+    'compact': compact_forest
+}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML API Load Test
+Drives the FastAPI prediction service with configurable concurrency and
+request mixes, then reports throughput, latency percentiles and CPU/RSS.
+
+    python -m ml_system.benchmarks.load_test --mode inprocess --mix single --requests 2000
+    python -m ml_system.benchmarks.load_test --mode uvicorn --mix cache-hit-heavy --concurrency 32
+    python -m ml_system.benchmarks.load_test --mix batch --compare ml-system/reports/benchmarks/load_<...>.json
+
+Results are saved as JSON under ml-system/reports/benchmarks/ so runs can be
+diffed; --compare exits non-zero when throughput or p95/p99 regress by more
+than --fail-threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_OUTPUT_DIR = os.path.join(REPO_ROOT, 'ml-system', 'reports', 'benchmarks')
+
+# Request mixes: share of 'single', 'batch' and 'cached' (repeated single) requests
+MIXES = {
+    'single': {'single': 1.0},
+    'batch': {'batch': 1.0},
+    'cache-hit-heavy': {'cached': 0.9, 'single': 0.1},
+    'mixed': {'single': 0.6, 'batch': 0.2, 'cached': 0.2}
+}
+
+
+def make_shipment(rng: random.Random) -> Dict[str, float]:
+    """Random but plausible /predict payload"""
+    transit = rng.uniform(5, 45)
+    return {
+        'transit_time_days': round(transit, 2),
+        'port_congestion_index': round(rng.betavariate(2, 5), 4),
+        'carrier_reliability_score': round(rng.betavariate(5, 2), 4),
+        'documentation_completeness': round(rng.betavariate(8, 2), 4),
+        'customs_complexity_score': round(rng.betavariate(3, 3), 4),
+        'container_value_usd': round(rng.lognormvariate(10, 1.5), 2),
+        'days_until_eta': round(rng.uniform(0, transit), 2),
+        'historical_dd_rate': round(rng.betavariate(2, 8), 4),
+        'route_risk_score': round(rng.betavariate(3, 4), 4),
+        'seasonal_risk_factor': round(rng.uniform(0.5, 1.0), 4)
+    }
+
+
+class Workload:
+    """Pre-generates payloads so request building stays out of the timed loop"""
+
+    def __init__(self, mix: Dict[str, float], batch_size: int, seed: int, hot_set: int = 16):
+        self.rng = random.Random(seed)
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.batch_size = batch_size
+        self.hot = [make_shipment(self.rng) for _ in range(hot_set)]
+
+    def next_request(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == 'batch':
+            body = {'shipments': [make_shipment(self.rng) for _ in range(self.batch_size)]}
+            return kind, '/predict/batch', body, self.batch_size
+        if kind == 'cached':
+            return kind, '/predict', self.rng.choice(self.hot), 1
+        return kind, '/predict', make_shipment(self.rng), 1
+
+
+class ProcessSampler:
+    """CPU seconds and RSS of the process serving the requests"""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid
+
+    def sample(self) -> Dict[str, float]:
+        if self.pid is None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            return {'cpu_seconds': usage.ru_utime + usage.ru_stime, 'rss_mb': _current_rss_mb(os.getpid())}
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        return {
+            'cpu_seconds': (int(fields[11]) + int(fields[12])) / ticks,
+            'rss_mb': _current_rss_mb(self.pid)
+        }
+
+
+def _current_rss_mb(pid: int) -> float:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best portable fallback (kilobytes on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class UvicornServer:
+    """Runs api:app in a child uvicorn process for out-of-process measurements"""
+
+    def __init__(self, port: int, env: Dict[str, str], app: str = 'ml_system.api:app', extra_args: List[str] = ()):
+        self.port = port
+        self.env = env
+        self.app = app
+        self.extra_args = list(extra_args)
+        self.process: Optional[subprocess.Popen] = None
+
+    def command(self) -> List[str]:
+        return [sys.executable, '-m', 'uvicorn', self.app, '--host', '127.0.0.1',
+                '--port', str(self.port), '--log-level', 'warning'] + self.extra_args
+
+    def __enter__(self) -> 'UvicornServer':
+        self.process = subprocess.Popen(self.command(), cwd=REPO_ROOT, env={**os.environ, **self.env})
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f'http://127.0.0.1:{self.port}/health', timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.__exit__(None, None, None)
+        raise RuntimeError("uvicorn did not become healthy within 120s")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, total_requests: int,
+                concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Send total_requests with `concurrency` requests in flight; returns raw samples"""
+    for _ in range(warmup):
+        _, path, body, _ = workload.next_request()
+        await client.post(path, json=body)
+
+    requests = [workload.next_request() for _ in range(total_requests)]
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    predictions = 0
+    cursor = iter(requests)
+
+    async def worker():
+        nonlocal errors, predictions
+        for kind, path, body, n in cursor:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.setdefault(kind, []).append(elapsed)
+                predictions += n
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        'wall_seconds': time.perf_counter() - start,
+        'latencies': latencies,
+        'errors': errors,
+        'predictions': predictions
+    }
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def summarize(raw: Dict[str, Any], before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Any]:
+    all_latencies = [x for samples in raw['latencies'].values() for x in samples]
+    wall = raw['wall_seconds']
+    cpu = after['cpu_seconds'] - before['cpu_seconds']
+    return {
+        'wall_seconds': round(wall, 3),
+        'requests': len(all_latencies),
+        'errors': raw['errors'],
+        'throughput_rps': round(len(all_latencies) / wall, 2) if wall else 0.0,
+        'predictions_per_second': round(raw['predictions'] / wall, 2) if wall else 0.0,
+        'latency': _percentiles(all_latencies),
+        'latency_by_kind': {kind: _percentiles(samples) for kind, samples in raw['latencies'].items()},
+        'server_cpu_seconds': round(cpu, 3),
+        'server_cpu_ms_per_prediction': round(1000 * cpu / raw['predictions'], 4) if raw['predictions'] else None,
+        'server_rss_mb': round(after['rss_mb'], 1)
+    }
+
+
+async def run_inprocess(args, workload: Workload) -> Dict[str, Any]:
+    if args.cache_size:
+        os.environ.setdefault('ROOTUIP_PREDICTION_CACHE_SIZE', str(args.cache_size))
+    from ml_system.api import app
+
+    sampler = ProcessSampler()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        before = sampler.sample()
+        raw = await drive(client, workload, args.requests, args.concurrency, args.warmup)
+        after = sampler.sample()
+    return summarize(raw, before, after)
+
+
+async def run_uvicorn(args, workload: Workload) -> Dict[str, Any]:
+    env = {'ROOTUIP_PREDICTION_CACHE_SIZE': str(args.cache_size)} if args.cache_size else {}
+    port = args.port or _free_port()
+    with UvicornServer(port, env) as server:
+        sampler = ProcessSampler(server.process.pid)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+            before = sampler.sample()
+            raw = await drive(client, workload, args.requests, args.concurrency, args.warmup)
+            after = sampler.sample()
+    return summarize(raw, before, after)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Human-readable regressions of current vs baseline beyond threshold (fraction)"""
+    regressions = []
+    cur, base = current['results'], baseline['results']
+    if base['throughput_rps'] and cur['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+        regressions.append(f"throughput {base['throughput_rps']} -> {cur['throughput_rps']} req/s")
+    for key in ('p95_ms', 'p99_ms'):
+        old, new = base['latency'].get(key), cur['latency'].get(key)
+        if old and new and new > old * (1 + threshold):
+            regressions.append(f"{key} {old} -> {new}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the ROOTUIP ML prediction API')
+    parser.add_argument('--mode', choices=('inprocess', 'uvicorn'), default='inprocess')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='single')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--cache-size', type=int, default=None,
+                        help='Prediction cache entries for the server (defaults to 10000 for cache-hit-heavy)')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--compare', help='Baseline result JSON to compare against')
+    parser.add_argument('--fail-threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+    if args.cache_size is None:
+        args.cache_size = 10000 if args.mix == 'cache-hit-heavy' else 0
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workload = Workload(MIXES[args.mix], args.batch_size, args.seed)
+    runner = run_inprocess if args.mode == 'inprocess' else run_uvicorn
+    results = asyncio.run(runner(args, workload))
+
+    report = {
+        'benchmark': 'ml_api_load',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'host': {'hostname': platform.node(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {k: v for k, v in vars(args).items() if k not in ('output_dir', 'compare')},
+        'results': results
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"load_{args.mode}_{args.mix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    latency = results['latency']
+    print(f"{args.mode}/{args.mix}: {results['throughput_rps']} req/s, "
+          f"{results['predictions_per_second']} predictions/s, "
+          f"p50 {latency.get('p50_ms')}ms p95 {latency.get('p95_ms')}ms p99 {latency.get('p99_ms')}ms, "
+          f"errors {results['errors']}, cpu {results['server_cpu_ms_per_prediction']}ms/prediction, "
+          f"rss {results['server_rss_mb']}MB")
+    print(f"Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.fail_threshold)
+        if regressions:
+            print("REGRESSION vs baseline: " + '; '.join(regressions))
+            return 1
+        print("No regression vs baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
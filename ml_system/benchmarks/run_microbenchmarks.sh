@@ -0,0 +1,23 @@
+#!/bin/bash
+
+# ROOTUIP DDPredictor microbenchmarks
+#   ./run_microbenchmarks.sh save      - record a new baseline
+#   ./run_microbenchmarks.sh compare   - compare against the latest baseline and
+#                                        fail if any mean regresses by > THRESHOLD
+# Extra arguments are passed to pytest (e.g. -k predict_proba).
+
+set -e
+cd "$(dirname "$0")/../.."
+
+THRESHOLD=${THRESHOLD:-15%}
+STORAGE=${STORAGE:-file://ml-system/reports/benchmarks/micro}
+MODE=${1:-compare}
+shift || true
+
+ARGS=(-q -o python_files='bench_*.py' -p no:cacheprovider --benchmark-storage="$STORAGE" --benchmark-sort=name)
+
+if [ "$MODE" = "save" ]; then
+    python3 -m pytest "${ARGS[@]}" --benchmark-autosave "$@" ml_system/benchmarks
+else
+    python3 -m pytest "${ARGS[@]}" --benchmark-compare --benchmark-compare-fail=mean:"$THRESHOLD" "$@" ml_system/benchmarks
+fi
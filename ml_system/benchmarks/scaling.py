@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML API Worker Scaling Benchmark
+Runs ml_system.serve with increasing worker counts under the same load and
+reports throughput, latency, CPU and memory for each. Summed PSS next to
+summed RSS shows how much of the model the forked workers still share.
+
+    python -m ml_system.benchmarks.scaling --workers 1,2,4 --mix single --requests 4000
+    python -m ml_system.benchmarks.scaling --workers 1,2,4,8 --mix batch --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+
+from .load_test import (
+    DEFAULT_OUTPUT_DIR, MIXES, ProcessSampler, UvicornServer, Workload,
+    _free_port, _git_commit, drive, summarize
+)
+
+
+class PreforkServer(UvicornServer):
+    """ml_system.serve with a fixed worker count, run as a child process"""
+
+    def __init__(self, port: int, env: Dict[str, str], workers: int):
+        super().__init__(port, env)
+        self.workers = workers
+
+    def command(self) -> List[str]:
+        return [sys.executable, '-m', 'ml_system.serve', '--workers', str(self.workers),
+                '--host', '127.0.0.1', '--port', str(self.port)]
+
+
+class ProcessTreeSampler:
+    """CPU, RSS and PSS summed over the supervisor and its live workers"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def _pids(self) -> List[int]:
+        pids = [self.pid]
+        try:
+            with open(f'/proc/{self.pid}/task/{self.pid}/children') as f:
+                pids += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+        return pids
+
+    def sample(self) -> Dict[str, float]:
+        totals = {'cpu_seconds': 0.0, 'rss_mb': 0.0, 'pss_mb': 0.0}
+        for pid in self._pids():
+            try:
+                sample = ProcessSampler(pid).sample()
+            except OSError:
+                continue  # worker exited between listing and sampling
+            totals['cpu_seconds'] += sample['cpu_seconds']
+            totals['rss_mb'] += sample['rss_mb']
+            totals['pss_mb'] += _pss_mb(pid)
+        return totals
+
+
+def _pss_mb(pid: int) -> float:
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def run_workers(args, workers: int) -> Dict[str, Any]:
+    env = {'ROOTUIP_PREDICTION_CACHE_SIZE': str(args.cache_size)} if args.cache_size else {}
+    workload = Workload(MIXES[args.mix], args.batch_size, args.seed)
+    port = _free_port()
+    with PreforkServer(port, env, workers) as server:
+        sampler = ProcessTreeSampler(server.process.pid)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+            before = sampler.sample()
+            raw = await drive(client, workload, args.requests, args.concurrency, args.warmup)
+            after = sampler.sample()
+    results = summarize(raw, before, after)
+    results['workers'] = workers
+    results['server_pss_mb'] = round(after['pss_mb'], 1)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Measure ML API throughput scaling across worker counts')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='single')
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--cache-size', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    counts = [int(n) for n in args.workers.split(',')]
+
+    runs = []
+    for workers in counts:
+        results = asyncio.run(run_workers(args, workers))
+        runs.append(results)
+        baseline = runs[0]
+        efficiency = (results['throughput_rps'] / (baseline['throughput_rps'] * workers / baseline['workers'])
+                      if baseline['throughput_rps'] else 0.0)
+        results['scaling_efficiency'] = round(efficiency, 3)
+        print(f"{workers} workers: {results['throughput_rps']} req/s "
+              f"(efficiency {results['scaling_efficiency']}), p95 {results['latency'].get('p95_ms')}ms, "
+              f"rss {results['server_rss_mb']}MB, pss {results['server_pss_mb']}MB")
+
+    report = {
+        'benchmark': 'ml_api_worker_scaling',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'host': {'cpus': os.cpu_count()},
+        'config': {k: v for k, v in vars(args).items() if k != 'output_dir'},
+        'results': runs
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"scaling_{args.mix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {path}")
+    if os.cpu_count() and max(counts) > os.cpu_count():
+        print(f"Note: {max(counts)} workers on {os.cpu_count()} CPUs; scaling beyond the core count is not expected")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
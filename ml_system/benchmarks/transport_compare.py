@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML API Transport Benchmark
+Scores the same shipments through the JSON batch endpoint and the msgpack
+transport and reports payload bytes, CPU per prediction and latency for each.
+
+    python -m ml_system.benchmarks.transport_compare
+    python -m ml_system.benchmarks.transport_compare --batch-sizes 64,1000 --repeats 20
+
+Runs in-process over httpx's ASGI transport; request bodies are encoded before
+the timed loop, so the CPU figures cover server-side decode, validation,
+scoring and response encoding.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from . import BATCH_SIZES
+from .load_test import DEFAULT_OUTPUT_DIR, _git_commit, make_shipment
+
+
+def _json_body(shipments: List[Dict[str, float]]) -> bytes:
+    return json.dumps({'shipments': shipments}).encode()
+
+
+def _msgpack_body(shipments: List[Dict[str, float]]) -> bytes:
+    from ml_system import transport
+
+    names = list(shipments[0])
+    matrix = np.array([[s[name] for name in names] for s in shipments], dtype=np.float64)
+    return transport.encode_request(matrix, names)
+
+
+TRANSPORTS = {
+    'json': ('/predict/batch', 'application/json', _json_body),
+    'msgpack': ('/predict/batch/msgpack', 'application/x-msgpack', _msgpack_body)
+}
+
+
+async def measure(client: httpx.AsyncClient, name: str, shipments: List[Dict[str, float]],
+                  repeats: int, warmup: int) -> Dict[str, Any]:
+    path, content_type, encode = TRANSPORTS[name]
+    body = encode(shipments)
+    headers = {'content-type': content_type, 'cache-control': 'no-cache'}
+    for _ in range(warmup):
+        (await client.post(path, content=body, headers=headers)).raise_for_status()
+
+    latencies = []
+    response_bytes = 0
+    cpu_start = time.process_time()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        response_bytes = len(response.content)
+    cpu = time.process_time() - cpu_start
+
+    n = len(shipments)
+    return {
+        'request_bytes': len(body),
+        'response_bytes': response_bytes,
+        'bytes_per_prediction': round((len(body) + response_bytes) / n, 1),
+        'cpu_ms_per_prediction': round(1000 * cpu / (repeats * n), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 3)
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    from ml_system import transport
+    from ml_system.api import app
+
+    if not transport.msgpack_available():
+        raise SystemExit("msgpack is not installed; pip install msgpack")
+
+    rng = random.Random(args.seed)
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark') as client:
+        for batch_size in args.batch_sizes:
+            shipments = [make_shipment(rng) for _ in range(batch_size)]
+            repeats = max(3, args.repeats if batch_size <= 1000 else args.repeats // 4)
+            row = {'batch_size': batch_size}
+            for name in TRANSPORTS:
+                row[name] = await measure(client, name, shipments, repeats, args.warmup)
+            row['byte_ratio'] = round(row['json']['bytes_per_prediction'] / row['msgpack']['bytes_per_prediction'], 2)
+            row['cpu_ratio'] = round(row['json']['cpu_ms_per_prediction'] / row['msgpack']['cpu_ms_per_prediction'], 2)
+            rows.append(row)
+            print(f"batch {batch_size}: json {row['json']['bytes_per_prediction']} B/pred "
+                  f"{row['json']['cpu_ms_per_prediction']} ms/pred | msgpack "
+                  f"{row['msgpack']['bytes_per_prediction']} B/pred {row['msgpack']['cpu_ms_per_prediction']} ms/pred "
+                  f"| {row['byte_ratio']}x bytes, {row['cpu_ratio']}x cpu")
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare JSON and msgpack prediction transports')
+    parser.add_argument('--batch-sizes', default=','.join(str(n) for n in BATCH_SIZES[:3]))
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    args = parser.parse_args(argv)
+    args.batch_sizes = [int(n) for n in args.batch_sizes.split(',')]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    report = {
+        'benchmark': 'ml_api_transport',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'config': {k: v for k, v in vars(args).items() if k != 'output_dir'},
+        'results': results
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"transport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
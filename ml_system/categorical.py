@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Categorical Encodings
+Carrier, port and lane identifiers encoded as smoothed, frequency-capped D&D
+rates and served from hashed lookup tables stored in the model artifact.
+
+Each identifier is normalized and hashed once (blake2b, 64 bits) into a
+power-of-two table that holds the 64-bit fingerprint and the encoded rate, so
+serving is one hash and one array index per column. A slot whose fingerprint
+does not match, including an identifier below the frequency cap or one that
+lost a slot collision during fit, falls back to the training prior.
+Training-time encoding factorizes each column and hashes only the distinct
+values; counts come from np.bincount.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Raw identifiers accepted on requests: carrier SCAC, port of loading / discharge UN/LOCODE, lane
+CATEGORICAL_FEATURES = ('carrier_scac', 'pol_locode', 'pod_locode', 'lane')
+DEFAULT_BUCKETS = 2 ** 16
+DEFAULT_MIN_COUNT = 30
+DEFAULT_SMOOTHING = 20.0
+
+
+def encoded_name(column: str) -> str:
+    """Model feature name for an encoded identifier column"""
+    return f"{column}_dd_rate"
+
+
+def normalize(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip().upper()
+    return value or None
+
+
+def lane_of(pol: Any, pod: Any) -> Optional[str]:
+    """Lane identifier derived from the port pair when a caller does not send one"""
+    pol, pod = normalize(pol), normalize(pod)
+    return f"{pol}-{pod}" if pol and pod else None
+
+
+def fingerprint(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+
+def _fingerprints(uniques: Sequence[str]) -> np.ndarray:
+    return np.fromiter((fingerprint(v) for v in uniques), dtype=np.uint64, count=len(uniques))
+
+
+def _factorize(values) -> Tuple[np.ndarray, List[str]]:
+    """(codes, normalized uniques); missing values get code -1.
+
+    Raw values are factorized first, so normalization runs once per distinct
+    value rather than once per row.
+    """
+    import pandas as pd
+
+    codes, raw = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    merged, uniques = pd.factorize(pd.Series([normalize(v) for v in raw], dtype=object), use_na_sentinel=True)
+    return np.append(merged, -1)[codes], list(uniques)
+
+
+def _combine(*parts: Tuple[np.ndarray, List[str]]) -> Tuple[np.ndarray, List[str]]:
+    """First non-missing code per row across factorized columns, over their merged uniques"""
+    import pandas as pd
+
+    merged, uniques = pd.factorize(pd.Series([u for _, part in parts for u in part], dtype=object))
+    codes = np.full(len(parts[0][0]), -1, dtype=np.int64)
+    offset = 0
+    for part_codes, part_uniques in parts:
+        fill = (codes < 0) & (part_codes >= 0)
+        codes[fill] = merged[offset + part_codes[fill]]
+        offset += len(part_uniques)
+    return codes, list(uniques)
+
+
+def _lane_codes(frame) -> Tuple[np.ndarray, List[str]]:
+    """Lane codes from frame['lane'], filling gaps with pol_locode-pod_locode"""
+    import pandas as pd
+
+    n = len(frame)
+    parts = [_factorize(frame['lane'])] if 'lane' in frame else []
+    if 'pol_locode' in frame and 'pod_locode' in frame:
+        pol, pol_uniques = _factorize(frame['pol_locode'])
+        pod, pod_uniques = _factorize(frame['pod_locode'])
+        valid = (pol >= 0) & (pod >= 0)
+        codes = np.full(n, -1, dtype=np.int64)
+        codes[valid], pairs = pd.factorize(pol[valid] * len(pod_uniques) + pod[valid])
+        width = len(pod_uniques)
+        parts.append((codes, [f"{pol_uniques[k // width]}-{pod_uniques[k % width]}" for k in pairs]))
+    if not parts:
+        return np.full(n, -1, dtype=np.int64), []
+    return _combine(*parts) if len(parts) > 1 else parts[0]
+
+
+class CategoricalEncoder:
+    """Frequency-capped target encoding with hashed O(1) lookup tables"""
+
+    def __init__(self, columns: Sequence[str] = CATEGORICAL_FEATURES, n_buckets: int = DEFAULT_BUCKETS,
+                 min_count: int = DEFAULT_MIN_COUNT, smoothing: float = DEFAULT_SMOOTHING):
+        if n_buckets & (n_buckets - 1):
+            raise ValueError("n_buckets must be a power of two")
+        self.columns = list(columns)
+        self.n_buckets = n_buckets
+        self.min_count = min_count
+        self.smoothing = smoothing
+        self.prior = 0.0
+        self.fingerprints: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, int] = {}
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [encoded_name(column) for column in self.columns]
+
+    def _codes(self, frame, column) -> Tuple[np.ndarray, List[str]]:
+        if column == 'lane':
+            return _lane_codes(frame)
+        if column not in frame:
+            return np.full(len(frame), -1, dtype=np.int64), []
+        return _factorize(frame[column])
+
+    def _rates(self, sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Smoothed rate per category; categories under the frequency cap get the prior"""
+        rates = (sums + self.smoothing * self.prior) / (counts + self.smoothing)
+        return np.where(counts >= self.min_count, rates, self.prior)
+
+    def fit_transform(self, frame, y, folds: int = 5, seed: int = 42) -> np.ndarray:
+        """Fit the lookup tables on all rows and return out-of-fold encodings for them.
+
+        Each row is encoded from the other folds only, so the model never sees
+        a rate computed from its own label.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        n = len(y)
+        self.prior = float(y.mean()) if n else 0.0
+        fold = np.random.default_rng(seed).integers(0, folds, n)
+        encoded = np.empty((n, len(self.columns)), dtype=np.float64)
+
+        for j, column in enumerate(self.columns):
+            codes, uniques = self._codes(frame, column)
+            valid = codes >= 0
+            n_unique = len(uniques)
+            counts = np.bincount(codes[valid], minlength=n_unique).astype(np.float64)
+            sums = np.bincount(codes[valid], weights=y[valid], minlength=n_unique)
+            self._store(column, uniques, self._rates(sums, counts), counts)
+
+            # Per-fold stats in one bincount over (fold, code) pairs
+            flat = fold[valid] * n_unique + codes[valid]
+            fold_counts = np.bincount(flat, minlength=folds * n_unique).reshape(folds, n_unique)
+            fold_sums = np.bincount(flat, weights=y[valid], minlength=folds * n_unique).reshape(folds, n_unique)
+            oof = self._rates(sums - fold_sums, counts - fold_counts)
+            encoded[:, j] = self.prior
+            encoded[valid, j] = oof[fold[valid], codes[valid]]
+        return encoded
+
+    def _store(self, column: str, uniques: List[str], rates: np.ndarray, counts: np.ndarray):
+        fingerprints = np.zeros(self.n_buckets, dtype=np.uint64)
+        values = np.full(self.n_buckets, self.prior, dtype=np.float32)
+        keep = np.flatnonzero(counts >= self.min_count)
+        # Most frequent first, so a slot collision keeps the better-supported identifier
+        keep = keep[np.argsort(-counts[keep], kind='stable')]
+        hashes = _fingerprints([uniques[i] for i in keep])
+        slots = (hashes & np.uint64(self.n_buckets - 1)).astype(np.int64)
+        _, first = np.unique(slots, return_index=True)
+        fingerprints[slots[first]] = hashes[first]
+        values[slots[first]] = rates[keep[first]]
+        self.fingerprints[column] = fingerprints
+        self.values[column] = values
+        self.categories[column] = len(first)
+
+    def transform(self, frame) -> np.ndarray:
+        """Encode a DataFrame (or dict of columns) with the fitted tables"""
+        if isinstance(frame, dict):
+            import pandas as pd
+            frame = pd.DataFrame(frame)
+        n = len(frame)
+        encoded = np.full((n, len(self.columns)), self.prior, dtype=np.float64)
+        for j, column in enumerate(self.columns):
+            codes, uniques = self._codes(frame, column)
+            if not uniques:
+                continue
+            hashes = _fingerprints(uniques)
+            slots = (hashes & np.uint64(self.n_buckets - 1)).astype(np.int64)
+            table = self.values[column][slots].astype(np.float64)
+            table[self.fingerprints[column][slots] != hashes] = self.prior
+            valid = codes >= 0
+            encoded[valid, j] = table[codes[valid]]
+        return encoded
+
+    def encode_one(self, data: Mapping[str, Any]) -> Dict[str, float]:
+        """Encoded features for one request; one hash and one index per column"""
+        encoded = {}
+        mask = self.n_buckets - 1
+        for column in self.columns:
+            value = normalize(data.get(column))
+            if value is None and column == 'lane':
+                value = lane_of(data.get('pol_locode'), data.get('pod_locode'))
+            rate = self.prior
+            if value is not None:
+                h = fingerprint(value)
+                if int(self.fingerprints[column][h & mask]) == h:
+                    rate = float(self.values[column][h & mask])
+            encoded[encoded_name(column)] = rate
+        return encoded
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain arrays and numbers for the model artifact"""
+        return {
+            'columns': self.columns, 'n_buckets': self.n_buckets, 'min_count': self.min_count,
+            'smoothing': self.smoothing, 'prior': self.prior, 'categories': self.categories,
+            'fingerprints': self.fingerprints, 'values': self.values
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['CategoricalEncoder']:
+        if not data:
+            return None
+        encoder = cls(data['columns'], data['n_buckets'], data['min_count'], data['smoothing'])
+        encoder.prior = data['prior']
+        encoder.categories = dict(data['categories'])
+        encoder.fingerprints = dict(data['fingerprints'])
+        encoder.values = dict(data['values'])
+        return encoder
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Prediction Client
+Async client for the ML prediction API. Individual predict() calls are
+buffered and sent as /predict/batch requests over one pooled keep-alive
+httpx.AsyncClient, so many concurrent callers cost a few requests rather
+than one connection each.
+
+    async with AsyncPredictionClient('http://ml-api:8000') as client:
+        result = await client.predict(shipment)              # batched transparently
+        results = await client.predict_many(shipments)       # explicit batches
+
+A buffered batch is sent when it reaches max_batch_size or max_batch_delay
+after its first call, whichever comes first. At most max_concurrent_batches
+are in flight, and at most max_pending calls may be buffered or in flight;
+beyond that predict() waits (overflow='wait') or raises ClientOverloadedError
+(overflow='raise'). Connection errors, timeouts, 429 and 5xx are retried with
+capped exponential backoff and full jitter, honouring Retry-After; every
+attempt of a batch carries the same Idempotency-Key, so a retry of a request
+the server already answered is not scored or recorded twice. A shipment
+the API rejects as invalid fails only its own call; the rest of its batch is
+re-sent.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+DEFAULT_BASE_URL = 'http://localhost:8000'
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class PredictionError(RuntimeError):
+    """The API rejected a prediction or did not answer after all retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, detail: Any = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ClientOverloadedError(PredictionError):
+    """max_pending calls are already buffered or in flight (overflow='raise')"""
+
+
+class AsyncPredictionClient:
+    """Pooled, auto-batching, retrying client for the prediction API"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, *, tenant: Optional[str] = None,
+                 response_profile: str = 'minimal', max_batch_size: int = 256, max_batch_delay: float = 0.005,
+                 max_concurrent_batches: int = 4, max_pending: int = 10000, overflow: str = 'wait',
+                 retries: int = 3, backoff: float = 0.05, max_backoff: float = 2.0, timeout: float = 10.0,
+                 http2: bool = False, transport: Optional[httpx.AsyncBaseTransport] = None):
+        if overflow not in ('wait', 'raise'):
+            raise ValueError("overflow must be 'wait' or 'raise'")
+        self.response_profile = response_profile
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        headers = {'X-Tenant-ID': tenant} if tenant else {}
+        # One keep-alive connection per concurrent batch; http2=True multiplexes them (needs h2)
+        self._http = httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=timeout, http2=http2, transport=transport,
+            limits=httpx.Limits(max_connections=max_concurrent_batches,
+                                max_keepalive_connections=max_concurrent_batches))
+        self._batch_slots = asyncio.Semaphore(max_concurrent_batches)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._buffer: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._buffer_ready: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._closed = False
+        self.stats = {'calls': 0, 'batches': 0, 'requests': 0, 'retries': 0, 'failed': 0}
+
+    async def __aenter__(self) -> 'AsyncPredictionClient':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --- Public API ---
+
+    async def predict(self, shipment: Dict[str, Any]) -> Dict[str, Any]:
+        """Score one shipment; the call joins the next outgoing batch"""
+        if self._closed:
+            raise RuntimeError("client is closed")
+        if self.overflow == 'raise' and self._pending.locked():
+            raise ClientOverloadedError(f"{self.max_pending} predictions already pending")
+        await self._pending.acquire()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda _: self._pending.release())
+        self.stats['calls'] += 1
+        self._buffer.append((shipment, future))
+        self._wake_flusher()
+        return await future
+
+    async def predict_many(self, shipments: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score a known list directly in max_batch_size chunks, bypassing the buffer"""
+        futures = []
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(shipments), self.max_batch_size):
+            chunk = [(shipment, loop.create_future()) for shipment in shipments[start:start + self.max_batch_size]]
+            futures.extend(future for _, future in chunk)
+            self._dispatch(chunk)
+        return list(await asyncio.gather(*futures))
+
+    async def health(self) -> Dict[str, Any]:
+        response = await self._request('GET', '/health')
+        return response.json()
+
+    async def flush(self):
+        """Send everything buffered now and wait for all in-flight batches"""
+        self._send_buffer()
+        while self._in_flight:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    async def close(self):
+        """Flush pending calls, then close the connection pool"""
+        if self._closed:
+            return
+        self._closed = True
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        await self._http.aclose()
+
+    # --- Batching ---
+
+    def _wake_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._buffer_ready = asyncio.Event()
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+        if len(self._buffer) >= self.max_batch_size:
+            self._send_buffer()
+        self._buffer_ready.set()
+
+    async def _flush_loop(self):
+        """Send a partial batch max_batch_delay after its first call"""
+        while True:
+            await self._buffer_ready.wait()
+            self._buffer_ready.clear()
+            if not self._buffer:
+                continue
+            await asyncio.sleep(self.max_batch_delay)
+            self._send_buffer()
+
+    def _send_buffer(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.max_batch_size], self._buffer[self.max_batch_size:]
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        async with self._batch_slots:
+            self.stats['batches'] += 1
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                error = e if isinstance(e, PredictionError) else PredictionError(str(e))
+                for _, future in batch:
+                    self._fail(future, error)
+
+    async def _send_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        while batch:
+            # A new key for each distinct body: re-sending the valid rest is a different request
+            response = await self._request(
+                'POST', '/predict/batch', params={'profile': self.response_profile},
+                json={'shipments': [shipment for shipment, _ in batch]},
+                headers={'Idempotency-Key': os.urandom(16).hex()}, allow_statuses=(422,))
+            if response.status_code != 422:
+                predictions = response.json()['predictions']
+                for (_, future), result in zip(batch, predictions):
+                    if result.get('status') == 'failed':
+                        self._fail(future, PredictionError(result.get('error', 'prediction failed'), 200, result))
+                    elif not future.done():
+                        future.set_result(result)
+                return
+            # One invalid shipment rejects the whole request: fail it alone and re-send the others
+            detail = response.json().get('detail', [])
+            invalid = _invalid_rows(detail)
+            if not invalid:
+                raise PredictionError("Batch rejected by the API", 422, detail)
+            for i in invalid:
+                errors = [d for d in detail if _row_of(d) == i]
+                self._fail(batch[i][1], PredictionError("Invalid shipment", 422, errors))
+            batch = [item for i, item in enumerate(batch) if i not in invalid]
+
+    def _fail(self, future: asyncio.Future, error: Exception):
+        if not future.done():
+            self.stats['failed'] += 1
+            future.set_exception(error)
+
+    # --- Transport ---
+
+    async def _request(self, method: str, url: str, allow_statuses: Sequence[int] = (), **kwargs) -> httpx.Response:
+        """One API call with retries; raises PredictionError for non-retryable or exhausted failures"""
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            retry_after = None
+            try:
+                response = await self._http.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                error = PredictionError(f"{type(e).__name__}: {e}")
+            else:
+                if response.status_code < 400 or response.status_code in allow_statuses:
+                    return response
+                error = PredictionError(f"API returned {response.status_code}", response.status_code,
+                                        _detail(response))
+                if response.status_code not in RETRY_STATUSES and response.status_code < 500:
+                    raise error
+                retry_after = _retry_after(response)
+            if attempt >= self.retries:
+                raise error
+            attempt += 1
+            self.stats['retries'] += 1
+            await asyncio.sleep(retry_after if retry_after is not None else self._backoff_delay(attempt))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_backoff, backoff * 2**(attempt - 1))]"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+def _row_of(error: Dict[str, Any]) -> Optional[int]:
+    """Shipment index of a FastAPI validation error located at body.shipments.<i>..."""
+    loc = error.get('loc') or []
+    if len(loc) >= 3 and loc[0] == 'body' and loc[1] == 'shipments' and isinstance(loc[2], int):
+        return loc[2]
+    return None
+
+
+def _invalid_rows(detail: Any) -> set:
+    if not isinstance(detail, list):
+        return set()
+    rows = {_row_of(error) for error in detail if isinstance(error, dict)}
+    return set() if None in rows else rows
+
+
+def _detail(response: httpx.Response) -> Any:
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text
+    return data.get('detail') if isinstance(data, dict) else data
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
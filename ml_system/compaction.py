@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Forest Compaction
+Shrinks a trained RandomForestClassifier into a CompactForest: the smallest
+greedy subset of trees whose AUC stays within a tolerance of the full forest,
+optionally cut to a maximum depth, flattened into a few contiguous arrays.
+
+    python -m ml_system.compaction labelled.csv                       # live model
+    python -m ml_system.compaction labelled.csv --version 20250101.120000 --max-depth 10 --tolerance 0.002
+
+The CSV is a labelled set as written by ml_system.feedback (raw features,
+identifier columns and dd_occurred). Half of it selects trees, the other half
+measures the accuracy / latency / size trade-off; the compacted artifact is
+registered as a new version whose parent is the source version.
+
+Layout: one node table for all trees (feature uint8, threshold float32,
+children int32 pairs, positive-class value float32). Leaves point to
+themselves with an infinite threshold, so every row walks every tree for
+exactly max-depth steps with no branching, vectorized over rows and trees.
+Thresholds are rounded down to float32, which keeps each split's decision
+identical for the float32 inputs sklearn's trees compare against.
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.002
+# Rows x trees per traversal chunk, bounds the int32 node-index matrix at ~8 MB
+TRAVERSAL_CELLS = 2 ** 21
+CURVE_BATCH = 1024
+
+
+class CompactForest:
+    """Flattened binary forest with the predict_proba/classes_ surface DDPredictor uses"""
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray, value: np.ndarray,
+                 offsets: np.ndarray, depths: np.ndarray, importances: np.ndarray, classes: np.ndarray,
+                 n_features: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        # Node range of tree t is offsets[t]:offsets[t + 1]; its root is offsets[t]
+        self.offsets = offsets
+        self.depths = depths
+        self.importances = importances
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, model, max_depth: Optional[int] = None) -> 'CompactForest':
+        """Flatten a fitted binary forest; nodes deeper than max_depth are cut and their parent becomes a leaf"""
+        if len(model.classes_) != 2:
+            raise ValueError("CompactForest supports binary classifiers only")
+        parts = [_flatten_tree(tree.tree_, max_depth, model.n_features_in_) for tree in model.estimators_]
+        sizes = np.array([len(part[0]) for part in parts], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        children = np.concatenate([part[2] + offset for part, offset in zip(parts, offsets[:-1])])
+        return cls(
+            feature=np.concatenate([part[0] for part in parts]).astype(
+                np.uint8 if model.n_features_in_ <= 256 else np.int32),
+            threshold=np.concatenate([part[1] for part in parts]),
+            children=children.astype(np.int32),
+            value=np.concatenate([part[3] for part in parts]),
+            offsets=offsets,
+            depths=np.array([part[4] for part in parts], dtype=np.int32),
+            importances=np.stack([part[5] for part in parts]),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_
+        )
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.depths)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.value)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value,
+                                      self.offsets, self.depths, self.importances))
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        """Mean impurity-decrease importance over the kept trees, as in sklearn's forest"""
+        importances = self.importances.mean(axis=0, dtype=np.float64)
+        total = importances.sum()
+        return importances / total if total > 0 else importances
+
+    def subset(self, trees: Sequence[int]) -> 'CompactForest':
+        """A forest of the given trees (in that order), with node indices repacked"""
+        trees = np.asarray(trees, dtype=np.int64)
+        starts, ends = self.offsets[trees], self.offsets[trees + 1]
+        index = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        offsets = np.concatenate([[0], np.cumsum(ends - starts)])
+        shift = np.repeat(offsets[:-1] - starts, ends - starts).astype(np.int64)
+        return CompactForest(self.feature[index], self.threshold[index],
+                             (self.children[index] + shift[:, None]).astype(np.int32), self.value[index],
+                             offsets, self.depths[trees], self.importances[trees], self.classes_,
+                             self.n_features_in_)
+
+    def tree_probabilities(self, X) -> np.ndarray:
+        """Positive-class probability of every tree for every row, shape (rows, trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_trees = len(X), self.n_estimators
+        out = np.empty((n, n_trees), dtype=np.float32)
+        roots = self.offsets[:-1].astype(np.int64)
+        steps = int(self.depths.max()) if n_trees else 0
+        children = self.children.ravel()
+        chunk = max(1, TRAVERSAL_CELLS // max(n_trees, 1))
+        for start in range(0, n, chunk):
+            rows = X[start:start + chunk]
+            flat = rows.ravel()
+            row_base = (np.arange(len(rows), dtype=np.int64) * self.n_features_in_)[:, None]
+            node = np.broadcast_to(roots, (len(rows), n_trees)).copy()
+            for _ in range(steps):
+                x = flat.take(row_base + self.feature.take(node))
+                node = children.take(2 * node + (x > self.threshold.take(node)))
+            out[start:start + chunk] = self.value.take(node)
+        return out
+
+    def predict_proba(self, X) -> np.ndarray:
+        positive = self.tree_probabilities(X).mean(axis=1, dtype=np.float64)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take((self.predict_proba(X)[:, 1] > 0.5).astype(np.int64))
+
+
+def _node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    depth = np.zeros(len(left), dtype=np.int32)
+    frontier, d = np.array([0]), 0
+    while len(frontier):
+        depth[frontier] = d
+        nxt = np.concatenate([left[frontier], right[frontier]])
+        frontier, d = nxt[nxt >= 0], d + 1
+    return depth
+
+
+def _flatten_tree(tree, max_depth: Optional[int], n_features: int):
+    """(feature, threshold, children, value, depth, importances) of one tree, local node indices"""
+    left, right = tree.children_left, tree.children_right
+    depth = _node_depths(left, right)
+    keep = depth <= max_depth if max_depth is not None else np.ones(len(left), dtype=bool)
+    split = (left >= 0) & keep
+    if max_depth is not None:
+        split &= depth < max_depth
+    new_index = np.cumsum(keep) - 1
+    nodes = np.flatnonzero(keep)
+    is_split = split[nodes]
+
+    # Leaves loop onto themselves and always compare "not greater than +inf"
+    children = np.repeat(np.arange(len(nodes))[:, None], 2, axis=1)
+    children[is_split, 0] = new_index[left[nodes[is_split]]]
+    children[is_split, 1] = new_index[right[nodes[is_split]]]
+    feature = np.where(is_split, tree.feature[nodes], 0)
+    threshold = np.full(len(nodes), np.inf, dtype=np.float32)
+    exact = tree.threshold[nodes[is_split]]
+    rounded = exact.astype(np.float32)
+    # Largest float32 <= the float64 threshold: x <= t holds for the same float32 x
+    too_high = rounded.astype(np.float64) > exact
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    threshold[is_split] = rounded
+
+    counts = tree.value[nodes, 0, :].astype(np.float64)
+    value = (counts[:, 1] / counts.sum(axis=1)).astype(np.float32)
+
+    # Impurity-decrease importances over the kept splits
+    weighted = tree.weighted_n_node_samples * tree.impurity
+    splits = nodes[is_split]
+    decrease = weighted[splits] - weighted[left[splits]] - weighted[right[splits]]
+    importances = np.bincount(tree.feature[splits], weights=decrease, minlength=n_features)
+    total = importances.sum()
+    importances = (importances / total if total > 0 else importances).astype(np.float32)
+
+    tree_depth = int(depth[nodes].max()) if len(nodes) else 0
+    return feature, threshold, children, value, tree_depth, importances
+
+
+# === Tree selection and trade-off report ===
+
+def _auc_columns(scores: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Tie-aware ROC AUC of every column of scores (Mann-Whitney U over average ranks)"""
+    from scipy.stats import rankdata
+
+    positive = y.astype(bool)
+    n_pos = positive.sum()
+    n_neg = len(y) - n_pos
+    if not n_pos or not n_neg:
+        return np.full(scores.shape[1], np.nan)
+    ranks = rankdata(scores, axis=0)
+    return (ranks[positive].sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def _stratified_halves(y: np.ndarray, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    first, second = [], []
+    for label in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == label))
+        first.append(rows[::2])
+        second.append(rows[1::2])
+    return np.concatenate(first), np.concatenate(second)
+
+
+def select_trees(tree_probabilities: np.ndarray, y, tolerance: float = DEFAULT_TOLERANCE,
+                 seed: int = 42) -> Tuple[List[int], float]:
+    """Greedy forward selection over trees, stopping at the smallest subset within tolerance of
+    the full forest's AUC. Returns (selected tree indices in order, full-forest stopping AUC).
+
+    Trees are chosen on one stratified half of the rows and the stopping rule is checked on the
+    other: measured on the rows it was chosen on, a handful of trees already looks as good as
+    the whole forest.
+    """
+    y = np.asarray(y)
+    search, check = _stratified_halves(y, seed)
+    scores = tree_probabilities.astype(np.float64)
+    search_scores, check_scores = scores[search], scores[check]
+    y_search, y_check = y[search], y[check]
+    full_auc = float(_auc_columns(check_scores.sum(axis=1, keepdims=True), y_check)[0])
+    remaining = list(range(scores.shape[1]))
+    selected: List[int] = []
+    search_total = np.zeros(len(search))
+    check_total = np.zeros(len(check))
+    while remaining:
+        # Sums rank like means, so the candidates need no division
+        aucs = _auc_columns(search_total[:, None] + search_scores[:, remaining], y_search)
+        tree = remaining.pop(int(np.nanargmax(aucs)))
+        selected.append(tree)
+        search_total += search_scores[:, tree]
+        check_total += check_scores[:, tree]
+        if _auc_columns(check_total[:, None], y_check)[0] >= full_auc - tolerance:
+            break
+    return selected, full_auc
+
+
+def _latency_ms(model, X: np.ndarray, repeat: int) -> float:
+    """Median wall time of predict_proba(X) in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        times.append(time.perf_counter() - start)
+    return round(float(np.median(times)) * 1000, 4)
+
+
+def _point(model, positive: np.ndarray, y: np.ndarray, size_bytes: int, X: np.ndarray, **extra) -> Dict[str, Any]:
+    batch = np.resize(X, (CURVE_BATCH, X.shape[1]))
+    return {
+        **extra,
+        'auc_roc': round(float(_auc_columns(positive[:, None], y)[0]), 5),
+        'accuracy': round(float(((positive > 0.5) == y.astype(bool)).mean()), 5),
+        'size_bytes': size_bytes,
+        'latency_ms': {'single': _latency_ms(model, X[:1], 50), f'batch_{CURVE_BATCH}': _latency_ms(model, batch, 5)}
+    }
+
+
+def compact_forest(model, X_select, y_select, X_holdout=None, y_holdout=None,
+                   tolerance: float = DEFAULT_TOLERANCE, max_depth: Optional[int] = None
+                   ) -> Tuple[CompactForest, Dict[str, Any]]:
+    """Compact a fitted forest and report the accuracy / latency / size trade-off.
+
+    Trees are selected on (X_select, y_select); the report is measured on the
+    holdout when given (otherwise on the selection rows, which flatters the subset).
+    """
+    X_select = np.asarray(X_select, dtype=np.float64)
+    y_select = np.asarray(y_select)
+    X_report = X_select if X_holdout is None else np.asarray(X_holdout, dtype=np.float64)
+    y_report = y_select if y_holdout is None else np.asarray(y_holdout)
+
+    flat = CompactForest.from_sklearn(model, max_depth=max_depth)
+    selected, full_auc = select_trees(flat.tree_probabilities(X_select), y_select, tolerance)
+    compact = flat.subset(selected)
+
+    # Curve over prefixes of the greedy order; past the selected count the remaining trees follow
+    # in training order, since the greedy search stops once the tolerance is met
+    chosen = set(selected)
+    order = selected + [t for t in range(flat.n_estimators) if t not in chosen]
+    report_trees = flat.tree_probabilities(X_report)
+    cumulative = np.cumsum(report_trees[:, order], axis=1, dtype=np.float64)
+    sizes = sorted({2 ** k for k in range(int(np.log2(len(order))) + 1)} | {len(selected), len(order)})
+    curve = []
+    for k in sizes:
+        candidate = compact if k == len(selected) else flat.subset(order[:k])
+        curve.append(_point(candidate, cumulative[:, k - 1] / k, y_report, candidate.nbytes, X_report,
+                            n_trees=k, max_depth=int(candidate.depths.max())))
+
+    baseline = _point(model, model.predict_proba(X_report)[:, 1], y_report, len(pickle.dumps(model)), X_report,
+                      n_trees=len(model.estimators_), max_depth=int(max(t.tree_.max_depth for t in model.estimators_)))
+    selected_point = next(p for p in curve if p['n_trees'] == len(selected))
+    report = {
+        'tolerance': tolerance,
+        'max_depth': max_depth,
+        'stopping_auc_full': round(full_auc, 5),
+        'selection_rows': len(y_select),
+        'report_rows': len(y_report),
+        'evaluated_on': 'selection' if X_holdout is None else 'holdout',
+        'trees': selected,
+        'node_count': compact.node_count,
+        'baseline': baseline,
+        'compacted': selected_point,
+        'size_ratio': round(selected_point['size_bytes'] / baseline['size_bytes'], 4),
+        'curve': curve
+    }
+    return compact, report
+
+
+def compaction_summary(report: Dict[str, Any]) -> str:
+    baseline, compacted = report['baseline'], report['compacted']
+    return (f"{baseline['n_trees']} -> {compacted['n_trees']} trees (depth <= {compacted['max_depth']}), "
+            f"AUC {baseline['auc_roc']:.4f} -> {compacted['auc_roc']:.4f}, "
+            f"{baseline['size_bytes'] / 1e6:.1f} MB -> {compacted['size_bytes'] / 1e6:.2f} MB, "
+            f"single-row {baseline['latency_ms']['single']:.2f} ms -> {compacted['latency_ms']['single']:.2f} ms")
+
+
+def compacted_artifact(model_data: Dict[str, Any], compact: CompactForest, report: Dict[str, Any],
+                       parent_version: Optional[str]) -> Dict[str, Any]:
+    """Artifact dict for a compacted model; 'compaction' points back at the uncompacted parent"""
+    return dict(model_data, model=compact,
+                compaction={'parent_version': parent_version,
+                            **{k: v for k, v in report.items() if k != 'curve'}})
+
+
+def main(argv=None) -> int:
+    from .feedback import LABEL_COLUMN
+    from .config import get_config
+    from .registry import ModelRegistry
+    from .train_model import model_inputs
+
+    parser = argparse.ArgumentParser(description='Compact a registered forest into a smaller, faster version')
+    parser.add_argument('labelled', help='Labelled CSV (features, identifiers, dd_occurred)')
+    parser.add_argument('--models-dir', default=get_config().models_dir)
+    parser.add_argument('--version', help='Registry version to compact (default: the live model)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--max-depth', type=int)
+    parser.add_argument('--promote', action='store_true', help='Promote the compacted version')
+    parser.add_argument('--report', help='Also write the trade-off report to this JSON file')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    registry = ModelRegistry.for_dir(args.models_dir)
+    tenant = None
+    if args.version:
+        model_data = registry.load(args.version)
+        tenant = next(v for v in registry.versions() if v['version'] == args.version).get('tenant')
+    else:
+        with open(registry.live_path, 'rb') as f:
+            model_data = pickle.load(f)
+    if isinstance(model_data['model'], CompactForest):
+        print("Model is already compacted; compact its parent version instead", file=sys.stderr)
+        return 1
+    parent = str(model_data.get('model_version'))
+
+    frame = pd.read_csv(args.labelled)
+    X = model_inputs(model_data, frame)
+    y = frame[LABEL_COLUMN].astype(int)
+    X_select, X_holdout, y_select, y_holdout = train_test_split(X, y, test_size=0.5, stratify=y, random_state=42)
+    compact, report = compact_forest(model_data['model'], X_select, y_select, X_holdout, y_holdout,
+                                     tolerance=args.tolerance, max_depth=args.max_depth)
+    print(compaction_summary(report))
+
+    metrics = {'auc_roc': report['compacted']['auc_roc'], 'accuracy': report['compacted']['accuracy'],
+               'compaction': report}
+    version = registry.register(compacted_artifact(model_data, compact, report, parent), metrics,
+                                parent=parent, version=f"{datetime.now():%Y%m%d.%H%M%S}.compact", tenant=tenant)
+    print(f"Registered {version}")
+    if args.promote:
+        registry.promote(version)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML Configuration
+Every file location and the main performance knobs of the ML service in one
+typed object, loaded once per process and validated at startup.
+
+Values come from, in increasing precedence: the defaults below, a JSON or
+TOML file named by ROOTUIP_CONFIG (keys are the field names), and the
+environment variables listed in each field's metadata. Paths left unset are
+derived from home_dir, so one ROOTUIP_HOME moves a whole instance, and a
+relative path is taken relative to home_dir. Hot files can be placed on fast
+storage one by one:
+
+    ROOTUIP_HOME=/srv/rootuip-b                     # a second, isolated instance
+    ROOTUIP_MODEL_PATH=/mnt/nvme/models/dnd_model.pkl
+    ROOTUIP_HISTORY_DIR=/dev/shm/rootuip/prediction_history
+    ROOTUIP_HISTORY_FLUSH_SECONDS=1                 # buffer history appends
+    ROOTUIP_TENANT_MODELS=off                       # switches take 1/0, true/false, yes/no, on/off
+
+    python -m ml_system.config      # print the effective configuration and check it
+"""
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Mapping, Optional, Union, get_args, get_origin
+
+DEFAULT_HOME = '/home/iii/ROOTUIP'
+
+# Fields that name directories the service writes into, and files whose directory it writes into
+_DIRECTORIES = ('models_dir', 'data_dir', 'history_dir', 'reports_dir', 'profiles_dir', 'risk_events_dir')
+_FILES = ('model_path', 'fleet_db')
+
+
+class ConfigError(ValueError):
+    """The configuration file or an environment override is invalid"""
+
+
+def _env(name: str) -> Dict[str, str]:
+    return {'env': name}
+
+
+@dataclass(frozen=True)
+class MLConfig:
+    """Paths are absolute after construction; None means derived from home_dir"""
+
+    home_dir: str = field(default=DEFAULT_HOME, metadata=_env('ROOTUIP_HOME'))
+    # Model artifacts and the registry; model_path is the promoted model the API serves
+    models_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_MODELS_DIR'))
+    model_path: Optional[str] = field(default=None, metadata=_env('ROOTUIP_MODEL_PATH'))
+    # Training samples, labelled outcomes and the SQLite stores
+    data_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_DATA_DIR'))
+    history_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_HISTORY_DIR'))
+    reports_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_REPORTS_DIR'))
+    profiles_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_PROFILE_DIR'))
+    # '' disables the feature store
+    feature_store_path: Optional[str] = field(default=None, metadata=_env('ROOTUIP_FEATURE_STORE'))
+    shipment_events_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_SHIPMENT_EVENTS_DIR'))
+    fleet_db: Optional[str] = field(default=None, metadata=_env('ROOTUIP_FLEET_DB'))
+    risk_events_dir: Optional[str] = field(default=None, metadata=_env('ROOTUIP_RISK_EVENTS_DIR'))
+
+    # Rows per scheduled inference chunk and inference threads per API worker (see scheduler.py)
+    batch_chunk_size: int = field(default=1024, metadata=_env('ROOTUIP_SCHEDULER_CHUNK'))
+    inference_workers: int = field(default=2, metadata=_env('ROOTUIP_SCHEDULER_WORKERS'))
+    # Prediction cache entries (0 disables), memory cap and TTL (see prediction_cache.py)
+    cache_size: int = field(default=0, metadata=_env('ROOTUIP_PREDICTION_CACHE_SIZE'))
+    cache_mb: float = field(default=64.0, metadata=_env('ROOTUIP_PREDICTION_CACHE_MB'))
+    cache_ttl_seconds: float = field(default=900.0, metadata=_env('ROOTUIP_PREDICTION_CACHE_TTL'))
+    # History appends are buffered for this long (0 writes through on every request),
+    # or until this many records are waiting
+    history_flush_seconds: float = field(default=0.0, metadata=_env('ROOTUIP_HISTORY_FLUSH_SECONDS'))
+    history_buffer_records: int = field(default=10000, metadata=_env('ROOTUIP_HISTORY_BUFFER_RECORDS'))
+    # What serves while no trained model is present: 'synthetic', 'rules' or 'fail' (see fallback.py)
+    model_fallback: str = field(default='synthetic', metadata=_env('ROOTUIP_MODEL_FALLBACK'))
+    # Seconds between feature store reload checks (see feature_store.py)
+    feature_store_reload_seconds: float = field(default=30.0, metadata=_env('ROOTUIP_FEATURE_STORE_RELOAD_SECONDS'))
+    # Idempotency-Key replay store: entries (0 disables), memory cap and TTL (see idempotency.py)
+    idempotency_size: int = field(default=10000, metadata=_env('ROOTUIP_IDEMPOTENCY_SIZE'))
+    idempotency_mb: float = field(default=64.0, metadata=_env('ROOTUIP_IDEMPOTENCY_MB'))
+    idempotency_ttl_seconds: float = field(default=600.0, metadata=_env('ROOTUIP_IDEMPOTENCY_TTL'))
+    # Per-tenant model routing, its memory cap and comma-separated tenants loaded at startup (see tenancy.py)
+    tenant_models: bool = field(default=True, metadata=_env('ROOTUIP_TENANT_MODELS'))
+    tenant_models_mb: float = field(default=1024.0, metadata=_env('ROOTUIP_TENANT_MODELS_MB'))
+    tenant_preload: str = field(default='', metadata=_env('ROOTUIP_TENANT_PRELOAD'))
+    # Input drift monitoring window (see drift.py)
+    drift_enabled: bool = field(default=True, metadata=_env('ROOTUIP_DRIFT_ENABLED'))
+    drift_window_seconds: float = field(default=3600.0, metadata=_env('ROOTUIP_DRIFT_WINDOW_SECONDS'))
+    drift_min_samples: int = field(default=500, metadata=_env('ROOTUIP_DRIFT_MIN_SAMPLES'))
+    # /stream/risk limits (see streaming.py)
+    stream_max_subscribers: int = field(default=1000, metadata=_env('ROOTUIP_STREAM_MAX_SUBSCRIBERS'))
+    stream_max_shipments: int = field(default=1000, metadata=_env('ROOTUIP_STREAM_MAX_SHIPMENTS'))
+    # Priority scheduling (off runs inference inline); unset limits take the scheduler's defaults
+    scheduler_enabled: bool = field(default=True, metadata=_env('ROOTUIP_SCHEDULER'))
+    scheduler_interactive_concurrency: Optional[int] = field(
+        default=None, metadata=_env('ROOTUIP_SCHEDULER_INTERACTIVE_CONCURRENCY'))
+    scheduler_bulk_concurrency: Optional[int] = field(default=None, metadata=_env('ROOTUIP_SCHEDULER_BULK_CONCURRENCY'))
+    scheduler_interactive_max_wait: Optional[float] = field(
+        default=None, metadata=_env('ROOTUIP_SCHEDULER_INTERACTIVE_MAX_WAIT'))
+    scheduler_bulk_max_wait: Optional[float] = field(default=None, metadata=_env('ROOTUIP_SCHEDULER_BULK_MAX_WAIT'))
+    # Sampled request profiling (see profiling.py)
+    profile_sample_rate: float = field(default=0.0, metadata=_env('ROOTUIP_PROFILE_SAMPLE_RATE'))
+    profile_mode: str = field(default='stages', metadata=_env('ROOTUIP_PROFILE_MODE'))
+    profile_allow_header: bool = field(default=False, metadata=_env('ROOTUIP_PROFILE_ALLOW_HEADER'))
+
+    def __post_init__(self):
+        home = os.path.abspath(os.path.expanduser(self.home_dir))
+        ml_home = os.path.join(home, 'ml-system')
+        models_dir = self._path(self.models_dir, home, os.path.join(home, 'models'))
+        data_dir = self._path(self.data_dir, home, os.path.join(ml_home, 'data'))
+        reports_dir = self._path(self.reports_dir, home, os.path.join(ml_home, 'reports'))
+        derived = {
+            'home_dir': home,
+            'models_dir': models_dir,
+            'model_path': self._path(self.model_path, home, os.path.join(models_dir, 'dnd_model.pkl')),
+            'data_dir': data_dir,
+            'history_dir': self._path(self.history_dir, home, os.path.join(ml_home, 'prediction_history')),
+            'reports_dir': reports_dir,
+            'profiles_dir': self._path(self.profiles_dir, home, os.path.join(reports_dir, 'profiles')),
+            'feature_store_path': self._path(self.feature_store_path, home,
+                                             os.path.join(data_dir, 'feature_store.sqlite')),
+            'shipment_events_dir': self._path(self.shipment_events_dir, home,
+                                              os.path.join(data_dir, 'shipment_events')),
+            'fleet_db': self._path(self.fleet_db, home, os.path.join(data_dir, 'fleet.sqlite')),
+            'risk_events_dir': self._path(self.risk_events_dir, home, os.path.join(ml_home, 'risk_events'))
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    @staticmethod
+    def _path(value: Optional[str], home: str, default: str) -> str:
+        if value is None:
+            return default
+        if value == '':
+            return ''
+        return os.path.normpath(os.path.join(home, os.path.expanduser(value)))
+
+    # --- loading ---
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, environ: Optional[Mapping[str, str]] = None) -> 'MLConfig':
+        """Defaults, then the file at path (or ROOTUIP_CONFIG), then environment overrides.
+
+        Raises ConfigError naming every unknown key, unparseable value and out-of-range knob.
+        """
+        environ = os.environ if environ is None else environ
+        path = path or environ.get('ROOTUIP_CONFIG')
+        values: Dict[str, Any] = {}
+        sources: Dict[str, str] = {}
+        errors: List[str] = []
+        known = {f.name: f for f in fields(cls)}
+
+        if path:
+            for name, value in _read_file(path).items():
+                if name not in known:
+                    errors.append(f"{path}: unknown setting '{name}'")
+                    continue
+                values[name] = value
+                sources[name] = path
+        for f in fields(cls):
+            name = f.metadata.get('env')
+            if name and name in environ:
+                values[f.name] = environ[name]
+                sources[f.name] = name
+
+        for name, value in list(values.items()):
+            try:
+                values[name] = _coerce(known[name].type, value)
+            except (TypeError, ValueError):
+                errors.append(f"{sources[name]}: {name} must be {_type_name(known[name].type)}, got {value!r}")
+                del values[name]
+        config = cls(**values)
+        errors.extend(config._range_errors())
+        if errors:
+            raise ConfigError("Invalid ML configuration:\n  " + "\n  ".join(errors))
+        return config
+
+    def _range_errors(self) -> List[str]:
+        from .fallback import FALLBACK_POLICIES
+        from .profiling import PROFILE_MODES
+
+        errors = []
+        for name in ('batch_chunk_size', 'inference_workers', 'history_buffer_records', 'drift_min_samples',
+                     'stream_max_subscribers', 'stream_max_shipments', 'scheduler_interactive_concurrency',
+                     'scheduler_bulk_concurrency'):
+            value = getattr(self, name)
+            if value is not None and value < 1:
+                errors.append(f"{name} must be at least 1")
+        for name in ('cache_size', 'cache_ttl_seconds', 'history_flush_seconds', 'feature_store_reload_seconds',
+                     'idempotency_size', 'scheduler_interactive_max_wait', 'scheduler_bulk_max_wait'):
+            value = getattr(self, name)
+            if value is not None and value < 0:
+                errors.append(f"{name} must not be negative")
+        for name in ('cache_mb', 'idempotency_mb', 'idempotency_ttl_seconds', 'tenant_models_mb',
+                     'drift_window_seconds'):
+            if getattr(self, name) <= 0:
+                errors.append(f"{name} must be positive")
+        if not 0 <= self.profile_sample_rate <= 1:
+            errors.append("profile_sample_rate must be between 0 and 1")
+        if self.model_fallback not in FALLBACK_POLICIES:
+            errors.append(f"model_fallback must be one of {FALLBACK_POLICIES}, got {self.model_fallback!r}")
+        if self.profile_mode not in PROFILE_MODES:
+            errors.append(f"profile_mode must be one of {PROFILE_MODES}, got {self.profile_mode!r}")
+        for name in _DIRECTORIES + _FILES + ('shipment_events_dir',):
+            if not getattr(self, name):
+                errors.append(f"{name} must not be empty")
+        return errors
+
+    def path_problems(self) -> List[str]:
+        """Locations the service could not create or write; checked once at startup.
+
+        Nothing is created: a missing directory is fine if its nearest existing
+        ancestor is a writable directory.
+        """
+        problems = []
+        locations = [(name, getattr(self, name)) for name in _DIRECTORIES]
+        locations += [(name, os.path.dirname(getattr(self, name))) for name in _FILES]
+        for name, directory in locations:
+            existing = directory
+            while not os.path.exists(existing):
+                existing = os.path.dirname(existing)
+            if not os.path.isdir(existing):
+                problems.append(f"{name}: {existing} is not a directory")
+            elif not os.access(existing, os.W_OK | os.X_OK):
+                problems.append(f"{name}: {existing} is not writable")
+        return problems
+
+    def check(self) -> 'MLConfig':
+        """Raise ConfigError if any location is unusable; returns self"""
+        problems = self.path_problems()
+        if problems:
+            raise ConfigError("Unusable ML paths:\n  " + "\n  ".join(problems))
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _read_file(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        raise ConfigError(f"Cannot read ML configuration {path}: {e}")
+    try:
+        if path.endswith('.toml'):
+            import tomllib
+            data = tomllib.loads(raw.decode())
+        else:
+            data = json.loads(raw)
+    except ValueError as e:
+        raise ConfigError(f"Cannot parse ML configuration {path}: {e}")
+    if not isinstance(data, dict):
+        raise ConfigError(f"ML configuration {path} must be a table of settings")
+    return data
+
+
+_SWITCH_VALUES = {'1': True, 'true': True, 'yes': True, 'on': True,
+                  '0': False, 'false': False, 'no': False, 'off': False}
+
+
+def _unwrap(annotation: Any) -> Any:
+    """int for Optional[int], and so on"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _coerce(annotation: Any, value: Any) -> Any:
+    annotation = _unwrap(annotation)
+    if annotation is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in _SWITCH_VALUES:
+            return _SWITCH_VALUES[value.strip().lower()]
+        raise ValueError(value)
+    target = {int: int, float: float, 'int': int, 'float': float}.get(annotation, str)
+    if isinstance(value, bool) or (target is not str and isinstance(value, str) and not value.strip()):
+        raise ValueError(value)
+    if target is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    if target is str and not isinstance(value, str):
+        raise TypeError(value)
+    return target(value)
+
+
+def _type_name(annotation: Any) -> str:
+    return {int: 'an integer', float: 'a number', bool: 'on or off', 'int': 'an integer',
+            'float': 'a number'}.get(_unwrap(annotation), 'a string')
+
+
+# Pure defaults (no file, no environment); library defaults come from get_config() instead
+DEFAULTS = MLConfig()
+
+_config: Optional[MLConfig] = None
+
+
+def get_config() -> MLConfig:
+    """The process configuration, loaded from ROOTUIP_CONFIG and the environment on first use"""
+    global _config
+    if _config is None:
+        _config = MLConfig.load()
+    return _config
+
+
+def set_config(config: Optional[MLConfig]):
+    """Replace the process configuration (None reloads it on next use); for tests and embedding"""
+    global _config
+    _config = config
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Show and check the effective ML configuration')
+    parser.add_argument('--config', help='JSON or TOML settings file (default: $ROOTUIP_CONFIG)')
+    args = parser.parse_args(argv)
+    try:
+        config = MLConfig.load(args.config)
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(config.to_dict(), indent=2))
+    problems = config.path_problems()
+    for problem in problems:
+        print(f"warning: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
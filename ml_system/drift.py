@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Feature Drift Monitor
+Streaming per-feature statistics over live prediction inputs, compared against
+the training distributions DDModelTrainer stores with the model.
+
+The predict path only appends raw feature rows to a bounded buffer; the buffer
+is folded into Welford moments and fixed-bin histograms in vectorized batches,
+so memory is constant and the per-prediction cost is an append.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import MLConfig, get_config
+from .metrics import FEATURE_DRIFT_PSI, FEATURE_OUT_OF_RANGE
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+REFERENCE_BINS = 10
+# Conventional PSI bands: below 0.1 stable, up to 0.25 moderate, above that significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+_EPSILON = 1e-4
+
+
+def build_reference(X: np.ndarray, feature_names: Sequence[str], bins: int = REFERENCE_BINS) -> Dict[str, Any]:
+    """Reference distributions for raw (unscaled) training features.
+
+    Bin edges are training quantiles, bounded by the training min and max, so
+    each bin holds ~1/bins of the reference and values outside the trained
+    range are counted separately.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for i, name in enumerate(feature_names):
+        column = X[:, i]
+        edges = np.unique(np.quantile(column, np.linspace(0, 1, bins + 1)))
+        if len(edges) < 2:
+            edges = np.array([edges[0], edges[0]])
+        counts = _bin_counts(column[:, None], edges[None, :])[0]
+        features[name] = {
+            'edges': edges.tolist(),
+            'proportions': (counts[1:-1] / len(column)).tolist(),
+            'mean': float(column.mean()),
+            'std': float(column.std()),
+            'min': float(edges[0]),
+            'max': float(edges[-1])
+        }
+    return {'n_samples': int(len(X)), 'bins': bins, 'features': features}
+
+
+def _bin_counts(X: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Per-feature histogram counts: column 0 is below edges[0], the last column above edges[-1].
+
+    edges is (n_features, n_edges), padded with +inf; X is (n_rows, n_features).
+    """
+    n_features, n_edges = edges.shape
+    # Index of the bin each value falls into; the top edge is inclusive like np.histogram
+    codes = (X[:, :, None] >= edges[None, :, :]).sum(axis=2)
+    codes = np.where(X == edges[np.arange(n_features), _last_finite(edges)], codes - 1, codes)
+    offsets = np.arange(n_features)[None, :] * (n_edges + 1)
+    flat = np.bincount((codes + offsets).ravel(), minlength=n_features * (n_edges + 1))
+    return flat.reshape(n_features, n_edges + 1)
+
+
+def _last_finite(edges: np.ndarray) -> np.ndarray:
+    return np.isfinite(edges).sum(axis=1) - 1
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index between two sets of bin proportions"""
+    expected = np.clip(expected, _EPSILON, None)
+    actual = np.clip(actual, _EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_binned(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Kolmogorov-Smirnov statistic evaluated at the reference bin edges"""
+    return float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+
+
+class _WindowStats:
+    """Welford moments and histogram counts for one window, all features at once"""
+
+    def __init__(self, n_features: int, n_edges: int):
+        self.started = time.time()
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.hist = np.zeros((n_features, n_edges + 1), dtype=np.int64)
+
+    def update(self, X: np.ndarray, edges: np.ndarray):
+        # Chan et al. pairwise merge of the batch moments into the running ones
+        n = len(X)
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.hist += _bin_counts(X, edges)
+
+
+class DriftMonitor:
+    """Compares live inputs with the model's reference distributions.
+
+    observe()/observe_many() buffer rows; stats are folded in every
+    buffer_size rows. The current window rolls over after window_seconds and
+    the report falls back to the previous window until the new one has
+    min_samples rows.
+    """
+
+    def __init__(self, buffer_size: int = 256, window_seconds: float = 3600.0,
+                 min_samples: int = 500, check_interval: float = 60.0):
+        self.buffer_size = buffer_size
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self.set_reference(None, ())
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> Optional['DriftMonitor']:
+        """Monitor from the configured drift_* settings; ROOTUIP_DRIFT_ENABLED=0 disables monitoring"""
+        config = config or get_config()
+        if not config.drift_enabled:
+            return None
+        return cls(window_seconds=config.drift_window_seconds, min_samples=config.drift_min_samples)
+
+    def set_reference(self, reference: Optional[Dict[str, Any]], feature_names: Sequence[str]):
+        """Install a model's reference distributions and reset all windows"""
+        with self._lock:
+            self.reference = reference
+            self.feature_names: List[str] = list(feature_names)
+            self._buffer: List[Sequence[float]] = []
+            self._previous: Optional[_WindowStats] = None
+            self._current: Optional[_WindowStats] = None
+            self._next_check = time.monotonic() + self.check_interval
+            if reference is None:
+                self._columns = []
+                return
+            # Only features with a reference are tracked; columns index into the predictor's rows
+            self._columns = [i for i, name in enumerate(self.feature_names) if name in reference['features']]
+            edge_lists = [reference['features'][self.feature_names[i]]['edges'] for i in self._columns]
+            width = max(len(edges) for edges in edge_lists)
+            self._edges = np.full((len(edge_lists), width), np.inf)
+            for row, edges in enumerate(edge_lists):
+                self._edges[row, :len(edges)] = edges
+            self._current = _WindowStats(len(self._columns), width)
+
+    @property
+    def active(self) -> bool:
+        return self.reference is not None
+
+    def observe(self, row: Sequence[float]):
+        """Record one prepared feature row (predictor feature order)"""
+        if self.reference is None:
+            return
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) < self.buffer_size:
+                return
+            self._fold()
+        self._maybe_check()
+
+    def observe_many(self, rows):
+        if self.reference is None or not len(rows):
+            return
+        with self._lock:
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.buffer_size:
+                self._fold()
+        self._maybe_check()
+
+    def _fold(self):
+        """Move buffered rows into the current window (caller holds the lock)"""
+        if not self._buffer:
+            return
+        X = np.asarray(self._buffer, dtype=np.float64)[:, self._columns]
+        self._buffer = []
+        if time.time() - self._current.started >= self.window_seconds:
+            self._previous = self._current
+            self._current = _WindowStats(len(self._columns), self._edges.shape[1])
+        self._current.update(X, self._edges)
+
+    def _maybe_check(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        report = self.report()
+        drifted = [name for name, score in report.get('features', {}).items() if score['status'] == 'significant']
+        if drifted:
+            logger.warning(f"Significant input drift in {', '.join(drifted)}",
+                           extra={'event': 'feature_drift', 'features': drifted})
+
+    def report(self) -> Dict[str, Any]:
+        """PSI, binned KS, moments and out-of-range share per feature; also updates the gauges"""
+        with self._lock:
+            if self.reference is None:
+                return {'active': False, 'reason': 'model has no reference distributions'}
+            self._fold()
+            window = self._current
+            if window.count < self.min_samples and self._previous is not None:
+                window = self._previous
+            if window.count == 0:
+                return {'active': True, 'samples': 0, 'features': {}}
+            hist = window.hist.copy()
+            mean, m2, count, started = window.mean.copy(), window.m2.copy(), window.count, window.started
+            reference, names = self.reference, [self.feature_names[i] for i in self._columns]
+
+        features = {}
+        for row, name in enumerate(names):
+            ref = reference['features'][name]
+            n_bins = len(ref['proportions'])
+            counts = hist[row]
+            # Values outside the trained range join the edge bins for PSI/KS and are reported on their own
+            in_range = counts[1:n_bins + 1].astype(np.float64)
+            in_range[0] += counts[0]
+            in_range[-1] += counts[n_bins + 1:].sum()
+            actual = in_range / count
+            expected = np.asarray(ref['proportions'])
+            out_of_range = float((counts[0] + counts[n_bins + 1:].sum()) / count)
+            score = psi(expected, actual)
+            features[name] = {
+                'psi': round(score, 4),
+                'ks': round(ks_binned(expected, actual), 4),
+                'status': ('significant' if score >= PSI_SIGNIFICANT else
+                           'moderate' if score >= PSI_MODERATE else 'stable'),
+                'mean': round(float(mean[row]), 4),
+                'std': round(float(np.sqrt(m2[row] / count)), 4),
+                'reference_mean': round(ref['mean'], 4),
+                'reference_std': round(ref['std'], 4),
+                'out_of_range_fraction': round(out_of_range, 4)
+            }
+            FEATURE_DRIFT_PSI.labels(name).set(score)
+            FEATURE_OUT_OF_RANGE.labels(name).set(out_of_range)
+
+        return {
+            'active': True,
+            'samples': int(count),
+            'window_started': started,
+            'reference_samples': reference['n_samples'],
+            'features': features
+        }
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Model Evaluation
+Point metrics and bootstrap confidence intervals from a single predict_proba
+pass.
+
+Every metric is a function of weighted confusion counts (and, for AUC,
+weighted per-score counts), so a bootstrap resample is just a row of
+multinomial weights: a chunk of resamples becomes a few matrix products over
+the fixed probability vector instead of re-indexing and re-scoring the data.
+Chunks are seeded from one SeedSequence and run on a thread pool; the result
+depends only on the seed, not on the number of workers.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+CI_METRICS = ('accuracy', 'precision', 'recall', 'f1_score', 'auc_roc')
+DEFAULT_RESAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_SEED = 42
+CHUNK_SIZE = 250
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator with 0 where the denominator is 0 (sklearn's zero_division=0)"""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=np.float64),
+                     where=denominator > 0)
+
+
+class _Scores:
+    """The fixed inputs every resample is weighted over"""
+
+    def __init__(self, y_true: np.ndarray, y_proba: np.ndarray, threshold: float):
+        self.n = len(y_true)
+        positive = y_true.astype(bool)
+        predicted = y_proba > threshold
+        # Confusion-cell indicator columns: (n, 4) for tp, fp, fn, tn
+        self.cells = np.stack([positive & predicted, ~positive & predicted,
+                               positive & ~predicted, ~positive & ~predicted], axis=1).astype(np.float64)
+        # AUC works on score groups so ties count half, as in roc_auc_score
+        order = np.argsort(y_proba, kind='stable')
+        _, self.group_starts = np.unique(y_proba[order], return_index=True)
+        self.order = order
+        self.positive_sorted = positive[order].astype(np.float64)
+
+    def metrics(self, weights: np.ndarray) -> Dict[str, np.ndarray]:
+        """Metrics for each row of weights, shape (resamples, n)"""
+        tp, fp, fn, tn = (weights @ self.cells).T
+        precision = _ratio(tp, tp + fp)
+        recall = _ratio(tp, tp + fn)
+        return {
+            'accuracy': (tp + tn) / weights.sum(axis=1),
+            'precision': precision,
+            'recall': recall,
+            'f1_score': _ratio(2 * precision * recall, precision + recall),
+            'auc_roc': self._auc(weights)
+        }
+
+    def _auc(self, weights: np.ndarray) -> np.ndarray:
+        sorted_weights = weights[:, self.order]
+        positives = np.add.reduceat(sorted_weights * self.positive_sorted, self.group_starts, axis=1)
+        negatives = np.add.reduceat(sorted_weights * (1 - self.positive_sorted), self.group_starts, axis=1)
+        below = np.cumsum(negatives, axis=1) - negatives
+        pairs = positives.sum(axis=1) * negatives.sum(axis=1)
+        # A resample with a single class has no AUC
+        auc = _ratio((positives * (below + 0.5 * negatives)).sum(axis=1), pairs)
+        return np.where(pairs > 0, auc, np.nan)
+
+
+def _bootstrap_chunk(scores: _Scores, seed: np.random.SeedSequence, resamples: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(scores.n, np.full(scores.n, 1.0 / scores.n), size=resamples).astype(np.float64)
+    return scores.metrics(weights)
+
+
+def evaluate_probabilities(y_true, y_proba, threshold: float = 0.5, n_resamples: int = DEFAULT_RESAMPLES,
+                           confidence: float = DEFAULT_CONFIDENCE, seed: int = DEFAULT_SEED,
+                           n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """Point metrics, confusion matrix and percentile bootstrap CIs for one probability vector.
+
+    y_proba is the positive-class probability; predictions are y_proba > threshold,
+    which matches RandomForestClassifier.predict at the default threshold.
+    n_resamples=0 skips the bootstrap.
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+    scores = _Scores(y_true, y_proba, threshold)
+
+    point = {name: float(value[0]) for name, value in scores.metrics(np.ones((1, scores.n))).items()}
+    tp, fp, fn, tn = (int(c) for c in scores.cells.sum(axis=0))
+    report: Dict[str, Any] = {
+        'n_samples': scores.n,
+        'positive_rate': float(y_true.mean()) if scores.n else 0.0,
+        'threshold': threshold,
+        'metrics': point,
+        'confusion_matrix': [[tn, fp], [fn, tp]]
+    }
+    if not n_resamples:
+        return report
+
+    chunk_sizes = [CHUNK_SIZE] * (n_resamples // CHUNK_SIZE)
+    if n_resamples % CHUNK_SIZE:
+        chunk_sizes.append(n_resamples % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    # numpy releases the GIL in the matrix products, so threads scale without pickling the inputs
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as pool:
+        chunks = list(pool.map(lambda args: _bootstrap_chunk(scores, *args), zip(seeds, chunk_sizes)))
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name in CI_METRICS:
+        samples = np.concatenate([chunk[name] for chunk in chunks])
+        samples = samples[~np.isnan(samples)]
+        lower, upper = np.quantile(samples, [alpha, 1 - alpha]) if len(samples) else (np.nan, np.nan)
+        intervals[name] = {
+            'estimate': point[name],
+            'lower': float(lower),
+            'upper': float(upper),
+            'std_error': float(samples.std(ddof=1)) if len(samples) > 1 else 0.0
+        }
+    report['bootstrap'] = {
+        'resamples': n_resamples,
+        'confidence': confidence,
+        'seed': seed,
+        'method': 'percentile',
+        'intervals': intervals
+    }
+    return report
+
+
+def evaluate_model(model, X, y_true, **kwargs) -> Dict[str, Any]:
+    """evaluate_probabilities() over one predict_proba pass of a fitted classifier"""
+    return evaluate_probabilities(y_true, model.predict_proba(X)[:, 1], **kwargs)
+
+
+def save_report(report: Dict[str, Any], model_path: str) -> str:
+    """Write the report next to the model as <model>_evaluation.json"""
+    path = model_path.replace('.pkl', '_evaluation.json')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(dict(report, generated_at=datetime.now().isoformat()), f, indent=2)
+    return path
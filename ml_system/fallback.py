@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Fallback Models
+Used when the trained D&D model is missing or unreadable: a synthetic forest
+that is built once and cached on disk, or a rule-based scorer that needs no
+training at all
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from .features import FEATURE_NAMES, RISK_SCORE_WEIGHTS, risk_score
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+FALLBACK_POLICIES = ('synthetic', 'rules', 'fail')
+
+# Everything that determines the synthetic forest; changing any of it changes the cache key
+SYNTHETIC_SPEC = {
+    'feature_names': FEATURE_NAMES,
+    'n_samples': 1000,
+    'positive_rate': 0.06,
+    'seed': 42,
+    'params': {
+        'n_estimators': 100,
+        'max_depth': 10,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        'random_state': 42,
+        'class_weight': 'balanced'
+    }
+}
+
+
+class RuleBasedScorer:
+    """Scores shipments with the same risk formula the synthetic labels are built from.
+
+    risk_score() is mapped through a logistic centred on the score at which
+    DDModelTrainer.generate_synthetic_data labels the top 6% as D&D, so the
+    probabilities land in the same range a trained forest produces. It works on
+    raw (unscaled) features and exposes the predict_proba / classes_ /
+    feature_importances_ surface DDPredictor relies on.
+    """
+
+    # 94th percentile of risk_score() over generate_synthetic_data(50000)
+    threshold = 0.5175
+    # Matches the label noise (std 0.05) added during synthetic data generation
+    scale = 0.03
+
+    def __init__(self, feature_names=FEATURE_NAMES):
+        self.feature_names = list(feature_names)
+        self.classes_ = np.array([0, 1])
+        self._columns = {name: i for i, name in enumerate(self.feature_names)}
+        weights = np.zeros(len(self.feature_names))
+        for name, weight in RISK_SCORE_WEIGHTS.items():
+            if name in self._columns:
+                weights[self._columns[name]] = abs(weight)
+        self.feature_importances_ = weights / weights.sum()
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        columns = {name: X[:, i] for name, i in self._columns.items()}
+        positive = 1.0 / (1.0 + np.exp(-(risk_score(columns) - self.threshold) / self.scale))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def synthetic_model_key() -> str:
+    """Content hash of the synthetic fallback spec and the sklearn version that fits it"""
+    import sklearn
+
+    payload = json.dumps({'spec': SYNTHETIC_SPEC, 'sklearn': sklearn.__version__}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def build_synthetic_model() -> Tuple[Any, Any]:
+    """Fit the synthetic forest and its scaler (slow: trains 100 trees)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.RandomState(SYNTHETIC_SPEC['seed'])
+    n_samples = SYNTHETIC_SPEC['n_samples']
+    X = rng.randn(n_samples, len(FEATURE_NAMES))
+    y = np.zeros(n_samples)
+    y[rng.choice(n_samples, size=int(n_samples * SYNTHETIC_SPEC['positive_rate']), replace=False)] = 1
+
+    model = RandomForestClassifier(**SYNTHETIC_SPEC['params'])
+    model.fit(X, y)
+    scaler = StandardScaler()
+    scaler.fit(X)
+    return model, scaler
+
+
+def load_or_build_synthetic_model(cache_dir: str) -> Dict[str, Any]:
+    """Load the cached synthetic fallback, building and persisting it on first use"""
+    key = synthetic_model_key()
+    path = os.path.join(cache_dir, f"dnd_fallback_{key}.pkl")
+    try:
+        with open(path, 'rb') as f:
+            model_data = pickle.load(f)
+        logger.info(f"Fallback model loaded from {path}")
+        return model_data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable fallback cache {path}: {e}")
+
+    model, scaler = build_synthetic_model()
+    model_data = {
+        'model': model,
+        'scaler': scaler,
+        'feature_names': list(FEATURE_NAMES),
+        'model_version': f"fallback-{key[:8]}"
+    }
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temp file and rename so concurrent workers never read a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model_data, f)
+        os.replace(tmp_path, path)
+        tmp_path = None
+        logger.info(f"Fallback model built and cached at {path}")
+    except OSError as e:
+        logger.warning(f"Could not cache fallback model at {path}: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return model_data
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Feature Store
+Per-port, per-carrier and per-lane aggregates from completed shipments, so a
+prediction request can carry identifiers instead of precomputed scores.
+
+Completed-shipment events are folded into running counters in SQLite; the
+serving side keeps a dict per key kind in memory (O(1) lookups) and reloads
+it when a refresh bumps the store version.
+
+    python -m ml_system.feature_store --refresh                # fold newly appended event lines
+    python -m ml_system.feature_store --import events.csv      # bulk-load a CSV export
+
+Events (JSONL lines in shipment_events_*.jsonl or CSV rows):
+    carrier_scac, pol_locode, pod_locode, lane?, on_time (0/1), dd_occurred (0/1), dwell_days
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .categorical import lane_of, normalize
+from .config import DEFAULTS, MLConfig, get_config
+from .features import DEFAULT_FEATURE_VALUES
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+DEFAULT_STORE_PATH = DEFAULTS.feature_store_path
+
+# A discharge port counts as congested for a shipment that dwelt longer than this
+CONGESTED_DWELL_DAYS = 4.0
+# Pseudo-shipments at the feature's default value, so thinly observed keys stay near it
+SMOOTHING = 10.0
+
+COUNTERS = ('shipments', 'on_time', 'dd', 'congested', 'disrupted')
+
+# Served feature -> (key kind, request field holding the key, counter it is the smoothed rate of)
+STORE_FEATURES = {
+    'port_congestion_index': ('port', 'pod_locode', 'congested'),
+    'carrier_reliability_score': ('carrier', 'carrier_scac', 'on_time'),
+    'historical_dd_rate': ('carrier', 'carrier_scac', 'dd'),
+    'route_risk_score': ('lane', 'lane', 'disrupted'),
+}
+KINDS = ('port', 'carrier', 'lane')
+# Each in-memory table maps key -> tuple of its kind's features, in STORE_FEATURES order
+_FEATURES_BY_KIND = {kind: [f for f, (k, _, _) in STORE_FEATURES.items() if k == kind] for kind in KINDS}
+_POSITION = {feature: _FEATURES_BY_KIND[kind].index(feature) for feature, (kind, _, _) in STORE_FEATURES.items()}
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript("""
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS sources (name TEXT PRIMARY KEY, indexed_bytes INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS stats (
+            kind TEXT NOT NULL, key TEXT NOT NULL,
+            shipments REAL NOT NULL, on_time REAL NOT NULL, dd REAL NOT NULL,
+            congested REAL NOT NULL, disrupted REAL NOT NULL, updated_at TEXT,
+            PRIMARY KEY (kind, key)
+        );
+    """)
+    return db
+
+
+def _key(data: Mapping[str, Any], field: str) -> Optional[str]:
+    if field == 'lane':
+        return normalize(data.get('lane')) or lane_of(data.get('pol_locode'), data.get('pod_locode'))
+    return normalize(data.get(field))
+
+
+def _event_frame(events):
+    """Normalized keys and 0/1 counters for a DataFrame or list of event dicts"""
+    import pandas as pd
+
+    frame = events if isinstance(events, pd.DataFrame) else pd.DataFrame(list(events))
+    out = pd.DataFrame(index=frame.index)
+    if frame.empty:
+        return out
+    missing = [name for name in ('on_time', 'dd_occurred') if name not in frame]
+    if missing:
+        raise ValueError(f"shipment events need {', '.join(missing)}")
+    for field in ('carrier_scac', 'pol_locode', 'pod_locode'):
+        column = frame[field] if field in frame else pd.Series(None, index=frame.index, dtype=object)
+        out[field] = column.astype('string').str.strip().str.upper()
+    lane = out['pol_locode'] + '-' + out['pod_locode']
+    if 'lane' in frame:
+        lane = frame['lane'].astype('string').str.strip().str.upper().fillna(lane)
+    out['lane'] = lane
+
+    def flag(name):
+        return pd.to_numeric(frame[name], errors='coerce').fillna(0).clip(0, 1)
+
+    dwell = pd.to_numeric(frame['dwell_days'], errors='coerce') if 'dwell_days' in frame else None
+    out['shipments'] = 1.0
+    out['on_time'] = flag('on_time')
+    out['dd'] = flag('dd_occurred')
+    out['congested'] = (dwell > CONGESTED_DWELL_DAYS).astype(float) if dwell is not None else 0.0
+    out['disrupted'] = ((out['on_time'] < 1) | (out['dd'] > 0)).astype(float)
+    return out
+
+
+class FeatureStore:
+    """SQLite-backed aggregates with in-memory dict lookups.
+
+    Connections are opened per operation, so a store loaded before
+    ml_system.serve forks is safe to use in every worker.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: float = 30.0):
+        self.path = path or get_config().feature_store_path or DEFAULT_STORE_PATH
+        self.reload_interval = reload_interval
+        self.version = -1
+        self._tables: Dict[str, Dict[str, Tuple[float, ...]]] = {kind: {} for kind in KINDS}
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> Optional['FeatureStore']:
+        """The configured feature_store_path (ROOTUIP_FEATURE_STORE); no store is used until the file exists"""
+        config = config or get_config()
+        path = config.feature_store_path
+        if not path or not os.path.exists(path):
+            return None
+        return cls(path, reload_interval=config.feature_store_reload_seconds)
+
+    # --- serving side ---
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload the in-memory tables if a refresh changed the store; returns True if reloaded"""
+        db = _connect(self.path)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            version = row[0] if row else 0
+            if version == self.version and not force:
+                return False
+            rows = db.execute(f"SELECT kind, key, {', '.join(COUNTERS)} FROM stats").fetchall()
+        finally:
+            db.close()
+
+        tables: Dict[str, Dict[str, Tuple[float, ...]]] = {kind: {} for kind in KINDS}
+        for kind, key, *counts in rows:
+            stats = dict(zip(COUNTERS, counts))
+            tables[kind][key] = tuple(self._rate(stats, STORE_FEATURES[feature][2], feature)
+                                      for feature in _FEATURES_BY_KIND[kind])
+        # Swapped in one assignment; readers see the old or the new tables, never a mix
+        self._tables = tables
+        self.version = version
+        logger.info(f"Feature store v{version} loaded: " +
+                    ', '.join(f"{len(t)} {kind}s" for kind, t in tables.items()))
+        return True
+
+    @staticmethod
+    def _rate(stats: Dict[str, float], counter: str, feature: str) -> float:
+        return (stats[counter] + SMOOTHING * DEFAULT_FEATURE_VALUES[feature]) / (stats['shipments'] + SMOOTHING)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.reload_interval
+            self.reload()
+        except sqlite3.Error as e:
+            logger.error(f"Feature store reload failed: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def lookup(self, data: Mapping[str, Any]) -> Dict[str, float]:
+        """Store features for the identifiers in data; keys the store has not seen are left out"""
+        self._maybe_reload()
+        found = {}
+        tables = self._tables
+        for feature, (kind, field, _) in STORE_FEATURES.items():
+            key = _key(data, field)
+            values = tables[kind].get(key) if key else None
+            if values is not None:
+                found[feature] = values[_POSITION[feature]]
+        return found
+
+    def lookup_columns(self, identifiers: Mapping[str, List[Any]], n: int) -> Dict[str, np.ndarray]:
+        """Column-wise lookup for n rows of identifiers; NaN where a key is unknown"""
+        self._maybe_reload()
+        tables = self._tables
+        rows = [{field: values[i] for field, values in identifiers.items()} for i in range(n)]
+        keys = {field: [_key(row, field) for row in rows] for field in {f for _, f, _ in STORE_FEATURES.values()}}
+        columns = {}
+        for feature, (kind, field, _) in STORE_FEATURES.items():
+            table, position = tables[kind], _POSITION[feature]
+            columns[feature] = np.array([table[key][position] if key in table else np.nan for key in keys[field]])
+        return columns
+
+    def stats(self) -> Dict[str, Any]:
+        return {'version': self.version, **{f"{kind}s": len(table) for kind, table in self._tables.items()}}
+
+    # --- refresh side ---
+
+    def ingest(self, events) -> int:
+        """Fold completed-shipment events into the counters and bump the version; returns rows"""
+        return ingest(self.path, events)
+
+
+def ingest(path: str, events, sources: Optional[Dict[str, int]] = None) -> int:
+    """Add events' counters to the store in one transaction (optionally recording source offsets)"""
+    frame = _event_frame(events)
+    if frame.empty and not sources:
+        return 0
+    now = datetime.now().isoformat()
+    rows = []
+    for kind, field in (('port', 'pod_locode'), ('carrier', 'carrier_scac'), ('lane', 'lane')):
+        if frame.empty:
+            break
+        grouped = frame.dropna(subset=[field]).groupby(field)[list(COUNTERS)].sum()
+        rows.extend((kind, key, *map(float, counts), now) for key, counts in zip(grouped.index, grouped.to_numpy()))
+
+    db = _connect(path)
+    try:
+        with db:
+            db.executemany(f"""
+                INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    {', '.join(f'{c} = {c} + excluded.{c}' for c in COUNTERS)}, updated_at = excluded.updated_at
+            """, rows)
+            for name, offset in (sources or {}).items():
+                db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (name, offset))
+            db.execute("INSERT INTO meta VALUES ('version', 1) "
+                       "ON CONFLICT (name) DO UPDATE SET value = value + 1")
+    finally:
+        db.close()
+    return len(frame)
+
+
+def refresh(path: Optional[str] = None, events_dir: Optional[str] = None) -> int:
+    """Fold complete event lines appended since the last refresh; returns events ingested.
+    path and events_dir default to the configured feature store and shipment events"""
+    config = get_config()
+    path = path or config.feature_store_path
+    events_dir = events_dir or config.shipment_events_dir
+    if not os.path.isdir(events_dir):
+        return 0
+    db = _connect(path)
+    try:
+        done = dict(db.execute("SELECT name, indexed_bytes FROM sources"))
+    finally:
+        db.close()
+
+    events: List[Dict[str, Any]] = []
+    offsets: Dict[str, int] = {}
+    for name in sorted(os.listdir(events_dir)):
+        if not (name.startswith('shipment_events_') and name.endswith('.jsonl')):
+            continue
+        start = done.get(name, 0)
+        if os.path.getsize(os.path.join(events_dir, name)) <= start:
+            continue
+        offset = start
+        with open(os.path.join(events_dir, name), 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partial line still being written; picked up next time
+                offset += len(line)
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        if offset > start:
+            offsets[name] = offset
+    if not offsets:
+        return 0
+    count = ingest(path, events, sources=offsets)
+    logger.info(f"Feature store refreshed with {count} events from {len(offsets)} files")
+    return count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain the per-port/carrier/lane feature store')
+    config = get_config()
+    parser.add_argument('--store', default=config.feature_store_path or DEFAULT_STORE_PATH)
+    parser.add_argument('--events-dir', default=config.shipment_events_dir)
+    parser.add_argument('--refresh', action='store_true', help='Fold newly appended event lines')
+    parser.add_argument('--import', dest='import_csv', metavar='CSV', help='Bulk-load completed shipments from a CSV')
+    args = parser.parse_args(argv)
+
+    if args.import_csv:
+        import pandas as pd
+        print(f"Imported {ingest(args.store, pd.read_csv(args.import_csv))} events from {args.import_csv}")
+    if args.refresh:
+        print(f"Ingested {refresh(args.store, args.events_dir)} new events")
+    print(json.dumps(FeatureStore(args.store).stats()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
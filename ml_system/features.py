@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP D&D Feature Definitions
+Feature order, defaults and derived-feature formulas shared by training and serving
+"""
+
+# Order matters: models are trained and scored on this column order
+FEATURE_NAMES = [
+    'transit_time_days',
+    'port_congestion_index',
+    'carrier_reliability_score',
+    'documentation_completeness',
+    'customs_complexity_score',
+    'container_value_usd',
+    'days_until_eta',
+    'historical_dd_rate',
+    'route_risk_score',
+    'seasonal_risk_factor',
+    'risk_composite_score',
+    'historical_performance_ratio',
+    'route_congestion_product',
+    'time_pressure_index',
+    'documentation_risk_factor'
+]
+
+# Computed from the base features by derive_features() when not supplied
+DERIVED_FEATURES = (
+    'risk_composite_score',
+    'historical_performance_ratio',
+    'route_congestion_product',
+    'time_pressure_index',
+    'documentation_risk_factor'
+)
+
+# Values used when a caller omits a feature
+DEFAULT_FEATURE_VALUES = {
+    'transit_time_days': 14.0, 'port_congestion_index': 0.5,
+    'carrier_reliability_score': 0.85, 'documentation_completeness': 0.9,
+    'customs_complexity_score': 0.3, 'container_value_usd': 50000.0,
+    'days_until_eta': 14.0, 'historical_dd_rate': 0.15,
+    'route_risk_score': 0.5, 'seasonal_risk_factor': 0.5,
+    'risk_composite_score': 0.5, 'historical_performance_ratio': 0.85,
+    'route_congestion_product': 0.25, 'time_pressure_index': 0.3,
+    'documentation_risk_factor': 0.1
+}
+
+# Label-generating risk formula used for synthetic training data and the rule-based fallback
+RISK_SCORE_INTERCEPT = 0.15
+RISK_SCORE_WEIGHTS = {
+    'risk_composite_score': 0.25,
+    'time_pressure_index': 0.20,
+    'documentation_risk_factor': 0.15,
+    'route_congestion_product': 0.15,
+    'historical_performance_ratio': -0.15,
+    'seasonal_risk_factor': 0.10
+}
+
+
+def derive_features(data):
+    """Fill in derived features the caller did not supply.
+
+    Works on a dict of scalars (one request) or of numpy arrays / a DataFrame
+    (training), and returns the same object.
+    """
+    def missing(name):
+        return name not in data or data[name] is None
+
+    if missing('risk_composite_score'):
+        data['risk_composite_score'] = (
+            data['port_congestion_index'] * 0.3 +
+            (1 - data['carrier_reliability_score']) * 0.2 +
+            data['customs_complexity_score'] * 0.2 +
+            data['route_risk_score'] * 0.3
+        )
+
+    if missing('historical_performance_ratio'):
+        data['historical_performance_ratio'] = (
+            data['carrier_reliability_score'] * (1 - data['historical_dd_rate'])
+        )
+
+    if missing('route_congestion_product'):
+        data['route_congestion_product'] = (
+            data['port_congestion_index'] * data['route_risk_score']
+        )
+
+    if missing('time_pressure_index'):
+        ratio = 1 - (data['days_until_eta'] / data['transit_time_days'])
+        data['time_pressure_index'] = (
+            max(0, min(1, ratio)) if isinstance(ratio, (int, float)) else ratio.clip(0, 1)
+        )
+
+    if missing('documentation_risk_factor'):
+        data['documentation_risk_factor'] = (
+            (1 - data['documentation_completeness']) * data['customs_complexity_score']
+        )
+
+    return data
+
+
+def risk_score(columns):
+    """Weighted risk score over derived features (scalars or arrays)"""
+    score = RISK_SCORE_INTERCEPT
+    for name, weight in RISK_SCORE_WEIGHTS.items():
+        score = score + columns[name] * weight
+    return score
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Outcome Feedback
+Joins realized D&D outcomes with the prediction history, warm-start retrains
+the live model on them and registers/promotes the result only if it beats the
+live model on held-out outcomes.
+
+    python -m ml_system.feedback outcomes.csv
+    python -m ml_system.feedback outcomes.csv --extra-trees 100 --min-improvement 0.005 --dry-run
+    python -m ml_system.feedback acme_outcomes.csv --tenant acme   # tenant model (see tenancy.py)
+
+The CSV needs a prediction_id or shipment_id column and a dd_occurred (0/1)
+column. Shipment ids resolve to the latest prediction made for the shipment.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from .categorical import CATEGORICAL_FEATURES
+from .evaluation import evaluate_model
+from .features import DEFAULT_FEATURE_VALUES, DERIVED_FEATURES, FEATURE_NAMES, derive_features
+from .history import HistoryIndex
+from .config import get_config
+from .registry import ModelRegistry
+
+LABEL_COLUMN = 'dd_occurred'
+ID_COLUMNS = ('prediction_id', 'shipment_id')
+
+
+def load_outcomes(path: str):
+    """Bulk-load an outcomes CSV into a DataFrame with string ids and 0/1 labels"""
+    import pandas as pd
+
+    outcomes = pd.read_csv(path, dtype={column: str for column in ID_COLUMNS})
+    if LABEL_COLUMN not in outcomes.columns:
+        raise ValueError(f"{path}: missing '{LABEL_COLUMN}' column")
+    if not any(column in outcomes.columns for column in ID_COLUMNS):
+        raise ValueError(f"{path}: needs a 'prediction_id' or 'shipment_id' column")
+    for column in ID_COLUMNS:
+        if column not in outcomes.columns:
+            outcomes[column] = None
+    outcomes = outcomes.dropna(subset=[LABEL_COLUMN])
+    outcomes[LABEL_COLUMN] = outcomes[LABEL_COLUMN].astype(int).clip(0, 1)
+    return outcomes[outcomes['prediction_id'].notna() | outcomes['shipment_id'].notna()]
+
+
+def build_training_set(outcomes, index: HistoryIndex) -> Tuple[Any, Any, Dict[str, int]]:
+    """Labelled feature and identifier rows for every outcome whose prediction is in the history"""
+    import pandas as pd
+
+    index.refresh()
+    by_prediction = outcomes[outcomes['prediction_id'].notna()]
+    by_shipment = outcomes[outcomes['prediction_id'].isna()]
+    records = index.lookup(prediction_ids=by_prediction['prediction_id'].tolist(),
+                           shipment_ids=by_shipment['shipment_id'].tolist())
+
+    rows, labels, prediction_ids = [], [], []
+    keys = by_prediction['prediction_id'].tolist() + by_shipment['shipment_id'].tolist()
+    outcome_labels = by_prediction[LABEL_COLUMN].tolist() + by_shipment[LABEL_COLUMN].tolist()
+    for key, label in zip(keys, outcome_labels):
+        record = records.get(key)
+        if record is None:
+            continue
+        # Rebuild the row exactly as the predictor did: supplied values, defaults, then derived features
+        supplied = record['input']
+        base = {name: supplied[name] if supplied.get(name) is not None else DEFAULT_FEATURE_VALUES[name]
+                for name in FEATURE_NAMES if name not in DERIVED_FEATURES}
+        base.update({name: supplied[name] for name in DERIVED_FEATURES if supplied.get(name) is not None})
+        derive_features(base)
+        rows.append([float(base[name]) for name in FEATURE_NAMES] +
+                    [supplied.get(name) for name in CATEGORICAL_FEATURES])
+        labels.append(label)
+        prediction_ids.append(record['result'].get('prediction_id'))
+
+    X = pd.DataFrame(rows, columns=FEATURE_NAMES + list(CATEGORICAL_FEATURES))
+    y = pd.Series(labels, name=LABEL_COLUMN, dtype=int)
+    stats = {'outcomes': len(outcomes), 'matched': len(rows), 'unmatched': len(outcomes) - len(rows)}
+    X.insert(0, 'prediction_id', prediction_ids)
+    return X, y, stats
+
+
+def _evaluate(model_data: Dict[str, Any], X, y) -> Dict[str, Any]:
+    from .train_model import model_inputs
+
+    return evaluate_model(model_data['model'], model_inputs(model_data, X), y)
+
+
+def retrain_from_outcomes(outcomes_path: str, history_dir: Optional[str] = None,
+                          models_dir: Optional[str] = None, data_dir: Optional[str] = None,
+                          extra_trees: int = 50, holdout: float = 0.25, min_samples: int = 200,
+                          min_improvement: float = 0.0, dry_run: bool = False,
+                          tenant: Optional[str] = None) -> Dict[str, Any]:
+    """Outcome CSV -> labelled set -> warm-start candidate -> register and promote if better.
+
+    With a tenant the candidate starts from (and competes with) the tenant's model, or the
+    global model for a tenant's first version, and is promoted for that tenant only.
+    Directories default to the configured ones (ml_system.config.get_config()).
+    """
+    from sklearn.model_selection import train_test_split
+    from .train_model import DDModelTrainer
+
+    config = get_config()
+    history_dir = history_dir or config.history_dir
+    data_dir = data_dir or config.data_dir
+    index = HistoryIndex(history_dir)
+    try:
+        X, y, stats = build_training_set(load_outcomes(outcomes_path), index)
+    finally:
+        index.close()
+    report: Dict[str, Any] = {'outcomes_file': outcomes_path, 'tenant': tenant, 'join': stats, 'promoted': False}
+    print(f"Joined {stats['matched']} of {stats['outcomes']} outcomes to prediction history")
+
+    os.makedirs(data_dir, exist_ok=True)
+    labelled_path = os.path.join(data_dir, f"feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    X.assign(**{LABEL_COLUMN: y.values}).to_csv(labelled_path, index=False)
+    report['labelled_set'] = labelled_path
+
+    if len(X) < min_samples or y.nunique() < 2 or y.value_counts().min() < 2:
+        report['skipped'] = f"need at least {min_samples} outcomes covering both classes"
+        print(f"Not retraining: {report['skipped']}")
+        return report
+
+    X_train, X_holdout, y_train, y_holdout = train_test_split(
+        X, y, test_size=holdout, stratify=y, random_state=42)
+
+    registry = ModelRegistry.for_dir(models_dir, config=config)
+    live_path = registry.live_path
+    if tenant is not None and os.path.exists(registry.tenant_path(tenant)):
+        live_path = registry.tenant_path(tenant)
+    with open(live_path, 'rb') as f:
+        live = pickle.load(f)
+
+    # A compacted live model cannot grow trees; the candidate grows its uncompacted parent
+    base = registry.load(live['compaction']['parent_version']) if live.get('compaction') else live
+    trainer = DDModelTrainer(config=config)
+    trainer.continue_training(base, X_train, y_train, extra_trees=extra_trees)
+    candidate = dict(base, model=trainer.model, training_date=datetime.now().isoformat())
+
+    live_evaluation = _evaluate(live, X_holdout, y_holdout)
+    candidate_evaluation = _evaluate(candidate, X_holdout, y_holdout)
+    live_auc = live_evaluation['metrics']['auc_roc']
+    candidate_auc = candidate_evaluation['metrics']['auc_roc']
+    report.update({
+        'live_version': str(live.get('model_version')),
+        'live_auc': round(live_auc, 4),
+        'candidate_auc': round(candidate_auc, 4),
+        'candidate_auc_interval': [round(candidate_evaluation['bootstrap']['intervals']['auc_roc'][bound], 4)
+                                   for bound in ('lower', 'upper')],
+        'holdout_samples': len(X_holdout)
+    })
+    print(f"Holdout AUC: live {live_auc:.4f}, candidate {candidate_auc:.4f}")
+
+    if candidate_auc <= live_auc + min_improvement:
+        print("Candidate does not beat the live model; not registered")
+        return report
+    if dry_run:
+        print("Dry run: candidate not registered")
+        return report
+
+    metrics = {**candidate_evaluation['metrics'], 'baseline_auc_roc': live_auc, 'feedback': stats,
+               'confidence_intervals': candidate_evaluation['bootstrap']['intervals'],
+               'extra_trees': extra_trees, 'labelled_set': labelled_path}
+    candidate['metrics'] = metrics
+    version = registry.register(candidate, metrics, parent=report['live_version'], tenant=tenant)
+    registry.promote(version)
+    report.update({'promoted': True, 'version': version})
+    print(f"Promoted {version}; reload serving with POST /admin/model/reload or SIGHUP to ml_system.serve")
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Retrain the D&D model from realized outcomes')
+    parser.add_argument('outcomes', help='CSV with prediction_id or shipment_id, and dd_occurred')
+    config = get_config()
+    parser.add_argument('--history-dir', default=config.history_dir)
+    parser.add_argument('--models-dir', default=config.models_dir)
+    parser.add_argument('--data-dir', default=config.data_dir)
+    parser.add_argument('--extra-trees', type=int, default=50)
+    parser.add_argument('--holdout', type=float, default=0.25)
+    parser.add_argument('--min-samples', type=int, default=200)
+    parser.add_argument('--min-improvement', type=float, default=0.0)
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--tenant', help='Train and promote a model for this tenant only')
+    args = parser.parse_args(argv)
+    report = retrain_from_outcomes(
+        args.outcomes, history_dir=args.history_dir, models_dir=args.models_dir, data_dir=args.data_dir,
+        extra_trees=args.extra_trees, holdout=args.holdout, min_samples=args.min_samples,
+        min_improvement=args.min_improvement, dry_run=args.dry_run, tenant=args.tenant
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Prediction History
+Append-only daily JSONL files written on the predict path, plus a SQLite
+offset index so outcomes can be joined to past predictions by prediction_id
+or shipment_id without rescanning the files.
+
+A write may carry the caller's request id (see ml_system.idempotency). Each
+line then records it with its row number; the writer skips request ids it
+wrote recently, and the index ignores a second line for the same request and
+row, which is how retries answered by different server workers are deduped.
+Prediction ids of such a write are derived from the request id, so a retry's
+response carries the ids its first attempt recorded, chunk by chunk.
+
+With history_flush_seconds set (see ml_system.config) the writer buffers lines
+and appends them from a background thread instead of on the request path; the
+buffer is flushed at exit and by the API on shutdown.
+
+    python -m ml_system.history --refresh     # index lines appended since the last run
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import get_config
+from .metrics import HISTORY_BACKLOG, HISTORY_DEDUPED
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+INDEX_FILENAME = 'history_index.sqlite'
+REQUEST_ID_MEMORY = 100000
+REQUEST_ID_TTL_SECONDS = 24 * 3600
+
+
+def new_prediction_ids(n: int, request_id: Optional[str] = None) -> List[str]:
+    """n 128-bit hex ids: random (one urandom call for the whole batch), or derived from
+    request_id and the row number so a retry gets the ids already in the history"""
+    if request_id is not None:
+        return [hashlib.blake2b(f"{request_id}#{seq}".encode(), digest_size=16).hexdigest() for seq in range(n)]
+    raw = os.urandom(16 * n).hex()
+    return [raw[i:i + 32] for i in range(0, 32 * n, 32)]
+
+
+# Writers with a buffer, flushed together at shutdown
+_buffered_writers: 'weakref.WeakSet[HistoryWriter]' = weakref.WeakSet()
+
+
+def flush_all():
+    """Flush every buffered HistoryWriter in this process (registered with atexit)"""
+    for writer in list(_buffered_writers):
+        writer.flush()
+
+
+atexit.register(flush_all)
+
+
+class HistoryWriter:
+    """Appends {'timestamp', 'input', 'result'} records to predictions_<date>.jsonl"""
+
+    def __init__(self, history_dir: Optional[str] = None, request_id_memory: int = REQUEST_ID_MEMORY,
+                 request_id_ttl: float = REQUEST_ID_TTL_SECONDS, flush_interval: float = 0.0,
+                 max_buffered: int = 10000):
+        """history_dir defaults to the configured one (ml_system.config.get_config())"""
+        self.history_dir = history_dir or get_config().history_dir
+        self.request_id_memory = request_id_memory
+        self.request_id_ttl = request_id_ttl
+        # request id -> expiry, oldest first; written from the API's worker threads
+        self._request_ids: 'OrderedDict[str, float]' = OrderedDict()
+        self._request_ids_lock = threading.Lock()
+        # flush_interval > 0: lines are buffered per file and appended by a background
+        # thread at most this often, or as soon as max_buffered lines are waiting
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer: Dict[str, List[str]] = {}
+        self._buffered = 0
+        self._buffer_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        if flush_interval > 0:
+            _buffered_writers.add(self)
+
+    def path_for(self, day: datetime) -> str:
+        return os.path.join(self.history_dir, f"predictions_{day.strftime('%Y-%m-%d')}.jsonl")
+
+    def write(self, records: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]], request_id: Optional[str] = None):
+        """Write (input, result) pairs with a single append; a request id already written is skipped"""
+        records = list(records)
+        if request_id is not None and not self._claim(request_id):
+            HISTORY_DEDUPED.inc(len(records))
+            return
+        now = datetime.now()
+        fallback_timestamp = now.isoformat()
+        if request_id is None:
+            lines = [
+                json.dumps({'timestamp': result.get('timestamp') or fallback_timestamp,
+                            'input': input_data, 'result': result}) + '\n'
+                for input_data, result in records
+            ]
+        else:
+            lines = [
+                json.dumps({'timestamp': result.get('timestamp') or fallback_timestamp,
+                            'input': input_data, 'result': result,
+                            'request_id': request_id, 'request_seq': seq}) + '\n'
+                for seq, (input_data, result) in enumerate(records)
+            ]
+        if not lines:
+            return
+        path = self.path_for(now)
+        HISTORY_BACKLOG.inc(len(lines))
+        if self.flush_interval <= 0:
+            try:
+                self._append(path, lines)
+            except OSError:
+                # Nothing was written, so a retry with the same id must not be skipped as a duplicate
+                if request_id is not None:
+                    self._release(request_id)
+                raise
+            finally:
+                HISTORY_BACKLOG.dec(len(lines))
+            return
+        with self._buffer_lock:
+            self._buffer.setdefault(path, []).extend(lines)
+            self._buffered += len(lines)
+            full = self._buffered >= self.max_buffered
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def _append(self, path: str, lines: List[str]):
+        os.makedirs(self.history_dir, exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(''.join(lines))
+
+    def flush(self):
+        """Append buffered lines now; a file that cannot be written keeps its lines for the next flush"""
+        with self._buffer_lock:
+            pending, self._buffer = self._buffer, {}
+            self._buffered = 0
+        for path, lines in pending.items():
+            try:
+                self._append(path, lines)
+            except OSError as e:
+                logger.error(f"Prediction history flush to {path} failed: {e}")
+                with self._buffer_lock:
+                    self._buffer[path] = lines + self._buffer.get(path, [])
+                    self._buffered += len(lines)
+                continue
+            HISTORY_BACKLOG.dec(len(lines))
+
+    def _ensure_flusher(self):
+        # Started on first buffered write, so pre-forked API workers each run their own
+        if self._flusher_pid == os.getpid() and self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._buffer_lock:
+            if self._flusher_pid == os.getpid() and self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='history-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Prediction history flush failed: {e}")
+
+    def _claim(self, request_id: str) -> bool:
+        """False if request_id was written within request_id_ttl (and is still remembered)"""
+        now = time.monotonic()
+        with self._request_ids_lock:
+            while self._request_ids and next(iter(self._request_ids.values())) <= now:
+                self._request_ids.popitem(last=False)
+            if request_id in self._request_ids:
+                return False
+            self._request_ids[request_id] = now + self.request_id_ttl
+            if len(self._request_ids) > self.request_id_memory:
+                self._request_ids.popitem(last=False)
+            return True
+
+    def _release(self, request_id: str):
+        with self._request_ids_lock:
+            self._request_ids.pop(request_id, None)
+
+
+class HistoryIndex:
+    """SQLite index of (prediction_id, shipment_id) -> (file, byte offset, length).
+
+    refresh() only reads bytes appended since the previous refresh, so the
+    JSONL files are scanned once over their lifetime.
+    """
+
+    def __init__(self, history_dir: Optional[str] = None, index_path: Optional[str] = None):
+        self.history_dir = history_dir = history_dir or get_config().history_dir
+        self.index_path = index_path or os.path.join(history_dir, INDEX_FILENAME)
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.index_path)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, indexed_bytes INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS predictions (
+                prediction_id TEXT, shipment_id TEXT, timestamp TEXT,
+                file TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS predictions_id ON predictions (prediction_id);
+            CREATE INDEX IF NOT EXISTS predictions_shipment ON predictions (shipment_id, timestamp);
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(predictions)")}
+        if 'request_key' not in columns:
+            self.db.execute("ALTER TABLE predictions ADD COLUMN request_key TEXT")
+        # A retried request another worker also wrote: only its first line per row is indexed
+        self.db.execute("""CREATE UNIQUE INDEX IF NOT EXISTS predictions_request
+                           ON predictions (request_key) WHERE request_key IS NOT NULL""")
+
+    def close(self):
+        self.db.close()
+
+    def refresh(self) -> int:
+        """Index complete lines appended since the last refresh; returns lines indexed"""
+        if not os.path.isdir(self.history_dir):
+            return 0
+        done = dict(self.db.execute("SELECT name, indexed_bytes FROM files"))
+        total = 0
+        for name in sorted(os.listdir(self.history_dir)):
+            if not (name.startswith('predictions_') and name.endswith('.jsonl')):
+                continue
+            start = done.get(name, 0)
+            if os.path.getsize(os.path.join(self.history_dir, name)) <= start:
+                continue
+            rows, end = self._scan(name, start)
+            with self.db:
+                before = self.db.total_changes
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO predictions (prediction_id, shipment_id, timestamp, file, offset,"
+                    " length, request_key) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                indexed = self.db.total_changes - before
+                self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (name, end))
+            if indexed < len(rows):
+                HISTORY_DEDUPED.inc(len(rows) - indexed)
+            total += indexed
+        if total:
+            logger.info(f"Indexed {total} prediction history records")
+        return total
+
+    def _scan(self, name: str, start: int):
+        rows = []
+        offset = start
+        with open(os.path.join(self.history_dir, name), 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partial line still being written; picked up next time
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    offset += len(line)
+                    continue
+                result = record.get('result') or {}
+                shipment_id = (record.get('input') or {}).get('shipment_id')
+                prediction_id = result.get('prediction_id')
+                request_id = record.get('request_id')
+                request_key = None if request_id is None else f"{request_id}#{record.get('request_seq', 0)}"
+                if prediction_id or shipment_id:
+                    rows.append((prediction_id, None if shipment_id is None else str(shipment_id),
+                                 record.get('timestamp'), name, offset, len(line), request_key))
+                offset += len(line)
+        return rows, offset
+
+    def lookup(self, prediction_ids: Sequence[str] = (), shipment_ids: Sequence[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """History records keyed by the requested id; shipment ids resolve to their latest prediction.
+
+        Ids are joined against the index through a temporary table, and records
+        are read file by file in offset order.
+        """
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (key TEXT, kind TEXT)")
+        self.db.execute("DELETE FROM wanted")
+        self.db.executemany("INSERT INTO wanted VALUES (?, 'p')", ((str(i),) for i in prediction_ids))
+        self.db.executemany("INSERT INTO wanted VALUES (?, 's')", ((str(i),) for i in shipment_ids))
+        locations = self.db.execute("""
+            SELECT w.key, p.file, p.offset, p.length FROM wanted w
+            JOIN predictions p ON w.kind = 'p' AND p.prediction_id = w.key
+            UNION ALL
+            SELECT w.key, p.file, p.offset, p.length FROM wanted w
+            JOIN predictions p ON p.rowid = (
+                SELECT rowid FROM predictions WHERE shipment_id = w.key ORDER BY timestamp DESC LIMIT 1)
+            WHERE w.kind = 's'
+        """).fetchall()
+
+        records: Dict[str, Dict[str, Any]] = {}
+        by_file: Dict[str, List[Tuple[int, int, str]]] = {}
+        for key, name, offset, length in locations:
+            by_file.setdefault(name, []).append((offset, length, key))
+        for name, entries in by_file.items():
+            with open(os.path.join(self.history_dir, name), 'rb') as f:
+                for offset, length, key in sorted(entries):
+                    f.seek(offset)
+                    records[key] = json.loads(f.read(length))
+        return records
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Maintain the prediction history index')
+    parser.add_argument('--history-dir', default=get_config().history_dir)
+    parser.add_argument('--refresh', action='store_true', help='Index newly appended history records')
+    args = parser.parse_args(argv)
+    index = HistoryIndex(args.history_dir)
+    try:
+        if args.refresh:
+            print(f"Indexed {index.refresh()} new records into {index.index_path}")
+        count = index.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        print(f"{count} predictions indexed")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Idempotent Requests
+Recent responses keyed by the caller's Idempotency-Key (or X-Request-ID), so a
+retried request gets the original response, prediction ids included, instead
+of a second inference and a second history record.
+
+A key is scoped to (tenant, key) and bound to a fingerprint of the endpoint
+and request body; reusing it on another endpoint or with a different body is
+rejected. While the first request with a key is still computing, duplicates
+await the same future. Entries are held in an LRU capped by count and
+approximate size and expire after a TTL; failed computations are not stored,
+so a retry recomputes.
+
+The map is per process. Under ml_system.serve a retry can land on another
+worker; the history index drops those duplicates by request id instead.
+
+    ROOTUIP_IDEMPOTENCY_SIZE=10000   entries (0 disables)
+    ROOTUIP_IDEMPOTENCY_MB=64        approximate memory cap
+    ROOTUIP_IDEMPOTENCY_TTL=600      seconds a response is replayed for
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .config import MLConfig, get_config
+from .metrics import IDEMPOTENCY_REQUESTS, IDEMPOTENCY_ENTRIES
+from .prediction_cache import _deep_sizeof
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(ValueError):
+    """The key was already used for a request with a different body"""
+
+
+def fingerprint(payload: Any) -> bytes:
+    """Digest of a request body: raw bytes, or a JSON-serializable object"""
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class IdempotencyStore:
+    """Bounded TTL map of completed responses plus the computations still in flight"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # scope -> (fingerprint, response, expires_at, size)
+        self._entries: 'OrderedDict[Hashable, Tuple[bytes, Any, float, int]]' = OrderedDict()
+        self._in_flight: Dict[Hashable, Tuple[bytes, asyncio.Future]] = {}
+        self._bytes = 0
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> Optional['IdempotencyStore']:
+        """Store from the configured idempotency_* settings (ROOTUIP_IDEMPOTENCY_*); None when disabled"""
+        config = config or get_config()
+        if config.idempotency_size == 0:
+            return None
+        return cls(
+            max_entries=config.idempotency_size,
+            max_bytes=int(config.idempotency_mb * 1024 * 1024),
+            ttl_seconds=config.idempotency_ttl_seconds
+        )
+
+    async def run(self, scope: Hashable, digest: bytes, compute: Callable[[], Awaitable[Any]],
+                  keep: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """(response, replayed): the stored or in-flight response for scope, else compute() once.
+
+        A response for which keep(response) is false is handed to waiting
+        duplicates but not stored. Raises IdempotencyConflict when scope was used
+        with a different digest. All access happens on the event loop thread, so
+        no lock is needed.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(scope)
+        if entry is not None:
+            stored_digest, response, expires_at, size = entry
+            if expires_at > now:
+                self._check(stored_digest, digest)
+                self._entries.move_to_end(scope)
+                IDEMPOTENCY_REQUESTS.labels('replayed').inc()
+                return response, True
+            self._remove(scope)
+
+        in_flight = self._in_flight.get(scope)
+        if in_flight is not None:
+            self._check(in_flight[0], digest)
+            IDEMPOTENCY_REQUESTS.labels('joined').inc()
+            # shield: a duplicate whose client disconnects must not cancel the first request's work
+            return await asyncio.shield(in_flight[1]), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[scope] = (digest, future)
+        IDEMPOTENCY_REQUESTS.labels('new').inc()
+        try:
+            response = await compute()
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Retrieved here so an error nobody joined is not reported as unhandled
+                future.exception()
+            raise
+        else:
+            future.set_result(response)
+            if keep is None or keep(response):
+                self._store(scope, digest, response)
+            return response, False
+        finally:
+            self._in_flight.pop(scope, None)
+
+    @staticmethod
+    def _check(stored: bytes, digest: bytes):
+        if stored != digest:
+            IDEMPOTENCY_REQUESTS.labels('conflict').inc()
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request body")
+
+    def _store(self, scope: Hashable, digest: bytes, response: Any):
+        size = (len(response) if isinstance(response, (bytes, bytearray)) else _deep_sizeof(response)) + 128
+        if size > self.max_bytes:
+            return
+        if scope in self._entries:
+            self._remove(scope)
+        self._entries[scope] = (digest, response, time.monotonic() + self.ttl_seconds, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        IDEMPOTENCY_ENTRIES.set(len(self._entries))
+
+    def _remove(self, scope: Hashable):
+        _, _, _, size = self._entries.pop(scope)
+        self._bytes -= size
+        IDEMPOTENCY_ENTRIES.set(len(self._entries))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'in_flight': len(self._in_flight),
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds
+        }
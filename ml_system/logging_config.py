@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML Service Logging
+Structured JSON logs written by a background listener, with per-prediction
+events aggregated into periodic summaries
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Attributes present on every LogRecord; anything else was passed via extra=
+_RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields become top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves JSON serialisation to the listener thread.
+
+    Like the stock prepare(), msg % args is merged on the caller's thread, so
+    an argument mutated after the call is logged as it was. The stock handler
+    also formats the whole line and drops exc_info so records can be pickled;
+    our queue is in-process, so that part waits for the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, stream=None,
+                      capture_loggers=('uvicorn', 'uvicorn.error', 'uvicorn.access')) -> QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    Safe to call more than once; later calls only adjust the level.
+    """
+    global _listener
+    level = (level or os.environ.get('ROOTUIP_LOG_LEVEL', 'INFO')).upper()
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter())
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        queue_handler = _DeferredQueueHandler(log_queue)
+        root.handlers = [queue_handler]
+        # uvicorn installs its own synchronous handlers; send those through the queue too
+        for name in capture_loggers:
+            captured = logging.getLogger(name)
+            captured.handlers = [queue_handler]
+            captured.propagate = False
+        return _listener
+
+
+def shutdown_logging():
+    """Flush pending summaries and stop the listener thread"""
+    global _listener
+    prediction_events.flush()
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def reinit_after_fork():
+    """Start a fresh listener in a forked child.
+
+    The child inherits _listener but not its thread, so records queued by the
+    old handler would never be written.
+    """
+    global _listener, _lock
+    _lock = threading.Lock()
+    prediction_events._lock = threading.Lock()
+    prediction_events._reset(time.monotonic())
+    _listener = None
+    configure_logging()
+
+
+class PredictionEventAggregator:
+    """Collapses per-prediction log events into one summary record per interval.
+
+    record() only updates counters; a summary is logged from the first call
+    after the interval elapses, or by a background thread once the interval
+    has passed with no further calls, so the last window before traffic goes
+    idle is not held back. A sample_rate > 0 additionally logs that fraction
+    of individual predictions at DEBUG.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 60.0, sample_rate: float = 0.0):
+        self.logger = logger
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self._reset(time.monotonic())
+
+    def _reset(self, now: float):
+        self._window_start = now
+        self._count = 0
+        self._probability_sum = 0.0
+        self._by_level: Dict[str, int] = {}
+
+    def record(self, risk_level: str, risk_probability: float):
+        now = time.monotonic()
+        with self._lock:
+            self._count += 1
+            self._probability_sum += risk_probability
+            self._by_level[risk_level] = self._by_level.get(risk_level, 0) + 1
+            due = now - self._window_start >= self.interval
+        if self.sample_rate and random.random() < self.sample_rate:
+            self.logger.debug('prediction', extra={
+                'event': 'prediction', 'risk_level': risk_level,
+                'risk_probability': round(risk_probability, 4)
+            })
+        if due:
+            self.flush(now)
+        else:
+            self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Started on first use, so pre-forked API workers each run their own
+        if self._flusher_pid == os.getpid() and self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid() and self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='prediction-summary', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                remaining = self._window_start + self.interval - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+                continue
+            self.flush()
+
+    def flush(self, now: Optional[float] = None):
+        """Log the current window (if non-empty) and start a new one"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._count == 0:
+                self._window_start = now
+                return
+            summary = {
+                'event': 'prediction_summary',
+                'window_seconds': round(now - self._window_start, 3),
+                'predictions': self._count,
+                'mean_risk_probability': round(self._probability_sum / self._count, 4),
+                'by_risk_level': dict(self._by_level)
+            }
+            self._reset(now)
+        self.logger.info('prediction summary', extra=summary)
+
+
+prediction_events = PredictionEventAggregator(
+    logging.getLogger('ROOTUIP_Predictor'),
+    interval=float(os.environ.get('ROOTUIP_LOG_SUMMARY_INTERVAL', '60')),
+    sample_rate=float(os.environ.get('ROOTUIP_LOG_SAMPLE_RATE', '0'))
+)
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML Service Metrics
+In-process counters, gauges and histograms rendered in Prometheus text format
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) tuned for sub-millisecond stages up to slow batches
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class _Metric:
+    """Base class for a metric family with optional labels"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> '_Metric':
+        """Return the child series for the given label values"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self) -> '_Metric':
+        raise NotImplementedError
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], '_Metric']]:
+        if self.labelnames:
+            return sorted(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        for label_values, child in self._series():
+            lines.extend(child._render_samples(self.name, self.labelnames, label_values))
+        return lines
+
+    def _render_samples(self, name, labelnames, label_values) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> 'Counter':
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _render_samples(self, name, labelnames, label_values) -> List[str]:
+        return [f"{name}_total{_format_labels(labelnames, label_values)} {_format_value(self._value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> 'Gauge':
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _render_samples(self, name, labelnames, label_values) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, label_values)} {_format_value(self._value)}"]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observe() is a bisect plus two additions"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def _new_child(self) -> 'Histogram':
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def _render_samples(self, name, labelnames, label_values) -> List[str]:
+        lines = []
+        cumulative = 0
+        bucket_labels = tuple(labelnames) + ('le',)
+        for bound, count in zip(self.buckets + (float('inf'),), self._counts):
+            cumulative += count
+            labels = _format_labels(bucket_labels, tuple(label_values) + (_format_value(bound),))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, label_values)
+        lines.append(f"{name}_sum{labels} {_format_value(self._sum)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders the exposition text"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or LATENCY_BUCKETS))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+# === Service metrics ===
+
+REGISTRY = MetricsRegistry()
+
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    'rootuip_ml_predict_stage_seconds',
+    'Time spent in each stage of the prediction path',
+    ['stage']
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'rootuip_ml_request_seconds',
+    'End-to-end HTTP request latency',
+    ['endpoint']
+)
+PREDICTIONS = REGISTRY.counter(
+    'rootuip_ml_predictions',
+    'Predictions served, by risk level',
+    ['risk_level']
+)
+PREDICTION_ERRORS = REGISTRY.counter(
+    'rootuip_ml_prediction_errors',
+    'Predictions that failed'
+)
+BATCH_SIZE = REGISTRY.histogram(
+    'rootuip_ml_batch_size',
+    'Number of shipments per batch prediction call',
+    buckets=BATCH_SIZE_BUCKETS
+)
+MODEL_INFO = REGISTRY.gauge(
+    'rootuip_ml_model_info',
+    'Currently loaded model (value is always 1)',
+    ['version', 'model']
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'rootuip_ml_requests_in_flight',
+    'Requests accepted but not yet answered (queue depth)'
+)
+HISTORY_BACKLOG = REGISTRY.gauge(
+    'rootuip_ml_history_backlog',
+    'Prediction history records waiting to be written'
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'rootuip_ml_prediction_cache_requests',
+    'Prediction cache lookups, by result',
+    ['result']
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    'rootuip_ml_prediction_cache_evictions',
+    'Entries evicted from the prediction cache to respect its caps'
+)
+CACHE_ENTRIES = REGISTRY.gauge(
+    'rootuip_ml_prediction_cache_entries',
+    'Entries held in the prediction cache'
+)
+CACHE_BYTES = REGISTRY.gauge(
+    'rootuip_ml_prediction_cache_bytes',
+    'Approximate memory held by the prediction cache'
+)
+FEATURE_DRIFT_PSI = REGISTRY.gauge(
+    'rootuip_ml_feature_drift_psi',
+    'Population stability index of live inputs vs the training reference',
+    ['feature']
+)
+FEATURE_OUT_OF_RANGE = REGISTRY.gauge(
+    'rootuip_ml_feature_out_of_range_ratio',
+    'Share of live inputs outside the range seen in training',
+    ['feature']
+)
+FLEET_OPEN_SHIPMENTS = REGISTRY.gauge(
+    'rootuip_ml_fleet_open_shipments',
+    'Open shipments tracked by the fleet re-scorer'
+)
+FLEET_RESCORED = REGISTRY.counter(
+    'rootuip_ml_fleet_rescored',
+    'Shipments re-scored by the fleet re-scorer, by trigger',
+    ['reason']
+)
+RISK_BAND_CROSSINGS = REGISTRY.counter(
+    'rootuip_ml_risk_band_crossings',
+    'Re-scored shipments whose risk level changed, by direction',
+    ['direction']
+)
+TENANT_MODEL_REQUESTS = REGISTRY.counter(
+    'rootuip_ml_tenant_model_requests',
+    'Tenant model lookups, by tenant and result (hit, miss, default)',
+    ['tenant', 'result']
+)
+TENANT_REQUEST_SECONDS = REGISTRY.histogram(
+    'rootuip_ml_tenant_request_seconds',
+    'End-to-end HTTP request latency, by tenant',
+    ['tenant']
+)
+TENANT_MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    'rootuip_ml_tenant_model_load_seconds',
+    'Time to load a tenant model from disk'
+)
+TENANT_MODEL_EVICTIONS = REGISTRY.counter(
+    'rootuip_ml_tenant_model_evictions',
+    'Tenant models dropped from memory to respect the resident size cap'
+)
+TENANT_MODELS_RESIDENT = REGISTRY.gauge(
+    'rootuip_ml_tenant_models_resident',
+    'Tenant models held in memory'
+)
+TENANT_MODEL_BYTES = REGISTRY.gauge(
+    'rootuip_ml_tenant_model_bytes',
+    'Approximate memory held by resident tenant models'
+)
+IDEMPOTENCY_REQUESTS = REGISTRY.counter(
+    'rootuip_ml_idempotency_requests',
+    'Requests carrying an idempotency key, by result (new, replayed, joined, conflict)',
+    ['result']
+)
+IDEMPOTENCY_ENTRIES = REGISTRY.gauge(
+    'rootuip_ml_idempotency_entries',
+    'Responses held for replay to retried requests'
+)
+HISTORY_DEDUPED = REGISTRY.counter(
+    'rootuip_ml_history_deduped',
+    'History records skipped as duplicates of an already recorded request'
+)
+STREAM_SUBSCRIBERS = REGISTRY.gauge(
+    'rootuip_ml_stream_subscribers',
+    'Open risk stream (SSE) subscriptions in this process'
+)
+STREAM_EVENTS_ROUTED = REGISTRY.counter(
+    'rootuip_ml_stream_events_routed',
+    'Risk events queued for stream subscribers'
+)
+STREAM_EVENTS_COALESCED = REGISTRY.counter(
+    'rootuip_ml_stream_events_coalesced',
+    'Risk events merged into an unread event for the same shipment'
+)
+SCHEDULER_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'rootuip_ml_scheduler_queue_wait_seconds',
+    'Time inference work waited for a thread, by priority class',
+    ['priority'],
+    buckets=LATENCY_BUCKETS + (10.0, 30.0, 60.0, 300.0)
+)
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge(
+    'rootuip_ml_scheduler_queue_depth',
+    'Inference work items waiting for a thread, by priority class',
+    ['priority']
+)
+SCHEDULER_RUNNING = REGISTRY.gauge(
+    'rootuip_ml_scheduler_running',
+    'Inference work items running, by priority class',
+    ['priority']
+)
+SCHEDULER_DROPPED = REGISTRY.counter(
+    'rootuip_ml_scheduler_dropped',
+    'Inference work dropped because it could not start before its deadline, by priority class',
+    ['priority']
+)
@@ -6,135 +6,514 @@ ROOTUIP Real-Time D&D Prediction API
 
 import pickle
 import numpy as np
-import pandas as pd
 from datetime import datetime
-import json
 import os
+import time
 import logging
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, NamedTuple, Optional
+
+from .features import FEATURE_NAMES, DEFAULT_FEATURE_VALUES, DERIVED_FEATURES, derive_features
+from .metrics import PREDICTIONS, PREDICTION_ERRORS, BATCH_SIZE, MODEL_INFO
+from .profiling import observe_stage
+from .logging_config import configure_logging, prediction_events
+from .config import MLConfig, get_config
+from .prediction_cache import PredictionCache
+from .fallback import FALLBACK_POLICIES, RuleBasedScorer, load_or_build_synthetic_model
+from .drift import DriftMonitor
+from .categorical import CATEGORICAL_FEATURES, CategoricalEncoder
+from .feature_store import FeatureStore
+from .history import HistoryWriter, new_prediction_ids
+from .uncertainty import check_coverage, spread_fields, tree_forest, tree_spread
+
+# sklearn is only imported when a model is unpickled or the fallback is built
+# Logging is configured by the entry point (see logging_config.configure_logging)
+logger = logging.getLogger('ROOTUIP_Predictor')
 
-# ✅ Make sure this is here!
-from sklearn.preprocessing import StandardScaler
 
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger('ROOTUIP_Predictor')
+# _get_risk_level as arrays: level i covers probabilities below RISK_LEVEL_THRESHOLDS[i]
+RISK_LEVELS = ('VERY_LOW', 'LOW', 'MODERATE', 'HIGH', 'CRITICAL')
+RISK_LEVEL_THRESHOLDS = np.array([0.2, 0.4, 0.6, 0.8])
+
+# Result shapes: 'minimal' is prediction/probability/level, 'standard' adds the
+# derived percentages and recommendation, 'full' adds explanations, timestamp and model_info
+RESPONSE_PROFILES = ('minimal', 'standard', 'full')
+
+
+class ModelUnavailableError(RuntimeError):
+    """No trained model could be loaded and the fallback policy is 'fail'"""
+
+
+class LoadedModel(NamedTuple):
+    """Everything scoring reads about one model. load_model publishes a new one with a
+    single assignment and each prediction reads it once, so inference on the scheduler's
+    threads never pairs a new model with the old scaler or feature order."""
+    model: Any
+    feature_names: List[str]
+    scaler: Any
+    model_version: str
+    # Training input distributions for drift monitoring (models saved before it have none)
+    reference_distributions: Optional[Dict[str, Any]]
+    # Carrier/port/lane lookup tables (see categorical.py); None for scalar-only models
+    categorical_encoder: Optional[CategoricalEncoder]
+    feature_defaults: Dict[str, float]
+    feature_importances: Optional[np.ndarray]
+    token: str
+    using_fallback: bool
+
 
 class DDPredictor:
     """Real-time D&D risk prediction system"""
 
-    def __init__(self, model_path: str = '/home/iii/ROOTUIP/models/dnd_model.pkl'):
+    def __init__(self, model_path: Optional[str] = None,
+                 cache: Optional[PredictionCache] = None,
+                 history_dir: Optional[str] = None,
+                 fallback: Optional[str] = None, fallback_dir: Optional[str] = None,
+                 model_check_interval: float = 30.0, drift_monitor: Optional[DriftMonitor] = None,
+                 feature_store: Optional[FeatureStore] = None, tenant: Optional[str] = None,
+                 config: Optional[MLConfig] = None):
+        """model_path, history_dir and fallback default to config's (ml_system.config.get_config())"""
+        self.config = config or get_config()
+        fallback = fallback or self.config.model_fallback
+        if fallback not in FALLBACK_POLICIES:
+            raise ValueError(f"Unknown fallback policy '{fallback}', expected one of {FALLBACK_POLICIES}")
+        model_path = model_path or self.config.model_path
+        history_dir = history_dir or self.config.history_dir
         self.model_path = model_path
-        self.model = None
-        self.feature_names = None
-        self.scaler = None
+        self.history_dir = history_dir
+        self.history = HistoryWriter(history_dir, flush_interval=self.config.history_flush_seconds,
+                                     max_buffered=self.config.history_buffer_records)
+        # 'synthetic': cached synthetic forest, 'rules': RuleBasedScorer, 'fail': raise ModelUnavailableError
+        self.fallback = fallback
+        self.fallback_dir = fallback_dir or os.path.join(os.path.dirname(model_path), 'fallback')
+        self.model_check_interval = model_check_interval
+        self._next_model_check = 0.0
+        # Serializes reloads; reentrant so the fallback check can reload while holding it
+        self._reload_lock = threading.RLock()
+        self._loaded: Optional[LoadedModel] = None
         self.threshold = 0.5  # Default threshold
+        self.cache = cache
+        self.drift_monitor = drift_monitor
+        self.feature_store = feature_store
+        # Set for per-tenant models held by tenancy.TenantModels; they do not own the model info gauge
+        self.tenant = tenant
+        self._model_generation = 0
+        self._model_info_labels = None
+        # (model, its CompactForest view) for per-tree spreads, built on first use per model
+        self._tree_view = (None, None)
+        self._tree_view_lock = threading.Lock()
         self.load_model()
 
+    # The current model's fields, read-only; a prediction reads self._loaded once instead
+    model = property(lambda self: self._loaded.model)
+    feature_names = property(lambda self: self._loaded.feature_names)
+    scaler = property(lambda self: self._loaded.scaler)
+    model_version = property(lambda self: self._loaded.model_version)
+    reference_distributions = property(lambda self: self._loaded.reference_distributions)
+    categorical_encoder = property(lambda self: self._loaded.categorical_encoder)
+    feature_defaults = property(lambda self: self._loaded.feature_defaults)
+    using_fallback = property(lambda self: self._loaded.using_fallback)
+
+    @property
+    def current(self) -> LoadedModel:
+        """The model in service now; pass it to feature_row/score_matrix to keep a multi-step job on one model"""
+        return self._loaded
+
+    @property
+    def model_token(self) -> str:
+        """Changes whenever a model is (re)loaded"""
+        return self._loaded.token
+
     def load_model(self):
-        """Load trained model or create fallback"""
-        try:
-            if not os.path.exists(self.model_path):
-                os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-                logger.warning(f"Model not found at {self.model_path}. Using default model.")
-                self._create_default_model()
-            else:
+        """Load trained model or create fallback; predictions keep using the previous
+        model until the new one is complete"""
+        with self._reload_lock:
+            model_data, using_fallback = self._load_model()
+            model = model_data['model']
+            encoder = model_data.get('categorical_encoder')
+            # Unknown identifiers encode to the training prior, so that is also the default
+            feature_defaults = dict(DEFAULT_FEATURE_VALUES)
+            if encoder is not None:
+                feature_defaults.update(encoder.encode_one({}))
+            self._model_generation += 1
+            version = str(model_data.get('model_version', '2.0'))
+            loaded = LoadedModel(
+                model=model, feature_names=list(model_data['feature_names']), scaler=model_data.get('scaler'),
+                model_version=version, reference_distributions=model_data.get('reference_distributions'),
+                categorical_encoder=encoder, feature_defaults=feature_defaults,
+                # feature_importances_ is recomputed over every tree on each access, so read it once
+                feature_importances=getattr(model, 'feature_importances_', None),
+                token=f"{version}:{self._model_generation}", using_fallback=using_fallback)
+            self._loaded = loaded
+            if self.cache is not None:
+                self.cache.clear()
+            if self.drift_monitor is not None:
+                self.drift_monitor.set_reference(loaded.reference_distributions, loaded.feature_names)
+            if self.tenant is not None:
+                return
+            if self._model_info_labels is not None:
+                MODEL_INFO.labels(*self._model_info_labels).set(0)
+            self._model_info_labels = (version, type(model).__name__)
+            MODEL_INFO.labels(*self._model_info_labels).set(1)
+
+    def _load_model(self):
+        """(model data, using fallback) for the model file, or for the fallback policy"""
+        if os.path.exists(self.model_path):
+            try:
                 with open(self.model_path, 'rb') as f:
                     model_data = pickle.load(f)
-                self.model = model_data['model']
-                self.feature_names = model_data['feature_names']
-                self.scaler = model_data.get('scaler', None)
+                model_data = dict(model_data, categorical_encoder=CategoricalEncoder.from_dict(
+                    model_data.get('categorical_encoding')))
                 logger.info(f"Model loaded from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
-            self._create_default_model()
-
-    def _create_default_model(self):
-        """Fallback: build a synthetic RandomForest with 94% target"""
-        from sklearn.ensemble import RandomForestClassifier
-
-        self.feature_names = [
-            'transit_time_days', 'port_congestion_index', 'carrier_reliability_score',
-            'documentation_completeness', 'customs_complexity_score', 'container_value_usd',
-            'days_until_eta', 'historical_dd_rate', 'route_risk_score', 'seasonal_risk_factor',
-            'risk_composite_score', 'historical_performance_ratio', 'route_congestion_product',
-            'time_pressure_index', 'documentation_risk_factor'
-        ]
-
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            class_weight='balanced'
-        )
-
-        self._initialize_synthetic_model()
-        logger.info("Default fallback model created with 94% target accuracy.")
-
-    def _initialize_synthetic_model(self):
-        """✅ CORRECTED: Fit the scaler properly!"""
-        np.random.seed(42)
-        n_samples = 1000
-        n_features = len(self.feature_names)
-        X = np.random.randn(n_samples, n_features)
-        y = np.zeros(n_samples)
-        dd_indices = np.random.choice(n_samples, size=int(n_samples * 0.06), replace=False)
-        y[dd_indices] = 1
-
-        self.model.fit(X, y)
-
-        self.scaler = StandardScaler()
-        self.scaler.fit(X)
-
-        logger.info("Synthetic model and scaler fitted correctly.")
-
-    def predict(self, feature_data: Dict[str, Any]) -> Dict[str, Any]:
+                return model_data, False
+            except Exception as e:
+                logger.error(f"Error loading model: {str(e)}")
+        else:
+            logger.warning(f"Model not found at {self.model_path}. Using '{self.fallback}' fallback.")
+        return self._create_default_model(), True
+
+    def _create_default_model(self) -> Dict[str, Any]:
+        """Model data for the fallback chosen by self.fallback"""
+        if self.fallback == 'fail':
+            raise ModelUnavailableError(f"No usable model at {self.model_path}")
+
+        feature_names = list(FEATURE_NAMES)
+        if self.fallback == 'rules':
+            model_data = {'model': RuleBasedScorer(feature_names), 'scaler': None, 'model_version': 'rules'}
+        else:
+            # Built once per spec and cached on disk, so restarts do not refit 100 trees
+            model_data = load_or_build_synthetic_model(self.fallback_dir)
+            model_data = {name: model_data[name] for name in ('model', 'scaler', 'model_version')}
+        self._next_model_check = time.monotonic() + self.model_check_interval
+        logger.info(f"Serving with fallback model {model_data['model_version']}")
+        return dict(model_data, feature_names=feature_names)
+
+    def _check_for_model(self):
+        """While on a fallback, periodically look for a real model and load it once it appears"""
+        now = time.monotonic()
+        if now < self._next_model_check or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_model_check = now + self.model_check_interval
+            if os.path.exists(self.model_path):
+                logger.info(f"Model appeared at {self.model_path}; replacing fallback")
+                self.load_model()
+        finally:
+            self._reload_lock.release()
+
+    def predict(self, feature_data: Dict[str, Any], use_cache: bool = True,
+                response_profile: str = 'full', request_id: Optional[str] = None,
+                interval: Optional[float] = None) -> Dict[str, Any]:
+        """Score one shipment; request_id (the caller's idempotency key) dedupes its history record.
+        With interval (a coverage such as 0.8) the result carries the trees' spread, see uncertainty.py."""
+        self._check_profile(response_profile)
+        if interval is not None:
+            interval = check_coverage(interval)
+        if self.using_fallback:
+            self._check_for_model()
+        loaded = self._loaded
         try:
-            features = self._prepare_features(feature_data)
-            features_scaled = self.scaler.transform([features]) if self.scaler else [features]
+            start = time.perf_counter()
+            features = self._prepare_features(feature_data, loaded)
+            if self.drift_monitor is not None:
+                self.drift_monitor.observe(features)
+            start = observe_stage('feature_prep', start)
+
+            cache_key = None
+            if self.cache is not None and use_cache:
+                cache_key = self.cache.key(features, self._cache_token(loaded, response_profile, interval))
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    if 'timestamp' in cached:
+                        cached['timestamp'] = datetime.now().isoformat()
+                    # A cache hit is still a new prediction that outcomes can be reported against
+                    cached['prediction_id'] = new_prediction_ids(1, request_id)[0]
+                    start = observe_stage('cache_lookup', start)
+                    self._record([(feature_data, cached)], request_id)
+                    observe_stage('history_write', start)
+                    return cached
+
+            predictions, risk_probabilities, spread = self._score([features], interval, loaded)
+            start = time.perf_counter()
+
+            result = self._build_result(features, predictions[0], risk_probabilities[0], response_profile, loaded)
+            if interval is not None:
+                result['uncertainty'] = spread_fields(spread, 0)
+            result['prediction_id'] = new_prediction_ids(1, request_id)[0]
+            start = observe_stage('explain', start)
+
+            self._record([(feature_data, result)], request_id)
+            observe_stage('history_write', start)
+            if cache_key is not None:
+                self.cache.put(cache_key, dict(result))
+
+            return result
 
-            prediction = self.model.predict(features_scaled)[0]
-            probabilities = self.model.predict_proba(features_scaled)[0]
-            risk_probability = probabilities[1] if len(probabilities) > 1 else probabilities[0]
+        except Exception as e:
+            PREDICTION_ERRORS.inc()
+            logger.error("Prediction error: %s", e, exc_info=True, extra={'event': 'prediction_error'})
+            return {'error': str(e), 'timestamp': datetime.now().isoformat(), 'status': 'failed'}
+
+    def predict_batch(self, feature_data_list: List[Dict[str, Any]], use_cache: bool = True,
+                      response_profile: str = 'full', request_id: Optional[str] = None,
+                      interval: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Score many shipments with one scaler and forest pass; only cache misses are scored.
+
+        With a 'minimal' or 'standard' profile rows carry no timestamp or model_info;
+        see batch_metadata() for the once-per-batch equivalent.
+        """
+        self._check_profile(response_profile)
+        if interval is not None:
+            interval = check_coverage(interval)
+        BATCH_SIZE.observe(len(feature_data_list))
+        if not feature_data_list:
+            return []
+        if self.using_fallback:
+            self._check_for_model()
+        loaded = self._loaded
+        try:
+            start = time.perf_counter()
+            rows = [self._prepare_features(fd, loaded) for fd in feature_data_list]
+            if self.drift_monitor is not None:
+                self.drift_monitor.observe_many(rows)
+            start = observe_stage('feature_prep', start)
+
+            results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+            keys: List[Optional[bytes]] = [None] * len(rows)
+            if self.cache is not None and use_cache:
+                now = datetime.now().isoformat()
+                token = self._cache_token(loaded, response_profile, interval)
+                for i, features in enumerate(rows):
+                    keys[i] = self.cache.key(features, token)
+                    cached = self.cache.get(keys[i])
+                    if cached is not None:
+                        if 'timestamp' in cached:
+                            cached['timestamp'] = now
+                        results[i] = cached
+                start = observe_stage('cache_lookup', start)
+
+            misses = [i for i, result in enumerate(results) if result is None]
+            if misses:
+                predictions, risk_probabilities, spread = self._score([rows[i] for i in misses], interval, loaded)
+                start = time.perf_counter()
+
+                for j, i in enumerate(misses):
+                    results[i] = self._build_result(rows[i], predictions[j], risk_probabilities[j], response_profile,
+                                                    loaded)
+                    if interval is not None:
+                        results[i]['uncertainty'] = spread_fields(spread, j)
+                start = observe_stage('explain', start)
+
+                for i in misses:
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], dict(results[i]))
+
+            for result, prediction_id in zip(results, new_prediction_ids(len(results), request_id)):
+                result['prediction_id'] = prediction_id
+            self._record(list(zip(feature_data_list, results)), request_id)
+            observe_stage('history_write', start)
+
+            return results
 
-            result = {
-                'timestamp': datetime.now().isoformat(),
+        except Exception as e:
+            PREDICTION_ERRORS.inc(len(feature_data_list))
+            logger.error("Batch prediction error: %s", e, exc_info=True, extra={'event': 'prediction_error'})
+            failed = {'error': str(e), 'timestamp': datetime.now().isoformat(), 'status': 'failed'}
+            return [dict(failed) for _ in feature_data_list]
+
+    def batch_metadata(self) -> Dict[str, Any]:
+        """Model version and timestamp reported once per batch response"""
+        return {'model_version': self.model_version, 'timestamp': datetime.now().isoformat()}
+
+    @staticmethod
+    def _cache_token(loaded: LoadedModel, response_profile: str, interval: Optional[float]) -> str:
+        token = f"{loaded.token}/{response_profile}"
+        return token if interval is None else f"{token}/{interval}"
+
+    @staticmethod
+    def _check_profile(response_profile: str):
+        if response_profile not in RESPONSE_PROFILES:
+            raise ValueError(f"Unknown response profile '{response_profile}', expected one of {RESPONSE_PROFILES}")
+
+    def predict_matrix(self, matrix: np.ndarray, shipment_ids: Optional[List[Any]] = None,
+                       request_id: Optional[str] = None, loaded: Optional[LoadedModel] = None,
+                       identifiers: Optional[Dict[str, List[Optional[str]]]] = None):
+        """Batch-native scoring for the binary transport: one row per shipment in
+        feature_names order of loaded (default: the current model). Returns (predictions,
+        risk probabilities, risk level codes into RISK_LEVELS, prediction ids) and skips
+        the per-row result dicts and cache. identifiers, the raw carrier/port/lane columns,
+        are kept in the history next to the encoded ones.
+        """
+        BATCH_SIZE.observe(len(matrix))
+        if len(matrix) == 0:
+            # The scaler rejects zero-row input; an empty batch gets an empty answer like the JSON endpoint
+            return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.uint8), [])
+        if self.using_fallback:
+            self._check_for_model()
+        loaded = loaded or self._loaded
+        try:
+            if self.drift_monitor is not None:
+                self.drift_monitor.observe_many(matrix)
+            predictions, risk_probabilities, levels = self.score_matrix(matrix, loaded)
+            start = time.perf_counter()
+            prediction_ids = self._record_matrix(matrix, predictions, risk_probabilities, levels, shipment_ids,
+                                                 request_id, loaded.feature_names, identifiers)
+            observe_stage('history_write', start)
+            return predictions, risk_probabilities, levels, prediction_ids
+        except Exception as e:
+            PREDICTION_ERRORS.inc(len(matrix))
+            logger.error("Matrix prediction error: %s", e, exc_info=True, extra={'event': 'prediction_error'})
+            raise
+
+    def score_matrix(self, matrix: np.ndarray, loaded: Optional[LoadedModel] = None):
+        """Score prepared rows without history, cache, drift or prediction counters (internal
+        re-scoring). Returns (predictions, risk probabilities, risk level codes into RISK_LEVELS).
+        """
+        predictions, risk_probabilities, _ = self._score(matrix, loaded=loaded)
+        levels = np.searchsorted(RISK_LEVEL_THRESHOLDS, risk_probabilities, side='right').astype(np.uint8)
+        return predictions, risk_probabilities, levels
+
+    def _score(self, rows: List[List[float]], interval: Optional[float] = None,
+               loaded: Optional[LoadedModel] = None):
+        """Scale and run one forest pass; returns (class predictions, D&D probabilities, spread).
+
+        spread is None unless an interval coverage is given; then the pass keeps
+        every tree's probability and spread is their uncertainty.tree_spread.
+        """
+        loaded = loaded or self._loaded
+        model = loaded.model
+        start = time.perf_counter()
+        matrix = np.asarray(rows, dtype=np.float64)
+        matrix = loaded.scaler.transform(matrix) if loaded.scaler else matrix
+        start = observe_stage('scale', start)
+        forest = self._tree_forest(model) if interval is not None else None
+        if forest is not None:
+            spread = tree_spread(forest.tree_probabilities(matrix), interval)
+            risk_probabilities = spread['mean']
+            predictions = model.classes_.take((risk_probabilities > 0.5).astype(np.int64))
+            observe_stage('inference', start)
+            return predictions, risk_probabilities, spread
+        probabilities = model.predict_proba(matrix)
+        # Same decision as model.predict(), without a second pass over the trees
+        predictions = model.classes_.take(np.argmax(probabilities, axis=1))
+        risk_probabilities = probabilities[:, 1] if probabilities.shape[1] > 1 else probabilities[:, 0]
+        observe_stage('inference', start)
+        return predictions, risk_probabilities, None
+
+    def _tree_forest(self, model):
+        """model as a CompactForest, or None if it has no trees"""
+        cached, forest = self._tree_view
+        if cached is not model:
+            with self._tree_view_lock:
+                cached, forest = self._tree_view
+                if cached is not model:
+                    forest = tree_forest(model)
+                    self._tree_view = (model, forest)
+        return forest
+
+    def _build_result(self, features: List[float], prediction, risk_probability,
+                      response_profile: str = 'full', loaded: Optional[LoadedModel] = None) -> Dict[str, Any]:
+        """Only the work behind the fields of response_profile is done"""
+        loaded = loaded or self._loaded
+        risk_probability = float(risk_probability)
+        if response_profile == 'minimal':
+            return {
+                'prediction': int(prediction),
+                'risk_probability': risk_probability,
+                'risk_level': self._get_risk_level(risk_probability)
+            }
+        if response_profile == 'standard':
+            return {
                 'prediction': int(prediction),
-                'risk_probability': float(risk_probability),
+                'risk_probability': risk_probability,
                 'risk_percentage': round(risk_probability * 100, 2),
                 'risk_level': self._get_risk_level(risk_probability),
                 'will_have_dd': bool(prediction == 1),
                 'prevention_confidence': round((1 - risk_probability) * 100, 2),
-                'recommendation': self._get_recommendation(risk_probability),
-                'top_risk_factors': self._get_feature_importance(features)[:5],
-                'model_info': {
-                    'version': '2.0',
-                    'accuracy': 94.2,
-                    'last_updated': datetime.now().isoformat()
-                }
+                'recommendation': self._get_recommendation(risk_probability)
             }
+        now = datetime.now().isoformat()
+        return {
+            'timestamp': now,
+            'prediction': int(prediction),
+            'risk_probability': risk_probability,
+            'risk_percentage': round(risk_probability * 100, 2),
+            'risk_level': self._get_risk_level(risk_probability),
+            'will_have_dd': bool(prediction == 1),
+            'prevention_confidence': round((1 - risk_probability) * 100, 2),
+            'recommendation': self._get_recommendation(risk_probability),
+            'top_risk_factors': self._get_feature_importance(features, loaded)[:5],
+            'model_info': {
+                'version': loaded.model_version,
+                'accuracy': 94.2,
+                'last_updated': now
+            }
+        }
 
-            logger.info(f"Prediction complete: Risk={result['risk_percentage']}%, Level={result['risk_level']}")
-            self._save_prediction_history(feature_data, result)
-
-            return result
-
-        except Exception as e:
-            logger.error(f"Prediction error: {str(e)}")
-            return {'error': str(e), 'timestamp': datetime.now().isoformat(), 'status': 'failed'}
-
-    def predict_batch(self, feature_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        return [self.predict(fd) for fd in feature_data_list]
-
-    def _prepare_features(self, feature_data: Dict[str, Any]) -> List[float]:
+    def _record(self, records: List[Any], request_id: Optional[str] = None):
+        """Events, counters and one history append for (input, result) pairs"""
+        for _, result in records:
+            prediction_events.record(result['risk_level'], result['risk_probability'])
+            PREDICTIONS.labels(result['risk_level']).inc()
+        self.history.write(records, request_id=request_id)
+
+    def _record_matrix(self, matrix: np.ndarray, predictions, risk_probabilities, levels,
+                       shipment_ids: Optional[List[Any]] = None, request_id: Optional[str] = None,
+                       feature_names: Optional[List[str]] = None,
+                       identifiers: Optional[Dict[str, List[Optional[str]]]] = None) -> List[str]:
+        """Same bookkeeping as _record for a whole matrix; returns the prediction ids"""
+        feature_names = feature_names or self.feature_names
+        identifiers = {name: values for name, values in (identifiers or {}).items() if name in CATEGORICAL_FEATURES}
+        timestamp = datetime.now().isoformat()
+        prediction_ids = new_prediction_ids(len(matrix), request_id)
+        records = []
+        for n, (row, prediction, probability, level) in enumerate(zip(
+                matrix.tolist(), predictions.tolist(), risk_probabilities.tolist(), levels.tolist())):
+            risk_level = RISK_LEVELS[level]
+            prediction_events.record(risk_level, probability)
+            input_data = dict(zip(feature_names, row))
+            for name, values in identifiers.items():
+                input_data[name] = values[n]
+            if shipment_ids is not None:
+                input_data['shipment_id'] = shipment_ids[n]
+            records.append((input_data, {
+                'timestamp': timestamp, 'prediction_id': prediction_ids[n], 'prediction': int(prediction),
+                'risk_probability': probability, 'risk_level': risk_level
+            }))
+        for code, count in enumerate(np.bincount(levels, minlength=len(RISK_LEVELS)).tolist()):
+            if count:
+                PREDICTIONS.labels(RISK_LEVELS[code]).inc(count)
+        self.history.write(records, request_id=request_id)
+        return prediction_ids
+
+    def enrich(self, feature_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete a request that may carry only identifiers: feature store values for its
+        carrier/port/lane, then defaults for other missing base features, then derived features.
+        Values the caller sent are kept.
+        """
+        data = dict(feature_data)
+        if self.feature_store is not None:
+            for name, value in self.feature_store.lookup(data).items():
+                if data.get(name) is None:
+                    data[name] = value
+        for name in FEATURE_NAMES:
+            if name not in DERIVED_FEATURES and data.get(name) is None:
+                data[name] = self.feature_defaults.get(name, 0.0)
+        return derive_features(data)
+
+    def feature_row(self, feature_data: Dict[str, Any], loaded: Optional[LoadedModel] = None) -> List[float]:
+        """Enriched request as one model input row in feature_names order"""
+        return self._prepare_features(self.enrich(feature_data), loaded)
+
+    def _prepare_features(self, feature_data: Dict[str, Any], loaded: Optional[LoadedModel] = None) -> List[float]:
+        loaded = loaded or self._loaded
+        if loaded.categorical_encoder is not None:
+            # Encoded values a caller sends directly take precedence over its identifiers
+            feature_data = {**loaded.categorical_encoder.encode_one(feature_data), **feature_data}
+        defaults = loaded.feature_defaults
         features = []
-        for feature in self.feature_names:
-            value = feature_data.get(feature, self._get_default_feature_value(feature))
+        for feature in loaded.feature_names:
+            value = feature_data.get(feature, defaults.get(feature, 0.0))
             if isinstance(value, (int, float)):
                 features.append(float(value))
             elif isinstance(value, bool):
@@ -143,19 +522,6 @@ class DDPredictor:
                 features.append(0.0)
         return features
 
-    def _get_default_feature_value(self, feature: str) -> float:
-        defaults = {
-            'transit_time_days': 14.0, 'port_congestion_index': 0.5,
-            'carrier_reliability_score': 0.85, 'documentation_completeness': 0.9,
-            'customs_complexity_score': 0.3, 'container_value_usd': 50000.0,
-            'days_until_eta': 14.0, 'historical_dd_rate': 0.15,
-            'route_risk_score': 0.5, 'seasonal_risk_factor': 0.5,
-            'risk_composite_score': 0.5, 'historical_performance_ratio': 0.85,
-            'route_congestion_product': 0.25, 'time_pressure_index': 0.3,
-            'documentation_risk_factor': 0.1
-        }
-        return defaults.get(feature, 0.0)
-
     def _get_risk_level(self, prob: float) -> str:
         if prob < 0.2: return 'VERY_LOW'
         elif prob < 0.4: return 'LOW'
@@ -170,42 +536,64 @@ class DDPredictor:
         elif prob < 0.8: return "Expedite clearance & prep contingencies"
         else: return "URGENT: Immediate intervention required"
 
-    def _get_feature_importance(self, features: List[float]) -> List[Dict[str, Any]]:
+    def _get_feature_importance(self, features: List[float],
+                                loaded: Optional[LoadedModel] = None) -> List[Dict[str, Any]]:
+        loaded = loaded or self._loaded
         scores = []
-        if hasattr(self.model, 'feature_importances_'):
-            for name, val, imp in zip(self.feature_names, features, self.model.feature_importances_):
+        if loaded.feature_importances is not None:
+            for name, val, imp in zip(loaded.feature_names, features, loaded.feature_importances):
                 if imp > 0.01:
                     scores.append({
                         'feature': name,
                         'value': round(val, 3),
                         'importance': round(imp * 100, 2),
-                        'impact': 'increases_risk' if val > self._get_default_feature_value(name) else 'decreases_risk'
+                        'impact': 'increases_risk' if val > loaded.feature_defaults.get(name, 0.0) else 'decreases_risk'
                     })
             scores.sort(key=lambda x: x['importance'], reverse=True)
         return scores
 
     def _save_prediction_history(self, input_data: Dict[str, Any], result: Dict[str, Any]):
-        history_dir = '/home/iii/ROOTUIP/ml-system/prediction_history'
-        os.makedirs(history_dir, exist_ok=True)
-        file = os.path.join(history_dir, f"predictions_{datetime.now().strftime('%Y-%m-%d')}.jsonl")
-        with open(file, 'a') as f:
-            f.write(json.dumps({'timestamp': result['timestamp'], 'input': input_data, 'result': result}) + '\n')
+        self.history.write([(input_data, result)])
 
     def get_model_stats(self) -> Dict[str, Any]:
-        return {'model': type(self.model).__name__, 'features': self.feature_names, 'accuracy': 94.0}
+        loaded = self._loaded
+        stats = {
+            'model': type(loaded.model).__name__, 'features': loaded.feature_names, 'accuracy': 94.0,
+            'version': loaded.model_version, 'fallback': loaded.using_fallback
+        }
+        if self.tenant is not None:
+            stats['tenant'] = self.tenant
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        if self.feature_store is not None:
+            stats['feature_store'] = self.feature_store.stats()
+        return stats
 
 # === Public API ===
 
-def predict_dd_risk(feature_data: Dict[str, Any]) -> Dict[str, Any]:
-    return DDPredictor().predict(feature_data)
+_default_predictor: Optional[DDPredictor] = None
+_default_predictor_lock = threading.Lock()
+
+def get_predictor() -> DDPredictor:
+    """Process-wide predictor, loaded on first use instead of once per call"""
+    global _default_predictor
+    if _default_predictor is None:
+        with _default_predictor_lock:
+            if _default_predictor is None:
+                _default_predictor = DDPredictor()
+    return _default_predictor
+
+def predict_dd_risk(feature_data: Dict[str, Any], response_profile: str = 'full') -> Dict[str, Any]:
+    return get_predictor().predict(feature_data, response_profile=response_profile)
 
-def predict_batch(feature_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    return DDPredictor().predict_batch(feature_data_list)
+def predict_batch(feature_data_list: List[Dict[str, Any]], response_profile: str = 'full') -> List[Dict[str, Any]]:
+    return get_predictor().predict_batch(feature_data_list, response_profile=response_profile)
 
 def get_model_info() -> Dict[str, Any]:
-    return DDPredictor().get_model_stats()
+    return get_predictor().get_model_stats()
 
 if __name__ == "__main__":
+    configure_logging()
     test_shipment = {
         'transit_time_days': 18, 'port_congestion_index': 0.75,
         'carrier_reliability_score': 0.82, 'documentation_completeness': 0.95,
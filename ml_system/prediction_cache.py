@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Prediction Cache
+Content-addressed LRU/TTL cache of prediction results keyed by the quantized
+feature vector and the loaded model
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .config import MLConfig, get_config
+from .metrics import CACHE_REQUESTS, CACHE_EVICTIONS, CACHE_ENTRIES, CACHE_BYTES
+
+
+def _deep_sizeof(obj: Any) -> int:
+    """Approximate memory held by a result dict (containers plus leaves)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(v) for v in obj)
+    return size
+
+
+class PredictionCache:
+    """Bounded LRU cache with per-entry TTL and a memory cap.
+
+    Results are stored as returned by DDPredictor and handed back as shallow
+    copies, so callers must not mutate nested values of a cached result.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 900.0, decimals: int = 4):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self._entries: 'OrderedDict[bytes, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> Optional['PredictionCache']:
+        """Build the cache from the configured cache_* settings (ROOTUIP_PREDICTION_CACHE_*); None when disabled"""
+        config = config or get_config()
+        if config.cache_size <= 0:
+            return None
+        return cls(
+            max_entries=config.cache_size,
+            max_bytes=int(config.cache_mb * 1024 * 1024),
+            ttl_seconds=config.cache_ttl_seconds
+        )
+
+    def key(self, features, model_token: str) -> bytes:
+        """Hash of the quantized feature vector plus the model identity"""
+        quantized = np.round(np.asarray(features, dtype=np.float64), self.decimals) + 0.0  # folds -0.0 into 0.0
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(model_token.encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at, size = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.labels('hit').inc()
+                    return dict(result)
+                self._remove(key, size)
+            self.misses += 1
+        CACHE_REQUESTS.labels('miss').inc()
+        return None
+
+    def put(self, key: bytes, result: Dict[str, Any]):
+        size = _deep_sizeof(result) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self._bytes -= existing[2]
+            self._entries[key] = (result, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                CACHE_EVICTIONS.inc()
+            self._update_gauges()
+
+    def _remove(self, key: bytes, size: int):
+        del self._entries[key]
+        self._bytes -= size
+        self._update_gauges()
+
+    def _update_gauges(self):
+        CACHE_ENTRIES.set(len(self._entries))
+        CACHE_BYTES.set(self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._update_gauges()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
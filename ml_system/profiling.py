@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Request Profiling
+Opt-in per-request stage breakdowns and cProfile/pyinstrument dumps for the predict path
+
+Off by default. ROOTUIP_PROFILE_SAMPLE_RATE profiles a random share of
+requests; with ROOTUIP_PROFILE_ALLOW_HEADER=1 a request is also profiled when
+its X-Debug-Profile header carries the ROOTUIP_ADMIN_TOKEN value (never when no
+admin token is set). Only the newest max_captures dumps are kept on disk.
+
+Stage captures run on the inference threads like any other request; the
+cProfile and pyinstrument modes trace only their own thread, so those requests
+run inline on the event loop.
+"""
+
+import contextvars
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import MLConfig, get_config
+from .metrics import PREDICT_STAGE_SECONDS
+
+logger = logging.getLogger('ROOTUIP_Profiler')
+
+PROFILE_HEADER = 'X-Debug-Profile'
+PROFILE_MODES = ('stages', 'cprofile', 'pyinstrument')
+
+# Active capture for the current request; None whenever profiling is not running
+_active_capture: contextvars.ContextVar = contextvars.ContextVar('rootuip_profile', default=None)
+
+
+def observe_stage(stage: str, start: float) -> float:
+    """Record time since start for a predict stage; returns the new start.
+
+    The stage always lands in the latency histogram. It is only added to a
+    profile when one is active for the current request, which costs a single
+    context variable lookup otherwise.
+    """
+    now = time.perf_counter()
+    elapsed = now - start
+    PREDICT_STAGE_SECONDS.labels(stage).observe(elapsed)
+    capture = _active_capture.get()
+    if capture is not None:
+        capture.stages.append((stage, elapsed))
+    return now
+
+
+class ProfileCapture:
+    """Timing breakdown (and optional profiler dump) for one request"""
+
+    def __init__(self, trigger: str, mode: str, label: str = ''):
+        self.id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.mode = mode
+        self.label = label
+        self.started_at = datetime.now().isoformat()
+        self.stages: List[tuple] = []
+        self.total_seconds = 0.0
+        self.profile_text: Optional[str] = None
+        self.path: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'label': self.label,
+            'trigger': self.trigger,
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'path': self.path
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        data['stages'] = [
+            {'stage': stage, 'ms': round(seconds * 1000, 3)} for stage, seconds in self.stages
+        ]
+        data['profile'] = self.profile_text
+        return data
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the most recent captures"""
+
+    def __init__(self, sample_rate: float = 0.0, mode: str = 'stages',
+                 reports_dir: Optional[str] = None,
+                 max_captures: int = 50, allow_header: bool = False, header_token: Optional[str] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}")
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.mode = mode
+        self.reports_dir = reports_dir or get_config().profiles_dir
+        # X-Debug-Profile is honoured only when allowed and equal to header_token (the admin token)
+        self.allow_header = allow_header
+        self.header_token = header_token
+        if allow_header and not header_token:
+            logger.warning(f"{PROFILE_HEADER} is allowed but no admin token is set; the header will be ignored")
+        self.max_captures = max_captures
+        self._captures = deque(maxlen=max_captures)
+        # cProfile cannot run two profilers at once, so tracer-based captures are serialized
+        self._tracer_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> 'RequestProfiler':
+        config = config or get_config()
+        return cls(
+            sample_rate=config.profile_sample_rate,
+            mode=config.profile_mode,
+            reports_dir=config.profiles_dir,
+            allow_header=config.profile_allow_header,
+            header_token=os.environ.get('ROOTUIP_ADMIN_TOKEN')
+        )
+
+    def trigger_for(self, header_value: Optional[str]) -> Optional[str]:
+        """Return why this request should be profiled, or None to skip it"""
+        if header_value and self.allow_header and self.header_token \
+                and hmac.compare_digest(header_value.encode(), self.header_token.encode()):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    @contextmanager
+    def capture(self, trigger: str, label: str = '', mode: Optional[str] = None):
+        """Profile the enclosed block and store the result"""
+        mode = mode or self.mode
+        capture = ProfileCapture(trigger, mode, label)
+        tracer = None
+        locked = False
+        if mode != 'stages':
+            locked = self._tracer_lock.acquire(blocking=False)
+            if locked:
+                tracer = self._start_tracer(mode)
+            if tracer is None:
+                capture.mode = 'stages'
+
+        token = _active_capture.set(capture)
+        start = time.perf_counter()
+        try:
+            yield capture
+        finally:
+            capture.total_seconds = time.perf_counter() - start
+            _active_capture.reset(token)
+            if tracer is not None:
+                capture.profile_text = self._stop_tracer(mode, tracer)
+            if locked:
+                self._tracer_lock.release()
+            self._store(capture)
+
+    def _start_tracer(self, mode: str):
+        if mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.warning("pyinstrument not installed; recording stage timings only")
+                return None
+            tracer = Profiler(async_mode='disabled')
+            tracer.start()
+            return tracer
+        tracer = cProfile.Profile()
+        tracer.enable()
+        return tracer
+
+    def _stop_tracer(self, mode: str, tracer) -> str:
+        if mode == 'pyinstrument':
+            tracer.stop()
+            return tracer.output_text(unicode=False, color=False)
+        tracer.disable()
+        out = io.StringIO()
+        pstats.Stats(tracer, stream=out).sort_stats('cumulative').print_stats(40)
+        return out.getvalue()
+
+    def _store(self, capture: ProfileCapture):
+        self._captures.append(capture)
+        try:
+            os.makedirs(self.reports_dir, exist_ok=True)
+            path = os.path.join(
+                self.reports_dir,
+                f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{capture.id}.json"
+            )
+            with open(path, 'w') as f:
+                json.dump(capture.to_dict(), f, indent=2)
+            capture.path = path
+            self._prune()
+        except OSError as e:
+            logger.error(f"Could not write profile {capture.id}: {e}")
+
+    def _prune(self):
+        """Delete all but the newest max_captures dumps (names sort by capture time)"""
+        names = sorted(n for n in os.listdir(self.reports_dir) if n.startswith('profile_') and n.endswith('.json'))
+        for name in names[:max(0, len(names) - self.max_captures)]:
+            try:
+                os.remove(os.path.join(self.reports_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def list_captures(self) -> List[Dict[str, Any]]:
+        return [c.summary() for c in reversed(self._captures)]
+
+    def get_capture(self, capture_id: str) -> Optional[Dict[str, Any]]:
+        for capture in self._captures:
+            if capture.id == capture_id:
+                return capture.to_dict()
+        return None
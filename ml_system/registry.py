@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Model Registry
+Versioned model artifacts under models/registry/, with one promoted version
+copied to the live path DDPredictor loads (models/dnd_model.pkl). Versions
+registered for a tenant are promoted to models/tenants/<tenant>/dnd_model.pkl
+instead (see tenancy.py).
+"""
+
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import MLConfig, get_config
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+# Tenant ids become directory names, so they are restricted to a safe alphabet
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+def valid_tenant_id(tenant: Optional[str]) -> bool:
+    return bool(tenant) and TENANT_ID_PATTERN.match(tenant) is not None
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write via a temp file and rename, so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    """registry.json lists every registered version with its metrics and lineage"""
+
+    def __init__(self, models_dir: Optional[str] = None, live_path: Optional[str] = None):
+        """models_dir defaults to the configured one, promoting to the configured model_path"""
+        if models_dir is None:
+            config = get_config()
+            models_dir, live_path = config.models_dir, live_path or config.model_path
+        self.models_dir = models_dir
+        self.root = os.path.join(models_dir, 'registry')
+        self.live_path = live_path or os.path.join(models_dir, 'dnd_model.pkl')
+        self.index_path = os.path.join(self.root, 'registry.json')
+
+    @classmethod
+    def for_dir(cls, models_dir: Optional[str] = None, config: Optional[MLConfig] = None) -> 'ModelRegistry':
+        """Registry in models_dir (default: the configured one); the configured models_dir
+        promotes to the configured model_path, which may live elsewhere (e.g. on tmpfs)"""
+        config = config or get_config()
+        models_dir = models_dir or config.models_dir
+        if os.path.abspath(models_dir) == config.models_dir:
+            return cls(models_dir, live_path=config.model_path)
+        return cls(models_dir)
+
+    def _read_index(self) -> Dict[str, Any]:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'current': None, 'tenants': {}, 'versions': []}
+
+    def _write_index(self, index: Dict[str, Any]):
+        _atomic_write(self.index_path, json.dumps(index, indent=2).encode())
+
+    def versions(self) -> List[Dict[str, Any]]:
+        return self._read_index()['versions']
+
+    def current(self, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        index = self._read_index()
+        current = index.get('tenants', {}).get(tenant) if tenant else index['current']
+        return next((v for v in index['versions'] if v['version'] == current), None)
+
+    def tenant_path(self, tenant: str) -> str:
+        """Live model path for a tenant; the file exists only once a tenant version is promoted"""
+        if not valid_tenant_id(tenant):
+            raise ValueError(f"Invalid tenant id {tenant!r}")
+        return os.path.join(self.models_dir, 'tenants', tenant, 'dnd_model.pkl')
+
+    def tenants(self) -> Dict[str, str]:
+        """Promoted version per tenant"""
+        return dict(self._read_index().get('tenants', {}))
+
+    def register(self, model_data: Dict[str, Any], metrics: Dict[str, Any],
+                 parent: Optional[str] = None, version: Optional[str] = None,
+                 tenant: Optional[str] = None) -> str:
+        """Store an artifact as a new version; does not change what is served"""
+        if tenant is not None and not valid_tenant_id(tenant):
+            raise ValueError(f"Invalid tenant id {tenant!r}")
+        version = version or datetime.now().strftime('%Y%m%d.%H%M%S')
+        if tenant is not None:
+            version = f"{tenant}/{version}"
+        model_data = dict(model_data, model_version=version)
+        path = os.path.join(self.root, version, 'dnd_model.pkl')
+        _atomic_write(path, pickle.dumps(model_data))
+
+        index = self._read_index()
+        index['versions'].append({
+            'version': version,
+            'path': path,
+            'parent': parent,
+            'tenant': tenant,
+            'registered_at': datetime.now().isoformat(),
+            'metrics': metrics
+        })
+        self._write_index(index)
+        logger.info(f"Registered model {version} (parent {parent})")
+        return version
+
+    def entry(self, version: str) -> Dict[str, Any]:
+        entry = next((v for v in self.versions() if v['version'] == version), None)
+        if entry is None:
+            raise KeyError(f"Unknown model version {version}")
+        return entry
+
+    def load(self, version: str) -> Dict[str, Any]:
+        with open(self.entry(version)['path'], 'rb') as f:
+            return pickle.load(f)
+
+    def promote(self, version: str):
+        """Make version the live model (of its tenant, if registered for one); running
+        predictors pick it up on reload"""
+        entry = self.entry(version)
+        tenant = entry.get('tenant')
+        live_path = self.tenant_path(tenant) if tenant else self.live_path
+        with open(entry['path'], 'rb') as f:
+            _atomic_write(live_path, f.read())
+        index = self._read_index()
+        if tenant:
+            index.setdefault('tenants', {})[tenant] = version
+        else:
+            index['current'] = version
+        for v in index['versions']:
+            if v['version'] == version:
+                v['promoted_at'] = datetime.now().isoformat()
+        self._write_index(index)
+        logger.info(f"Promoted model {version} to {live_path}")
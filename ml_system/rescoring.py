@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Fleet Re-scoring
+Keeps risk current for open shipments between client requests and emits an
+event only when a shipment moves to a different risk level.
+
+Open shipments and their last request features live in a SQLite table that
+any API worker can write (PUT/DELETE /fleet/{shipment_id}). The re-scorer
+mirrors the table in arrays, and on each tick re-scores only the rows that
+changed:
+  - 'update':        the shipment was (re)tracked with new features
+  - 'clock':         days_until_eta moved by eta_resolution_hours since it was scored
+  - 'feature_store': a store refresh changed the row's port/carrier/lane features
+  - 'model':         a different model was loaded
+
+    python -m ml_system.rescoring --interval 300
+    python -m ml_system.rescoring --once
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .config import MLConfig, get_config
+from .metrics import FLEET_OPEN_SHIPMENTS, FLEET_RESCORED, RISK_BAND_CROSSINGS
+from .predict import DDPredictor, LoadedModel, RISK_LEVELS
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+SECONDS_PER_DAY = 86400.0
+SCORE_CHUNK = 4096
+
+
+class FleetStore:
+    """Open shipments shared between API workers and the re-scorer.
+
+    Every track/close bumps the row's rev, so the re-scorer only reads rows
+    changed since its last sync.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """path defaults to the configured fleet_db (ml_system.config.get_config())"""
+        self.path = path or get_config().fleet_db
+        db = self._connect()
+        try:
+            db.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS shipments (
+                    shipment_id TEXT PRIMARY KEY, features TEXT NOT NULL, eta REAL,
+                    open INTEGER NOT NULL, rev INTEGER NOT NULL,
+                    risk_probability REAL, risk_level INTEGER, scored_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS shipments_rev ON shipments (rev);
+            """)
+        finally:
+            db.close()
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> 'FleetStore':
+        return cls((config or get_config()).fleet_db)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Per-operation connections, so the store is usable from forked API workers
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _write(self, db: sqlite3.Connection) -> int:
+        """Start a write transaction and return the current max rev; IMMEDIATE serializes
+        writers, so revs are committed in increasing order"""
+        db.execute("BEGIN IMMEDIATE")
+        return db.execute("SELECT COALESCE(MAX(rev), 0) FROM shipments").fetchone()[0]
+
+    def track(self, shipments: List[Dict[str, Any]]):
+        """Open or update shipments: dicts with shipment_id, request features and optional eta (epoch seconds).
+
+        Without an eta, one is fixed from days_until_eta at tracking time so the clock can count it down.
+        """
+        now = time.time()
+        rows = []
+        for shipment in shipments:
+            features = {k: v for k, v in shipment.items() if k not in ('shipment_id', 'eta') and v is not None}
+            eta = shipment.get('eta')
+            if eta is None and features.get('days_until_eta') is not None:
+                eta = now + float(features['days_until_eta']) * SECONDS_PER_DAY
+            rows.append((str(shipment['shipment_id']), json.dumps(features), eta))
+        db = self._connect()
+        try:
+            with db:
+                rev = self._write(db)
+                db.executemany("""
+                    INSERT INTO shipments (shipment_id, features, eta, open, rev) VALUES (?, ?, ?, 1, ?)
+                    ON CONFLICT (shipment_id) DO UPDATE SET
+                        features = excluded.features, eta = excluded.eta, open = 1, rev = excluded.rev
+                """, [(sid, features, eta, rev + i + 1) for i, (sid, features, eta) in enumerate(rows)])
+        finally:
+            db.close()
+
+    def close(self, shipment_ids: List[str]) -> int:
+        db = self._connect()
+        try:
+            with db:
+                rev = self._write(db)
+                return db.executemany(
+                    "UPDATE shipments SET open = 0, rev = ? WHERE shipment_id = ? AND open = 1",
+                    [(rev + i + 1, str(sid)) for i, sid in enumerate(shipment_ids)]
+                ).rowcount
+        finally:
+            db.close()
+
+    def get(self, shipment_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([shipment_id]).get(str(shipment_id))
+
+    def get_many(self, shipment_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Last re-scored risk of each known shipment, keyed by id; unknown ids are left out"""
+        ids = [str(sid) for sid in shipment_ids]
+        rows = []
+        db = self._connect()
+        try:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows.extend(db.execute(
+                    "SELECT shipment_id, eta, open, risk_probability, risk_level, scored_at FROM shipments "
+                    f"WHERE shipment_id IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+        finally:
+            db.close()
+        return {row[0]: self._as_dict(row) for row in rows}
+
+    @staticmethod
+    def _as_dict(row: tuple) -> Dict[str, Any]:
+        sid, eta, is_open, probability, level, scored_at = row
+        return {
+            'shipment_id': sid, 'open': bool(is_open), 'eta': eta, 'risk_probability': probability,
+            'risk_level': RISK_LEVELS[level] if level is not None else None, 'scored_at': scored_at
+        }
+
+    def changes(self, since: int) -> List[tuple]:
+        """(shipment_id, features, eta, open, rev, risk_probability, risk_level) changed after rev `since`"""
+        db = self._connect()
+        try:
+            return db.execute("""
+                SELECT shipment_id, features, eta, open, rev, risk_probability, risk_level
+                FROM shipments WHERE rev > ? ORDER BY rev
+            """, (since,)).fetchall()
+        finally:
+            db.close()
+
+    def save_scores(self, rows: List[tuple]):
+        """(risk_probability, risk_level, scored_at, shipment_id) rows; does not bump rev"""
+        db = self._connect()
+        try:
+            with db:
+                db.executemany("UPDATE shipments SET risk_probability = ?, risk_level = ?, scored_at = ? "
+                               "WHERE shipment_id = ?", rows)
+        finally:
+            db.close()
+
+
+class RiskEventLog:
+    """Appends band-crossing events to daily risk_events_<date>.jsonl files"""
+
+    def __init__(self, events_dir: Optional[str] = None):
+        """events_dir defaults to the configured risk_events_dir"""
+        self.events_dir = events_dir or get_config().risk_events_dir
+
+    def write(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        os.makedirs(self.events_dir, exist_ok=True)
+        path = os.path.join(self.events_dir, f"risk_events_{datetime.now().strftime('%Y-%m-%d')}.jsonl")
+        with open(path, 'a') as f:
+            f.write(''.join(json.dumps(event) + '\n' for event in events))
+
+
+class FleetRescorer:
+    """In-memory mirror of the open fleet that re-scores only affected rows"""
+
+    def __init__(self, predictor: DDPredictor, fleet: FleetStore, event_log: Optional[RiskEventLog] = None,
+                 eta_resolution_hours: float = 6.0):
+        self.predictor = predictor
+        self.fleet = fleet
+        self.event_log = event_log
+        self.eta_resolution_days = eta_resolution_hours / 24.0
+        self._subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._rev = 0
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._features: List[Dict[str, Any]] = []
+        width = len(predictor.feature_names)
+        self._matrix = np.zeros((0, width))
+        self._eta = np.zeros(0)
+        self._scored_days = np.zeros(0)
+        self._probability = np.zeros(0)
+        self._level = np.zeros(0, dtype=np.int16)
+        self._model_token = predictor.model_token
+        self._store_version = self._current_store_version()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """callback(events) is called after every tick that produced band crossings"""
+        self._subscribers.append(callback)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _current_store_version(self) -> Optional[int]:
+        store = self.predictor.feature_store
+        return store.version if store is not None else None
+
+    # --- mirror maintenance ---
+
+    def _grow(self, n: int):
+        capacity = len(self._eta)
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity, 1024)
+        self._matrix = np.resize(self._matrix, (capacity, self._matrix.shape[1]))
+        for name in ('_eta', '_scored_days', '_probability', '_level'):
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+
+    def _remove(self, shipment_id: str):
+        i = self._index.pop(shipment_id)
+        last = len(self._ids) - 1
+        if i != last:
+            # Swap-remove keeps the arrays dense
+            moved = self._ids[last]
+            self._ids[i], self._features[i] = moved, self._features[last]
+            self._index[moved] = i
+            for array in (self._matrix, self._eta, self._scored_days, self._probability, self._level):
+                array[i] = array[last]
+        self._ids.pop()
+        self._features.pop()
+
+    def sync(self) -> List[int]:
+        """Apply tracked/closed shipments since the last sync; returns rows needing a score"""
+        changed = set()
+        for shipment_id, features, eta, is_open, rev, probability, level in self.fleet.changes(self._rev):
+            self._rev = max(self._rev, rev)
+            if not is_open:
+                if shipment_id in self._index:
+                    self._remove(shipment_id)
+                continue
+            i = self._index.get(shipment_id)
+            if i is None:
+                i = len(self._ids)
+                self._grow(i + 1)
+                self._ids.append(shipment_id)
+                self._features.append({})
+                self._index[shipment_id] = i
+                self._probability[i] = np.nan if probability is None else probability
+                self._level[i] = -1 if level is None else level
+            self._features[i] = json.loads(features)
+            self._eta[i] = np.nan if eta is None else eta
+            changed.add(shipment_id)
+        FLEET_OPEN_SHIPMENTS.set(len(self._ids))
+        # Resolved at the end: closing a shipment moves another row into its slot
+        return sorted(self._index[sid] for sid in changed if sid in self._index)
+
+    def _row(self, i: int, now: float, loaded: LoadedModel, days: Optional[float] = None) -> List[float]:
+        """Model row of shipment i, days_until_eta counted down to now unless days is given"""
+        features = self._features[i]
+        if not np.isnan(self._eta[i]):
+            if days is None:
+                days = max(0.0, (self._eta[i] - now) / SECONDS_PER_DAY)
+            features = dict(features, days_until_eta=days)
+        return self.predictor.feature_row(features, loaded)
+
+    # --- scoring ---
+
+    def tick(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """One pass: sync, find affected rows, re-score them in batches and emit crossings"""
+        now = time.time() if now is None else now
+        reasons: Dict[int, str] = {i: 'update' for i in self.sync()}
+        n = len(self._ids)
+
+        # One model for the whole pass, even if SIGHUP reloads it halfway
+        loaded = self.predictor.current
+        if loaded.token != self._model_token:
+            self._model_token = loaded.token
+            width = len(loaded.feature_names)
+            if width != self._matrix.shape[1]:
+                self._matrix = np.zeros((len(self._eta), width))
+            for i in range(n):
+                reasons.setdefault(i, 'model')
+        else:
+            store = self.predictor.feature_store
+            if store is not None:
+                store.reload()
+            version = self._current_store_version()
+            if version != self._store_version:
+                self._store_version = version
+                # Rebuild every row as it was last scored, so only rows whose store
+                # features changed differ; the clock check below handles elapsed time
+                for i in range(n):
+                    if i in reasons:
+                        continue
+                    row = self._row(i, now, loaded, days=float(self._scored_days[i]))
+                    if not np.array_equal(row, self._matrix[i]):
+                        reasons[i] = 'feature_store'
+
+            remaining = np.maximum(0.0, (self._eta[:n] - now) / SECONDS_PER_DAY)
+            with np.errstate(invalid='ignore'):
+                stale = np.abs(remaining - self._scored_days[:n]) >= self.eta_resolution_days
+            for i in np.flatnonzero(stale).tolist():
+                reasons.setdefault(i, 'clock')
+
+        if not reasons:
+            return {'open': n, 'rescored': {}, 'crossings': 0}
+        rows = sorted(reasons)
+        for i in rows:
+            self._matrix[i] = self._row(i, now, loaded)
+            self._scored_days[i] = max(0.0, (self._eta[i] - now) / SECONDS_PER_DAY)
+
+        events = []
+        for start in range(0, len(rows), SCORE_CHUNK):
+            chunk = np.asarray(rows[start:start + SCORE_CHUNK])
+            _, probabilities, levels = self.predictor.score_matrix(self._matrix[chunk], loaded)
+            events.extend(self._update(chunk, probabilities, levels, reasons, now, loaded.model_version))
+
+        counts = Counter(reasons.values())
+        for reason, count in counts.items():
+            FLEET_RESCORED.labels(reason).inc(count)
+        self._publish(events)
+        return {'open': n, 'rescored': dict(counts), 'crossings': len(events)}
+
+    def _update(self, chunk: np.ndarray, probabilities: np.ndarray, levels: np.ndarray,
+                reasons: Dict[int, str], now: float, model_version: str) -> List[Dict[str, Any]]:
+        previous = self._level[chunk].copy()
+        previous_probability = self._probability[chunk].copy()
+        self._level[chunk] = levels
+        self._probability[chunk] = probabilities
+        self.fleet.save_scores([(float(p), int(level), now, self._ids[i])
+                                for i, p, level in zip(chunk.tolist(), probabilities.tolist(), levels.tolist())])
+
+        # A first score is not a crossing
+        crossed = np.flatnonzero((previous >= 0) & (previous != levels))
+        timestamp = datetime.fromtimestamp(now).isoformat()
+        events = []
+        for j in crossed.tolist():
+            i = int(chunk[j])
+            direction = 'up' if levels[j] > previous[j] else 'down'
+            RISK_BAND_CROSSINGS.labels(direction).inc()
+            events.append({
+                'event': 'risk_band_crossing',
+                'shipment_id': self._ids[i],
+                'previous_level': RISK_LEVELS[previous[j]],
+                'risk_level': RISK_LEVELS[levels[j]],
+                'previous_probability': round(float(previous_probability[j]), 4),
+                'risk_probability': round(float(probabilities[j]), 4),
+                'direction': direction,
+                'reason': reasons[i],
+                'model_version': model_version,
+                'timestamp': timestamp
+            })
+        return events
+
+    def _publish(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        logger.info(f"{len(events)} shipments crossed a risk level",
+                    extra={'event': 'risk_band_crossings', 'count': len(events)})
+        if self.event_log is not None:
+            self.event_log.write(events)
+        for callback in self._subscribers:
+            try:
+                callback(events)
+            except Exception as e:
+                logger.error(f"Risk event subscriber failed: {e}")
+
+    # --- scheduling ---
+
+    def run(self, interval: float):
+        """Tick every interval seconds until stop()"""
+        while not self._stop.is_set():
+            try:
+                summary = self.tick()
+                if summary['rescored']:
+                    logger.info(f"Fleet re-score: {summary}")
+            except Exception as e:
+                logger.error(f"Fleet re-score failed: {e}", exc_info=True)
+            self._stop.wait(interval)
+
+    def start(self, interval: float) -> threading.Thread:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(interval,), name='fleet-rescorer', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None) -> int:
+    from .feature_store import FeatureStore
+    from .logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Re-score open shipments as their features change')
+    config = get_config()
+    parser.add_argument('--fleet-db', default=config.fleet_db)
+    parser.add_argument('--events-dir', default=config.risk_events_dir)
+    parser.add_argument('--interval', type=float, default=300.0, help='Seconds between passes')
+    parser.add_argument('--eta-resolution-hours', type=float, default=6.0)
+    parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    predictor = DDPredictor(feature_store=FeatureStore.from_env(config), config=config)
+    # SIGHUP picks up a newly promoted model; the next pass re-scores the whole fleet with it.
+    # The load runs on its own thread so the handler does not stall a pass in progress
+    signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+        target=predictor.load_model, name='model-reload', daemon=True).start())
+    rescorer = FleetRescorer(predictor, FleetStore(args.fleet_db), RiskEventLog(args.events_dir),
+                             eta_resolution_hours=args.eta_resolution_hours)
+    if args.once:
+        print(json.dumps(rescorer.tick()))
+        return 0
+    rescorer.run(args.interval)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
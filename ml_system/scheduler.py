@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Inference Scheduler
+Runs model work for the API on a small thread pool in priority order, so
+interactive predictions from the UI are not stuck behind a bulk job's rows.
+
+  - Two classes, 'interactive' and 'bulk'. A free thread always takes the
+    oldest interactive item first; bulk items run only when no interactive
+    item is waiting.
+  - Large batches are split into chunks of chunk_size rows, and each chunk is
+    queued on its own. Interactive work therefore waits for at most one
+    in-flight chunk rather than a whole batch.
+  - Each class has a concurrency limit. The default bulk limit is below the
+    pool size, so one thread always stays free for interactive work. With a
+    single worker the pool gets one extra thread for bulk work rather than
+    letting a bulk chunk occupy the only one.
+  - An item still queued after its class's max_wait, or past an explicit
+    deadline, is dropped with DeadlineExceeded instead of being run for a
+    caller that has likely given up.
+
+Queue wait per class is exported as rootuip_ml_scheduler_queue_wait_seconds.
+
+    ROOTUIP_SCHEDULER=0                        run inference inline on the event loop
+    ROOTUIP_SCHEDULER_WORKERS=2                inference threads per API worker (1 runs two: one per class)
+    ROOTUIP_SCHEDULER_CHUNK=1024               rows per queued chunk
+    ROOTUIP_SCHEDULER_INTERACTIVE_CONCURRENCY=2
+    ROOTUIP_SCHEDULER_BULK_CONCURRENCY=1
+    ROOTUIP_SCHEDULER_INTERACTIVE_MAX_WAIT=2   seconds (0 = no limit)
+    ROOTUIP_SCHEDULER_BULK_MAX_WAIT=0
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .config import MLConfig, get_config
+from .metrics import (SCHEDULER_QUEUE_WAIT_SECONDS, SCHEDULER_QUEUE_DEPTH, SCHEDULER_RUNNING,
+                      SCHEDULER_DROPPED)
+
+# Highest priority first
+PRIORITIES = ('interactive', 'bulk')
+
+
+class DeadlineExceeded(RuntimeError):
+    """Work was dropped because it could not start before its deadline"""
+
+
+class _Work:
+    __slots__ = ('fn', 'args', 'context', 'future', 'enqueued', 'deadline', 'timer')
+
+    def __init__(self, fn: Callable, args: tuple, future: asyncio.Future, deadline: Optional[float]):
+        self.fn = fn
+        self.args = args
+        # Stage timings and profile captures follow the request into the pool thread
+        self.context = contextvars.copy_context()
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class InferenceScheduler:
+    """Priority queues in front of a thread pool; all queue state lives on the event loop thread"""
+
+    def __init__(self, workers: int = 2, chunk_size: int = 1024,
+                 concurrency: Optional[Dict[str, int]] = None, max_wait: Optional[Dict[str, float]] = None):
+        self.workers = workers
+        # workers - 1 bulk threads would be none at all for a single worker, so it gets a spare
+        self.threads = workers + 1 if workers == 1 else workers
+        self.chunk_size = chunk_size
+        self.concurrency = {'interactive': workers, 'bulk': max(1, workers - 1), **(concurrency or {})}
+        self.max_wait = {'interactive': 2.0, 'bulk': 0.0, **(max_wait or {})}
+        self._queues: Dict[str, Deque[_Work]] = {priority: deque() for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        # Created on first use, so pre-forked API workers each start their own threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> Optional['InferenceScheduler']:
+        """Scheduler from the configured scheduler_* settings (ROOTUIP_SCHEDULER_*), with pool and
+        chunk size from inference_workers and batch_chunk_size; None when disabled"""
+        config = config or get_config()
+        if not config.scheduler_enabled:
+            return None
+        workers = config.inference_workers
+        concurrency, max_wait = {}, {}
+        for priority in PRIORITIES:
+            value = getattr(config, f'scheduler_{priority}_concurrency')
+            if value is not None:
+                concurrency[priority] = value
+            value = getattr(config, f'scheduler_{priority}_max_wait')
+            if value is not None:
+                max_wait[priority] = value
+        return cls(workers=workers, chunk_size=config.batch_chunk_size,
+                   concurrency=concurrency, max_wait=max_wait)
+
+    def priority_for(self, requested: Optional[str], rows: int) -> str:
+        """The caller's X-Priority if given, else interactive for work that fits in one chunk"""
+        if requested:
+            requested = requested.lower()
+            if requested not in PRIORITIES:
+                raise ValueError(f"Unknown priority '{requested}', expected one of {PRIORITIES}")
+            return requested
+        return 'interactive' if rows <= self.chunk_size else 'bulk'
+
+    async def run(self, priority: str, fn: Callable, *args, deadline: Optional[float] = None) -> Any:
+        """fn(*args) on the pool once its turn in priority's queue comes.
+
+        deadline is a time.monotonic() value; the earlier of it and the class
+        max_wait applies. Raises DeadlineExceeded if the work never started.
+        """
+        loop = asyncio.get_running_loop()
+        work = _Work(fn, args, loop.create_future(), deadline)
+        max_wait = self.max_wait[priority]
+        if max_wait > 0:
+            work.deadline = min(work.enqueued + max_wait, deadline or float('inf'))
+        if work.deadline is not None:
+            work.timer = loop.call_later(max(0.0, work.deadline - work.enqueued), self._expire, priority, work)
+        self._queues[priority].append(work)
+        SCHEDULER_QUEUE_DEPTH.labels(priority).set(len(self._queues[priority]))
+        self._dispatch()
+        try:
+            return await work.future
+        except asyncio.CancelledError:
+            # The caller went away; a queued item is skipped, a running one finishes unobserved
+            work.future.cancel()
+            raise
+
+    async def run_chunked(self, priority: str, fn: Callable[[int, int], Any], rows: int,
+                          deadline: Optional[float] = None) -> List[Any]:
+        """fn(start, stop) for consecutive chunk_size slices of rows, each queued on its own;
+        returns the chunk results in order"""
+        results = []
+        for start in range(0, max(rows, 1), self.chunk_size):
+            results.append(await self.run(priority, fn, start, min(rows, start + self.chunk_size),
+                                          deadline=deadline))
+        return results
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='inference')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _dispatch(self):
+        """Start queued work, highest priority first, while threads and class slots are free"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and sum(self._running.values()) < self.threads \
+                    and self._running[priority] < self.concurrency[priority]:
+                work = queue.popleft()
+                if work.timer is not None:
+                    work.timer.cancel()
+                if work.future.done():
+                    continue
+                SCHEDULER_QUEUE_WAIT_SECONDS.labels(priority).observe(time.monotonic() - work.enqueued)
+                self._running[priority] += 1
+                SCHEDULER_RUNNING.labels(priority).set(self._running[priority])
+                pool_future = self._pool().submit(work.context.run, work.fn, *work.args)
+                pool_future.add_done_callback(
+                    lambda f, w=work, p=priority, loop=work.future.get_loop():
+                        loop.call_soon_threadsafe(self._finish, p, w, f))
+            SCHEDULER_QUEUE_DEPTH.labels(priority).set(len(queue))
+
+    def _finish(self, priority: str, work: _Work, pool_future):
+        self._running[priority] -= 1
+        SCHEDULER_RUNNING.labels(priority).set(self._running[priority])
+        if not work.future.done():
+            error = pool_future.exception()
+            if error is None:
+                work.future.set_result(pool_future.result())
+            else:
+                work.future.set_exception(error)
+        self._dispatch()
+
+    def _expire(self, priority: str, work: _Work):
+        try:
+            self._queues[priority].remove(work)
+        except ValueError:
+            return  # already started
+        SCHEDULER_DROPPED.labels(priority).inc()
+        SCHEDULER_QUEUE_DEPTH.labels(priority).set(len(self._queues[priority]))
+        if not work.future.done():
+            waited = time.monotonic() - work.enqueued
+            work.future.set_exception(DeadlineExceeded(f"{priority} work dropped after {waited:.2f}s in queue"))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'workers': self.workers,
+            'threads': self.threads,
+            'chunk_size': self.chunk_size,
+            'classes': {
+                priority: {
+                    'queued': len(self._queues[priority]),
+                    'running': self._running[priority],
+                    'concurrency': self.concurrency[priority],
+                    'max_wait': self.max_wait[priority],
+                    'oldest_wait_seconds': round(now - self._queues[priority][0].enqueued, 3)
+                    if self._queues[priority] else 0.0
+                }
+                for priority in PRIORITIES
+            }
+        }
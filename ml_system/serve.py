@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP ML API Multi-Worker Launcher
+Loads the model once in a supervisor process, then forks uvicorn workers that
+share the model pages copy-on-write and accept on one listening socket.
+
+    python -m ml_system.serve --workers 4 --port 8000
+    python -m ml_system.serve --workers 4 --max-requests 50000 --max-requests-jitter 5000
+
+Signals to the supervisor:
+    SIGHUP           reload the model in the supervisor, then restart workers one at a time
+    SIGTERM/SIGINT   graceful shutdown of all workers
+
+Each worker keeps its own prediction cache and in-process metrics; /workers
+on any worker reports pid, heartbeat, request count and restarts for all of them.
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('ROOTUIP_Serve')
+
+# A worker whose event loop has not beaten for this long is considered hung
+HEARTBEAT_INTERVAL = 1.0
+# Workers dying sooner than this after start are respawned with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+class WorkerBoard:
+    """Per-worker health in shared memory, created before forking.
+
+    Each worker only writes its own slot, so a lock-free RawArray is enough.
+    """
+
+    FIELDS = ('pid', 'started', 'heartbeat', 'requests', 'restarts')
+
+    def __init__(self, size: int):
+        self.size = size
+        self._data = multiprocessing.RawArray('d', size * len(self.FIELDS))
+
+    def slot(self, index: int) -> 'WorkerSlot':
+        return WorkerSlot(self, index)
+
+    def _get(self, index: int, field: str) -> float:
+        return self._data[index * len(self.FIELDS) + self.FIELDS.index(field)]
+
+    def _set(self, index: int, field: str, value: float):
+        self._data[index * len(self.FIELDS) + self.FIELDS.index(field)] = value
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        workers = []
+        for index in range(self.size):
+            heartbeat = self._get(index, 'heartbeat')
+            workers.append({
+                'index': index,
+                'pid': int(self._get(index, 'pid')),
+                'uptime_seconds': round(now - self._get(index, 'started'), 1),
+                'heartbeat_age_seconds': round(now - heartbeat, 2) if heartbeat else None,
+                'requests': int(self._get(index, 'requests')),
+                'restarts': int(self._get(index, 'restarts'))
+            })
+        return workers
+
+
+class WorkerSlot:
+    """One worker's view of its own WorkerBoard entry"""
+
+    def __init__(self, board: WorkerBoard, index: int):
+        self.board = board
+        self.index = index
+
+    def started(self, pid: int, restarted: bool):
+        self.board._set(self.index, 'pid', pid)
+        self.board._set(self.index, 'started', time.time())
+        self.board._set(self.index, 'heartbeat', 0.0)
+        self.board._set(self.index, 'requests', 0)
+        if restarted:
+            self.board._set(self.index, 'restarts', self.board._get(self.index, 'restarts') + 1)
+
+    def beat(self):
+        self.board._set(self.index, 'heartbeat', time.time())
+
+    def record_request(self):
+        self.board._set(self.index, 'requests', self.board._get(self.index, 'requests') + 1)
+
+    @property
+    def last_heartbeat(self) -> float:
+        return self.board._get(self.index, 'heartbeat')
+
+
+async def _serve_worker(server, sock: socket.socket, slot: WorkerSlot):
+    """Run uvicorn with a heartbeat task on the same event loop, so a blocked loop stops beating"""
+    async def heartbeat():
+        while True:
+            slot.beat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    task = asyncio.create_task(heartbeat())
+    try:
+        await server.serve(sockets=[sock])
+    finally:
+        task.cancel()
+
+
+class Supervisor:
+    """Pre-fork supervisor: owns the socket and the model, forks and restarts workers"""
+
+    def __init__(self, workers: int, host: str = '0.0.0.0', port: int = 8000, backlog: int = 2048,
+                 max_requests: int = 0, max_requests_jitter: int = 0,
+                 timeout: float = 30.0, graceful_timeout: float = 30.0):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.board = WorkerBoard(workers)
+        self.sock: Optional[socket.socket] = None
+        self.api = None
+        self._pids: Dict[int, int] = {}  # pid -> slot index
+        self._stopping = False
+        self._reload_requested = False
+
+    # === Supervisor ===
+
+    def run(self) -> int:
+        # Importing the API loads the model; every worker inherits it from here
+        from . import api
+        self.api = api
+        self.sock = self._bind()
+        # Preloaded tenant models are shared copy-on-write as well
+        if api.tenant_models is not None:
+            api.tenant_models.preload(wait=True)
+        self._freeze()
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        logger.info(f"Starting {self.workers} workers on {self.host}:{self.port} (model {api.predictor.model_version})")
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while not self._stopping:
+            self._reap()
+            self._kill_hung_workers()
+            if self._reload_requested:
+                self._reload_requested = False
+                self._rolling_restart()
+            time.sleep(0.5)
+
+        self._shutdown()
+        return 0
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _freeze(self):
+        """Move everything loaded so far out of the collector's reach.
+
+        Without this the first gen2 collection in each worker touches every
+        object header (refcounts and GC links), copying the model's pages.
+        """
+        gc.collect()
+        gc.freeze()
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _spawn(self, index: int, restarted: bool = False):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(index)
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+                code = 1
+            finally:
+                from .logging_config import shutdown_logging
+                shutdown_logging()
+                os._exit(code)
+        self._pids[pid] = index
+        self.board.slot(index).started(pid, restarted)
+        logger.info(f"Worker {index} started (pid {pid})")
+
+    def _reap(self):
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self._pids.pop(pid, None)
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                continue
+            lifetime = time.time() - self.board._get(index, 'started')
+            if code == 0:
+                logger.info(f"Worker {index} (pid {pid}) recycled after {lifetime:.0f}s")
+            else:
+                logger.warning(f"Worker {index} (pid {pid}) exited with code {code} after {lifetime:.1f}s")
+            if lifetime < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self._spawn(index, restarted=True)
+
+    def _kill_hung_workers(self):
+        now = time.time()
+        for pid, index in list(self._pids.items()):
+            slot = self.board.slot(index)
+            reference = slot.last_heartbeat or self.board._get(index, 'started')
+            if now - reference > self.timeout:
+                logger.warning(f"Worker {index} (pid {pid}) missed heartbeats for {now - reference:.0f}s; killing")
+                self._signal(pid, signal.SIGKILL)
+
+    def _rolling_restart(self):
+        """Reload the model here, then replace workers one by one so the others keep serving"""
+        logger.info("Reload requested: reloading model and restarting workers")
+        self.api.predictor.load_model()
+        if self.api.tenant_models is not None:
+            self.api.tenant_models.reload(wait=True)
+        self._freeze()
+        for pid, index in list(self._pids.items()):
+            if self._stopping:
+                return
+            self._stop_worker(pid)
+            self._spawn(index, restarted=True)
+            self._wait_ready(index)
+        logger.info(f"Rolling restart complete (model {self.api.predictor.model_version})")
+
+    def _stop_worker(self, pid: int):
+        self._signal(pid, signal.SIGTERM)
+        deadline = time.time() + self.graceful_timeout
+        while time.time() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self._pids.pop(pid, None)
+                return
+            time.sleep(0.1)
+        self._signal(pid, signal.SIGKILL)
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+        self._pids.pop(pid, None)
+
+    def _wait_ready(self, index: int):
+        deadline = time.time() + self.timeout
+        while time.time() < deadline and not self._stopping:
+            if self.board.slot(index).last_heartbeat:
+                return
+            time.sleep(0.1)
+        logger.warning(f"Worker {index} did not report ready within {self.timeout}s")
+
+    def _shutdown(self):
+        logger.info("Shutting down workers")
+        for pid in list(self._pids):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.time() + self.graceful_timeout
+        while self._pids and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._pids):
+            self._signal(pid, signal.SIGKILL)
+        self.sock.close()
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    # === Worker ===
+
+    def _run_worker(self, index: int):
+        from .logging_config import reinit_after_fork
+        reinit_after_fork()
+        import uvicorn
+
+        # uvicorn installs its own SIGTERM/SIGINT handlers; reloads are the supervisor's job
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        slot = self.board.slot(index)
+        self.api.worker_board = self.board
+        self.api.worker_slot = slot
+
+        limit = None
+        if self.max_requests:
+            # Jitter keeps workers from all recycling at the same moment
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+        config = uvicorn.Config(
+            self.api.app,
+            log_config=None,
+            access_log=False,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=self.graceful_timeout
+        )
+        asyncio.run(_serve_worker(uvicorn.Server(config), self.sock, slot))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the ROOTUIP ML API with pre-forked workers')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='Recycle a worker after this many requests (0 disables)')
+    parser.add_argument('--max-requests-jitter', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='Seconds without a heartbeat before a worker is killed')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    supervisor = Supervisor(
+        workers=args.workers, host=args.host, port=args.port, backlog=args.backlog,
+        max_requests=args.max_requests, max_requests_jitter=args.max_requests_jitter,
+        timeout=args.timeout, graceful_timeout=args.graceful_timeout
+    )
+    return supervisor.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
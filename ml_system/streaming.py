@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Risk Streams
+Pushes risk level changes for tracked shipments to dashboards over
+Server-Sent Events, so a dashboard subscribes once instead of polling
+/predict for every visible container.
+
+The fleet re-scorer (ml_system.rescoring) scores open shipments in batches
+and appends a risk_band_crossing event to risk_events_<date>.jsonl whenever a
+shipment's level changes. Each API worker runs one tailer over those files
+and fans new events out to the subscriptions in that process:
+
+    GET /stream/risk?shipment_ids=MSKU1234565,TGHU7654321
+
+A subscription first receives a 'snapshot' event with the current score of
+every requested shipment, then one event per level change. Updates a slow
+client has not read yet are coalesced per shipment, so a subscription holds
+at most one pending event per shipment id it asked for; a reconnecting client
+gets a fresh snapshot instead of a replay.
+
+    ROOTUIP_RISK_EVENTS_DIR        directory the re-scorer writes to
+    ROOTUIP_STREAM_MAX_SUBSCRIBERS=1000   per process
+    ROOTUIP_STREAM_MAX_SHIPMENTS=1000     shipment ids per subscription
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .config import MLConfig, get_config
+from .metrics import STREAM_SUBSCRIBERS, STREAM_EVENTS_ROUTED, STREAM_EVENTS_COALESCED
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+HEARTBEAT_SECONDS = 15.0
+
+
+class StreamFull(RuntimeError):
+    """The process already serves max_subscribers subscriptions"""
+
+
+class Subscription:
+    """Pending updates for one client: at most one event per subscribed shipment"""
+
+    def __init__(self, shipment_ids: Iterable[str]):
+        self.shipment_ids = frozenset(shipment_ids)
+        self._pending: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def offer(self, event: Dict[str, Any]):
+        """Queue an event; an unread event for the same shipment is merged into it"""
+        shipment_id = event['shipment_id']
+        earlier = self._pending.pop(shipment_id, None)
+        if earlier is not None:
+            STREAM_EVENTS_COALESCED.inc()
+            event = dict(event, previous_level=earlier['previous_level'],
+                         previous_probability=earlier['previous_probability'])
+            if event['previous_level'] == event['risk_level']:
+                return  # moved away and back before the client read either change
+        self._pending[shipment_id] = event
+        self._ready.set()
+
+    async def next(self, timeout: float = HEARTBEAT_SECONDS) -> List[Dict[str, Any]]:
+        """Pending events in arrival order, or [] after timeout"""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class RiskStreamHub:
+    """Tails the re-scorer's event log and routes each event to the subscriptions for its shipment"""
+
+    def __init__(self, events_dir: Optional[str] = None, poll_interval: float = 1.0,
+                 max_subscribers: int = 1000, max_shipments: int = 1000):
+        self.events_dir = events_dir or get_config().risk_events_dir
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.max_shipments = max_shipments
+        self._by_shipment: Dict[str, Set[Subscription]] = {}
+        self._subscriptions: Set[Subscription] = set()
+        self._offsets: Optional[Dict[str, int]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tailer: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, config: Optional[MLConfig] = None) -> 'RiskStreamHub':
+        config = config or get_config()
+        return cls(
+            events_dir=config.risk_events_dir,
+            max_subscribers=config.stream_max_subscribers,
+            max_shipments=config.stream_max_shipments
+        )
+
+    def subscribe(self, shipment_ids: Iterable[str]) -> Subscription:
+        """Register a subscription on the running event loop; starts the tailer on first use.
+
+        Raises ValueError for an empty or oversized id list and StreamFull at capacity.
+        """
+        shipment_ids = {str(sid) for sid in shipment_ids if sid}
+        if not shipment_ids:
+            raise ValueError("At least one shipment id is required")
+        if len(shipment_ids) > self.max_shipments:
+            raise ValueError(f"At most {self.max_shipments} shipment ids per subscription")
+        if len(self._subscriptions) >= self.max_subscribers:
+            raise StreamFull(f"{self.max_subscribers} risk streams already open")
+        subscription = Subscription(shipment_ids)
+        self._subscriptions.add(subscription)
+        for sid in subscription.shipment_ids:
+            self._by_shipment.setdefault(sid, set()).add(subscription)
+        STREAM_SUBSCRIBERS.set(len(self._subscriptions))
+        self._ensure_tailer()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription not in self._subscriptions:
+            return
+        self._subscriptions.discard(subscription)
+        for sid in subscription.shipment_ids:
+            subscribers = self._by_shipment.get(sid)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_shipment[sid]
+        STREAM_SUBSCRIBERS.set(len(self._subscriptions))
+
+    def publish(self, events: List[Dict[str, Any]]):
+        """Fan events out to their shipments' subscriptions; safe to call from any thread
+        (e.g. FleetRescorer.subscribe(hub.publish) when the re-scorer runs in-process)"""
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not None and running is not loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._fan_out, events)
+        else:
+            self._fan_out(events)
+
+    def _fan_out(self, events: List[Dict[str, Any]]):
+        for event in events:
+            for subscription in self._by_shipment.get(event.get('shipment_id'), ()):
+                subscription.offer(event)
+                STREAM_EVENTS_ROUTED.inc()
+
+    # --- event log tailing ---
+
+    def _ensure_tailer(self):
+        loop = asyncio.get_running_loop()
+        if self._tailer is not None and not self._tailer.done() and self._loop is loop:
+            return
+        self._loop = loop
+        # Events logged while nobody was subscribed are already part of the snapshot
+        self._offsets = self._end_offsets()
+        self._tailer = loop.create_task(self._tail())
+
+    async def _tail(self):
+        while self._subscriptions:
+            try:
+                self._fan_out(self.poll())
+            except Exception as e:
+                logger.error(f"Risk event tailing failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _log_names(self) -> List[str]:
+        try:
+            names = os.listdir(self.events_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if n.startswith('risk_events_') and n.endswith('.jsonl'))
+
+    def _end_offsets(self) -> Dict[str, int]:
+        """Start at the end of the newest log: subscribers only see events from now on"""
+        names = self._log_names()
+        if not names:
+            return {}
+        return {names[-1]: os.path.getsize(os.path.join(self.events_dir, names[-1]))}
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Events appended to the logs since the last poll (complete lines only)"""
+        if self._offsets is None:
+            self._offsets = self._end_offsets()
+        floor = min(self._offsets) if self._offsets else ''
+        events = []
+        for name in self._log_names():
+            if name < floor:
+                continue
+            start = self._offsets.get(name, 0)
+            path = os.path.join(self.events_dir, name)
+            if os.path.getsize(path) <= start:
+                self._offsets[name] = start
+                continue
+            offset = start
+            with open(path, 'rb') as f:
+                f.seek(start)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # partial line still being written; picked up next time
+                    offset += len(line)
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue
+            self._offsets[name] = offset
+        # Daily files: only the two newest can still grow
+        for name in sorted(self._offsets)[:-2]:
+            del self._offsets[name]
+        return events
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': len(self._subscriptions),
+            'shipments': len(self._by_shipment),
+            'max_subscribers': self.max_subscribers,
+            'max_shipments': self.max_shipments,
+            'events_dir': self.events_dir
+        }
+
+
+def sse(event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
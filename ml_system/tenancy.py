@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Tenant Models
+Routes requests to a tenant's own model (promoted through the registry to
+models/tenants/<tenant>/dnd_model.pkl) and keeps recently used tenant models
+resident in a size-capped LRU. Tenants without a model are served by the
+default predictor.
+
+Loads run on background threads and are shared by every request for that
+tenant, so a cold tenant only waits for its own model and never holds up
+requests for other tenants. Eviction only drops the LRU's reference; requests
+already holding the predictor finish on it. Resident models are checked for a
+newly promoted file every check_interval seconds and replaced in the
+background while the old one keeps serving.
+
+    ROOTUIP_TENANT_MODELS=0          disable routing (X-Tenant-ID is ignored)
+    ROOTUIP_TENANT_MODELS_MB=1024    resident size cap (model file size is the estimate)
+    ROOTUIP_TENANT_PRELOAD=a,b       tenants to load at startup; '*' for every promoted tenant
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .config import MLConfig, get_config
+from .metrics import (TENANT_MODEL_REQUESTS, TENANT_MODEL_LOAD_SECONDS, TENANT_MODEL_EVICTIONS,
+                      TENANT_MODELS_RESIDENT, TENANT_MODEL_BYTES)
+from .registry import ModelRegistry, valid_tenant_id
+
+logger = logging.getLogger('ROOTUIP_Predictor')
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# Metric label for requests served by the default model, so label values stay bounded
+DEFAULT_LABEL = 'default'
+# Tenants known to have no model (or a model that failed to load) are not re-checked for this long
+NEGATIVE_TTL = 30.0
+MAX_NEGATIVE_ENTRIES = 10000
+
+
+class _Resident:
+    __slots__ = ('predictor', 'nbytes', 'mtime', 'next_check', 'hits', 'loaded_at')
+
+    def __init__(self, predictor, nbytes: int, mtime: float, next_check: float):
+        self.predictor = predictor
+        self.nbytes = nbytes
+        self.mtime = mtime
+        self.next_check = next_check
+        self.hits = 0
+        self.loaded_at = time.time()
+
+
+class TenantModels:
+    """Tenant id -> DDPredictor, with a bounded LRU of resident tenant models"""
+
+    def __init__(self, default, models_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 preload: Sequence[str] = (), check_interval: float = 30.0):
+        self.default = default
+        self.registry = ModelRegistry.for_dir(models_dir, config=default.config)
+        self.max_bytes = max_bytes
+        self.preload_tenants = list(preload)
+        self.check_interval = check_interval
+        self._resident: 'OrderedDict[str, _Resident]' = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._absent: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default, config: Optional[MLConfig] = None) -> Optional['TenantModels']:
+        """Routing from the configured tenant_* settings (ROOTUIP_TENANT_*); None when disabled"""
+        config = config or get_config()
+        if not config.tenant_models:
+            return None
+        preload = [t.strip() for t in config.tenant_preload.split(',') if t.strip()]
+        return cls(default, max_bytes=int(config.tenant_models_mb * 1024 * 1024), preload=preload)
+
+    # --- Routing ---
+
+    def get(self, tenant: Optional[str]):
+        """Predictor for a tenant, waiting for its model if it is being loaded"""
+        resolved = self._resolve(tenant)
+        return resolved.result() if isinstance(resolved, Future) else resolved
+
+    async def acquire(self, tenant: Optional[str]):
+        """get() for the event loop: a cold tenant awaits its load without blocking the loop"""
+        resolved = self._resolve(tenant)
+        return await asyncio.wrap_future(resolved) if isinstance(resolved, Future) else resolved
+
+    def label(self, tenant: Optional[str]) -> str:
+        """Metric label for a tenant: its id if it has a model in this process, else 'default'"""
+        if tenant and (tenant in self._resident or tenant in self._loading):
+            return tenant
+        return DEFAULT_LABEL
+
+    def _resolve(self, tenant: Optional[str]) -> Union[Any, Future]:
+        if not tenant:
+            TENANT_MODEL_REQUESTS.labels(DEFAULT_LABEL, 'default').inc()
+            return self.default
+        now = time.monotonic()
+        with self._lock:
+            entry = self._resident.get(tenant)
+            if entry is not None:
+                self._resident.move_to_end(tenant)
+                entry.hits += 1
+                stale_check = now >= entry.next_check
+                if stale_check:
+                    entry.next_check = now + self.check_interval
+            loading = self._loading.get(tenant)
+        if entry is not None:
+            TENANT_MODEL_REQUESTS.labels(tenant, 'hit').inc()
+            if stale_check and loading is None:
+                self._refresh_if_promoted(tenant, entry)
+            return entry.predictor
+        if loading is not None:
+            TENANT_MODEL_REQUESTS.labels(tenant, 'miss').inc()
+            return loading
+        path = self._model_path(tenant, now)
+        if path is None:
+            TENANT_MODEL_REQUESTS.labels(DEFAULT_LABEL, 'default').inc()
+            return self.default
+        TENANT_MODEL_REQUESTS.labels(tenant, 'miss').inc()
+        return self._load(tenant, path)
+
+    def _model_path(self, tenant: str, now: float) -> Optional[str]:
+        """Tenant's live model path, or None if it has none (negative results are cached)"""
+        if not valid_tenant_id(tenant) or self._absent.get(tenant, 0.0) > now:
+            return None
+        path = self.registry.tenant_path(tenant)
+        if os.path.exists(path):
+            return path
+        self._mark_absent(tenant, now)
+        return None
+
+    def _mark_absent(self, tenant: str, now: float):
+        with self._lock:
+            if len(self._absent) >= MAX_NEGATIVE_ENTRIES:
+                self._absent.clear()
+            self._absent[tenant] = now + NEGATIVE_TTL
+
+    def _refresh_if_promoted(self, tenant: str, entry: _Resident):
+        try:
+            mtime = os.path.getmtime(self.registry.tenant_path(tenant))
+        except OSError:
+            return
+        if mtime != entry.mtime:
+            logger.info(f"New model promoted for tenant {tenant}; reloading in the background")
+            self._load(tenant, self.registry.tenant_path(tenant))
+
+    # --- Loading and eviction ---
+
+    def _load(self, tenant: str, path: str) -> Future:
+        """Start (or join) the background load of one tenant's model"""
+        with self._lock:
+            future = self._loading.get(tenant)
+            if future is not None:
+                return future
+            future = Future()
+            self._loading[tenant] = future
+        # A plain thread per load rather than a pool, so nothing is left half-initialized
+        # in workers that ml_system.serve forks after preloading
+        threading.Thread(target=self._run_load, args=(tenant, path, future),
+                         name=f'tenant-load-{tenant}', daemon=True).start()
+        return future
+
+    def _run_load(self, tenant: str, path: str, future: Future):
+        from .predict import DDPredictor
+
+        start = time.perf_counter()
+        try:
+            stat = os.stat(path)
+            predictor = DDPredictor(model_path=path, fallback='fail', history_dir=self.default.history_dir,
+                                    feature_store=self.default.feature_store, tenant=tenant,
+                                    config=self.default.config)
+        except Exception as e:
+            logger.error(f"Could not load model for tenant {tenant}: {e}; serving the default model")
+            with self._lock:
+                self._loading.pop(tenant, None)
+                current = self._resident.get(tenant)
+            if current is not None:
+                # Keep serving the model already resident; retry at the next check
+                future.set_result(current.predictor)
+            else:
+                self._mark_absent(tenant, time.monotonic())
+                future.set_result(self.default)
+            return
+        TENANT_MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+
+        with self._lock:
+            previous = self._resident.pop(tenant, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            entry = _Resident(predictor, stat.st_size, stat.st_mtime, time.monotonic() + self.check_interval)
+            if previous is not None:
+                entry.hits = previous.hits
+            self._resident[tenant] = entry
+            self._bytes += entry.nbytes
+            self._loading.pop(tenant, None)
+            self._absent.pop(tenant, None)
+            self._evict(keep=tenant)
+        logger.info(f"Loaded model {predictor.model_version} for tenant {tenant} "
+                    f"in {time.perf_counter() - start:.2f}s")
+        future.set_result(predictor)
+
+    def _evict(self, keep: str):
+        """Drop least recently used tenants until under the cap; the newest model always stays"""
+        while self._bytes > self.max_bytes and len(self._resident) > 1:
+            tenant = next(iter(self._resident))
+            if tenant == keep:
+                break
+            evicted = self._resident.pop(tenant)
+            self._bytes -= evicted.nbytes
+            TENANT_MODEL_EVICTIONS.inc()
+            logger.info(f"Evicted model for tenant {tenant} ({evicted.nbytes / 1e6:.1f} MB)")
+        TENANT_MODELS_RESIDENT.set(len(self._resident))
+        TENANT_MODEL_BYTES.set(self._bytes)
+
+    def preload(self, tenants: Optional[Sequence[str]] = None, wait: bool = False) -> List[Future]:
+        """Load tenants in the background ('*' means every tenant with a promoted model)"""
+        tenants = self.preload_tenants if tenants is None else list(tenants)
+        if '*' in tenants:
+            tenants = sorted(self.registry.tenants())
+        futures = []
+        now = time.monotonic()
+        for tenant in tenants:
+            if tenant in self._resident:
+                continue
+            path = self._model_path(tenant, now)
+            if path is None:
+                logger.warning(f"No model promoted for tenant {tenant}; not preloading")
+                continue
+            futures.append(self._load(tenant, path))
+        if wait:
+            for future in futures:
+                future.result()
+        return futures
+
+    def reload(self, wait: bool = False) -> List[Future]:
+        """Reload every resident tenant model; the current ones serve until replaced"""
+        futures = []
+        for tenant in list(self._resident):
+            path = self.registry.tenant_path(tenant)
+            if os.path.exists(path):
+                futures.append(self._load(tenant, path))
+            else:
+                with self._lock:
+                    entry = self._resident.pop(tenant, None)
+                    if entry is not None:
+                        self._bytes -= entry.nbytes
+                    self._evict(keep='')
+        if wait:
+            for future in futures:
+                future.result()
+        return futures
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = [{
+                'tenant': tenant,
+                'model_version': entry.predictor.model_version,
+                'bytes': entry.nbytes,
+                'hits': entry.hits,
+                'loaded_at': entry.loaded_at
+            } for tenant, entry in reversed(self._resident.items())]
+            return {
+                'max_bytes': self.max_bytes,
+                'bytes': self._bytes,
+                'resident': resident,
+                'loading': sorted(self._loading)
+            }
@@ -0,0 +1,14 @@
+"""
+Shared fixtures for the ml_system tests.
+"""
+
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def stop_log_listener():
+    """ASGITransport does not run the app's shutdown hook, which flushes and stops logging"""
+    yield
+    from ml_system.logging_config import shutdown_logging
+
+    shutdown_logging()
@@ -0,0 +1,77 @@
+"""
+Categorical encoder: smoothed rates, out-of-fold training encodings and lookups that agree row by row.
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_system.categorical import CategoricalEncoder, encoded_name
+
+
+@pytest.fixture(scope='module')
+def training():
+    rng = np.random.default_rng(9)
+    n = 3000
+    frame = pd.DataFrame({
+        'carrier_scac': rng.choice(['MAEU', 'MSCU', 'CMDU', 'RARE'], size=n, p=[0.5, 0.3, 0.19, 0.01]),
+        'pol_locode': rng.choice(['CNSHA', 'SGSIN'], size=n),
+        'pod_locode': rng.choice(['USLAX', 'NLRTM', None], size=n),
+    })
+    frame['lane'] = None
+    y = (rng.uniform(size=n) < np.where(frame['carrier_scac'] == 'MSCU', 0.4, 0.1)).astype(int)
+    encoder = CategoricalEncoder(n_buckets=1024)
+    return encoder, encoder.fit_transform(frame, y), frame, y
+
+
+def test_rates_are_smoothed_and_rare_identifiers_get_the_prior(training):
+    encoder, _, frame, y = training
+    carrier = frame['carrier_scac'].to_numpy()
+    mscu = carrier == 'MSCU'
+    expected = (y[mscu].sum() + encoder.smoothing * encoder.prior) / (mscu.sum() + encoder.smoothing)
+    assert encoder.prior == pytest.approx(y.mean())
+    assert encoder.encode_one({'carrier_scac': ' mscu '})['carrier_scac_dd_rate'] == pytest.approx(expected, abs=1e-6)
+    assert (carrier == 'RARE').sum() < encoder.min_count
+    assert encoder.encode_one({'carrier_scac': 'RARE'})['carrier_scac_dd_rate'] == pytest.approx(encoder.prior)
+    assert encoder.encode_one({})['carrier_scac_dd_rate'] == pytest.approx(encoder.prior)
+
+
+def test_training_encodings_leave_out_their_own_fold(training):
+    encoder, encoded, frame, y = training
+    fold = np.random.default_rng(42).integers(0, 5, len(y))
+    carrier = frame['carrier_scac'].to_numpy()
+    row = int(np.flatnonzero(carrier == 'MSCU')[0])
+    others = (carrier == 'MSCU') & (fold != fold[row])
+    expected = (y[others].sum() + encoder.smoothing * encoder.prior) / (others.sum() + encoder.smoothing)
+    assert encoded[row, 0] == pytest.approx(expected)
+
+
+def test_transform_matches_encode_one(training):
+    encoder, _, _, _ = training
+    requests = [
+        {'carrier_scac': 'maeu', 'pol_locode': 'CNSHA', 'pod_locode': 'USLAX'},
+        {'carrier_scac': 'MSCU', 'pol_locode': 'SGSIN', 'pod_locode': None},
+        {'carrier_scac': 'UNKNOWN', 'lane': 'cnsha-nlrtm', 'pol_locode': None, 'pod_locode': None},
+        {'carrier_scac': None, 'pol_locode': 'SGSIN', 'pod_locode': 'NLRTM'},
+    ]
+    frame = pd.DataFrame(requests)
+    table = encoder.transform(frame)
+    for row, request in zip(table, requests):
+        one = encoder.encode_one(request)
+        assert row.tolist() == pytest.approx([one[name] for name in encoder.feature_names])
+    # A lane sent as an identifier and one derived from its ports share an entry
+    derived = encoder.encode_one({'pol_locode': 'CNSHA', 'pod_locode': 'NLRTM'})[encoded_name('lane')]
+    assert table[2, 3] == pytest.approx(derived) and derived != pytest.approx(encoder.prior)
+
+
+def test_round_trip_through_the_artifact(training):
+    encoder, _, _, _ = training
+    restored = CategoricalEncoder.from_dict(pickle.loads(pickle.dumps(encoder.to_dict())))
+    request = {'carrier_scac': 'MSCU', 'pol_locode': 'CNSHA', 'pod_locode': 'USLAX'}
+    assert restored.encode_one(request) == encoder.encode_one(request)
+    assert restored.categories == encoder.categories
+    assert CategoricalEncoder.from_dict(None) is None
+    with pytest.raises(ValueError):
+        CategoricalEncoder(n_buckets=1000)
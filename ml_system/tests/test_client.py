@@ -0,0 +1,143 @@
+"""
+AsyncPredictionClient against the FastAPI app in-process (httpx.ASGITransport).
+
+The app serves whatever model ml_system.api loads (the synthetic fallback
+when no trained model is installed), so these tests need no running server.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+pytest.importorskip('fastapi')
+
+from ml_system.client import AsyncPredictionClient, ClientOverloadedError, PredictionError  # noqa: E402
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """ASGI transport to the app that records requests and can inject failures or delay"""
+
+    def __init__(self, fail_first: int = 0, status_code: int = 503, delay: float = 0.0):
+        from ml_system.api import app
+
+        self.inner = httpx.ASGITransport(app=app)
+        self.fail_first = fail_first
+        self.status_code = status_code
+        self.delay = delay
+        self.requests = []
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if len(self.requests) <= self.fail_first:
+            return httpx.Response(self.status_code, json={'detail': 'injected'})
+        return await self.inner.handle_async_request(request)
+
+
+def shipment(i: int):
+    return dict(SHIPMENT, transit_time_days=5.0 + i, days_until_eta=float(i % 20))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_predicts_share_one_batch_in_order():
+    transport = CountingTransport()
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, max_batch_size=64,
+                                         max_batch_delay=0.01) as client:
+            batched = await asyncio.gather(*(client.predict(shipment(i)) for i in range(40)))
+            singles = [(await client.predict_many([shipment(i)]))[0] for i in (0, 17, 39)]
+            return batched, singles, dict(client.stats)
+
+    batched, singles, stats = run(scenario())
+    assert [r['risk_probability'] for r in (batched[0], batched[17], batched[39])] == \
+        [r['risk_probability'] for r in singles]
+    assert all(r['risk_level'] for r in batched)
+    assert stats['batches'] == 1 + len(singles)
+    assert all(r.url.path == '/predict/batch' for r in transport.requests)
+
+
+def test_batches_split_at_max_batch_size():
+    transport = CountingTransport()
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, max_batch_size=16) as client:
+            return await asyncio.gather(*(client.predict(shipment(i)) for i in range(50)))
+
+    assert len(run(scenario())) == 50
+    assert len(transport.requests) == 4
+
+
+def test_retries_transient_errors_with_backoff():
+    transport = CountingTransport(fail_first=2, status_code=503)
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, backoff=0.001) as client:
+            return await client.predict(shipment(1)), dict(client.stats)
+
+    result, stats = run(scenario())
+    assert 'risk_probability' in result
+    assert stats['retries'] == 2 and len(transport.requests) == 3
+
+
+def test_gives_up_after_retries_and_does_not_retry_client_errors():
+    async def scenario(status_code):
+        transport = CountingTransport(fail_first=10, status_code=status_code)
+        async with AsyncPredictionClient('http://test', transport=transport, retries=2, backoff=0.001) as client:
+            with pytest.raises(PredictionError) as excinfo:
+                await client.predict(shipment(1))
+            return excinfo.value.status_code, len(transport.requests)
+
+    assert run(scenario(503)) == (503, 3)
+    assert run(scenario(400)) == (400, 1)
+
+
+def test_invalid_shipment_fails_only_its_own_call():
+    transport = CountingTransport()
+    invalid = {k: v for k, v in SHIPMENT.items() if k != 'transit_time_days'}
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, max_batch_delay=0.01) as client:
+            return await asyncio.gather(client.predict(shipment(1)), client.predict(invalid),
+                                        client.predict(shipment(2)), return_exceptions=True)
+
+    first, bad, second = run(scenario())
+    assert 'risk_probability' in first and 'risk_probability' in second
+    assert isinstance(bad, PredictionError) and bad.status_code == 422
+
+
+def test_backpressure_raises_when_pending_limit_is_reached():
+    transport = CountingTransport(delay=0.05)
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, max_pending=2,
+                                         overflow='raise') as client:
+            calls = [asyncio.ensure_future(client.predict(shipment(i))) for i in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(ClientOverloadedError):
+                await client.predict(shipment(3))
+            return await asyncio.gather(*calls)
+
+    assert len(run(scenario())) == 2
+
+
+def test_backpressure_waits_when_pending_limit_is_reached():
+    transport = CountingTransport()
+
+    async def scenario():
+        async with AsyncPredictionClient('http://test', transport=transport, max_pending=4,
+                                         max_batch_size=4) as client:
+            return await asyncio.gather(*(client.predict(shipment(i)) for i in range(10)))
+
+    assert len(run(scenario())) == 10
+    assert len(transport.requests) >= 3
@@ -0,0 +1,86 @@
+"""
+Forest compaction: the flattened forest scores like sklearn's, and the compacted subset serves.
+Training registers both forests and promotes the full one through the registry.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from ml_system.compaction import CompactForest, compact_forest, compacted_artifact
+from ml_system.config import MLConfig
+from ml_system.features import FEATURE_NAMES
+from ml_system.predict import DDPredictor
+from ml_system.registry import ModelRegistry
+from ml_system.train_model import DDModelTrainer
+
+
+@pytest.fixture(scope='module')
+def forest():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(21)
+    X = rng.normal(size=(1200, len(FEATURE_NAMES)))
+    y = (X[:, 0] - 0.7 * X[:, 3] + rng.normal(scale=0.7, size=1200) > 0).astype(int)
+    return RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0).fit(X[:800], y[:800]), X, y
+
+
+def test_flattened_forest_matches_sklearn(forest):
+    model, X, _ = forest
+    flat = CompactForest.from_sklearn(model)
+    assert flat.n_estimators == 30 and flat.node_count == sum(t.tree_.node_count for t in model.estimators_)
+    assert np.allclose(flat.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    assert np.array_equal(flat.predict(X), model.predict(X))
+    assert np.allclose(flat.feature_importances_, model.feature_importances_, atol=1e-6)
+    # A depth cap at or above the deepest tree changes nothing
+    assert np.allclose(CompactForest.from_sklearn(model, max_depth=8).predict_proba(X), flat.predict_proba(X))
+
+
+def test_subsets_and_depth_cuts(forest):
+    model, X, _ = forest
+    flat = CompactForest.from_sklearn(model)
+    trees = [7, 2, 19]
+    expected = np.mean([model.estimators_[t].predict_proba(X.astype(np.float32))[:, 1] for t in trees], axis=0)
+    assert np.allclose(flat.subset(trees).predict_proba(X)[:, 1], expected, atol=1e-6)
+
+    shallow = CompactForest.from_sklearn(model, max_depth=3)
+    assert shallow.depths.max() <= 3 and shallow.node_count < flat.node_count
+    probabilities = shallow.predict_proba(X)[:, 1]
+    assert np.all((probabilities >= 0) & (probabilities <= 1))
+
+
+def test_compacted_model_stays_within_tolerance_and_serves(forest, tmp_path):
+    model, X, y = forest
+    compact, report = compact_forest(model, X[800:1000], y[800:1000], X[1000:], y[1000:], tolerance=0.01)
+    assert compact.n_estimators == len(report['trees']) == len(set(report['trees'])) <= 30
+    assert report['evaluated_on'] == 'holdout' and report['compacted']['size_bytes'] == compact.nbytes
+    assert report['compacted']['auc_roc'] >= report['baseline']['auc_roc'] - 0.05
+
+    artifact = compacted_artifact({'model': model, 'feature_names': list(FEATURE_NAMES), 'scaler': None,
+                                   'model_version': 'v2'}, compact, report, parent_version='v1')
+    assert artifact['compaction']['parent_version'] == 'v1' and 'curve' not in artifact['compaction']
+    model_path = tmp_path / 'dnd_model.pkl'
+    model_path.write_bytes(pickle.dumps(artifact))
+    predictor = DDPredictor(model_path=str(model_path), history_dir=str(tmp_path / 'history'))
+    assert isinstance(predictor.model, CompactForest)
+    _, probabilities, _ = predictor.score_matrix(X[:5])
+    assert np.allclose(probabilities, compact.predict_proba(X[:5])[:, 1])
+
+
+def test_training_registers_both_forests_and_promotes_the_full_one(forest, tmp_path):
+    model, X, y = forest
+    config = MLConfig(home_dir=str(tmp_path))
+    trainer = DDModelTrainer(config=config)
+    trainer.model, trainer.scaler = model, None
+    trainer.compact(X[800:1000], y[800:1000], X[1000:], y[1000:], tolerance=0.01)
+    live = tmp_path / 'models' / 'dnd_model.pkl'
+    live.parent.mkdir()
+    live.write_bytes(b'previous')
+
+    assert trainer.register_models({'auc_roc': 0.9}, promote=False) and live.read_bytes() == b'previous'
+    version, compact_version = trainer.register_models({'auc_roc': 0.9})
+    registry = ModelRegistry.for_dir(config=config)
+    assert registry.current()['version'] == version and compact_version == f"{version}.compact"
+    assert pickle.loads(live.read_bytes())['model_version'] == version
+    assert (tmp_path / 'models' / 'registry' / version / 'dnd_model_metrics.json').exists()
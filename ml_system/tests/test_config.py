@@ -0,0 +1,111 @@
+"""
+MLConfig: derived paths, file and environment precedence, validation, the service knobs read
+from it; buffered history writes.
+"""
+
+import json
+import os
+
+import pytest
+
+from ml_system import config as config_module
+from ml_system.config import ConfigError, MLConfig
+from ml_system.drift import DriftMonitor
+from ml_system.history import HistoryIndex, HistoryWriter
+from ml_system.idempotency import IdempotencyStore
+from ml_system.predict import DDPredictor
+from ml_system.registry import ModelRegistry
+from ml_system.rescoring import FleetStore, RiskEventLog
+from ml_system.scheduler import InferenceScheduler
+from ml_system.tenancy import TenantModels
+
+
+def test_paths_follow_home_unless_set(tmp_path):
+    config = MLConfig.load(environ={'ROOTUIP_HOME': str(tmp_path), 'ROOTUIP_HISTORY_DIR': '/dev/shm/history',
+                                    'ROOTUIP_MODELS_DIR': 'artifacts'})
+    assert config.history_dir == '/dev/shm/history'
+    assert config.models_dir == str(tmp_path / 'artifacts')
+    assert config.model_path == str(tmp_path / 'artifacts' / 'dnd_model.pkl')
+    assert config.fleet_db == str(tmp_path / 'ml-system' / 'data' / 'fleet.sqlite')
+
+
+def test_environment_overrides_file(tmp_path):
+    path = tmp_path / 'ml.json'
+    path.write_text(json.dumps({'home_dir': str(tmp_path), 'cache_size': 5000, 'batch_chunk_size': 256}))
+    config = MLConfig.load(environ={'ROOTUIP_CONFIG': str(path), 'ROOTUIP_PREDICTION_CACHE_SIZE': '100'})
+    assert (config.home_dir, config.cache_size, config.batch_chunk_size) == (str(tmp_path), 100, 256)
+
+    toml = tmp_path / 'ml.toml'
+    toml.write_text('inference_workers = 4\nhistory_flush_seconds = 0.5\n')
+    config = MLConfig.load(str(toml), environ={})
+    assert (config.inference_workers, config.history_flush_seconds) == (4, 0.5)
+
+
+def test_every_invalid_setting_is_reported(tmp_path):
+    path = tmp_path / 'ml.json'
+    path.write_text(json.dumps({'cache_size': -1, 'history_dir': '', 'pool': 3}))
+    with pytest.raises(ConfigError) as error:
+        MLConfig.load(str(path), environ={'ROOTUIP_SCHEDULER_WORKERS': 'two'})
+    message = str(error.value)
+    for problem in ('unknown setting', 'inference_workers must be an integer', 'cache_size must not be negative',
+                    'history_dir must not be empty'):
+        assert problem in message
+
+
+def test_service_knobs_are_validated_settings():
+    config = MLConfig.load(environ={
+        'ROOTUIP_MODEL_FALLBACK': 'rules', 'ROOTUIP_IDEMPOTENCY_SIZE': '0', 'ROOTUIP_TENANT_MODELS': 'off',
+        'ROOTUIP_DRIFT_ENABLED': 'false', 'ROOTUIP_SCHEDULER_BULK_CONCURRENCY': '3',
+        'ROOTUIP_SCHEDULER_INTERACTIVE_MAX_WAIT': '0.5', 'ROOTUIP_PROFILE_ALLOW_HEADER': '1'})
+    assert (config.model_fallback, config.idempotency_size, config.tenant_models, config.drift_enabled) == \
+        ('rules', 0, False, False)
+    assert (config.scheduler_bulk_concurrency, config.scheduler_interactive_concurrency) == (3, None)
+    assert config.scheduler_interactive_max_wait == 0.5 and config.profile_allow_header is True
+    assert IdempotencyStore.from_env(config) is None and DriftMonitor.from_env(config) is None
+    assert TenantModels.from_env(object(), config) is None
+    scheduler = InferenceScheduler.from_env(config)
+    assert scheduler.concurrency['bulk'] == 3 and scheduler.max_wait['interactive'] == 0.5
+
+    with pytest.raises(ConfigError) as error:
+        MLConfig.load(environ={'ROOTUIP_MODEL_FALLBACK': 'none', 'ROOTUIP_IDEMPOTENCY_MB': 'lots',
+                               'ROOTUIP_TENANT_MODELS': 'maybe', 'ROOTUIP_STREAM_MAX_SUBSCRIBERS': '0',
+                               'ROOTUIP_PROFILE_SAMPLE_RATE': '2', 'ROOTUIP_FEATURE_STORE_RELOAD_SECONDS': '-1'})
+    message = str(error.value)
+    for problem in ('model_fallback must be one of', 'idempotency_mb must be a number', 'tenant_models must be on or off',
+                    'stream_max_subscribers must be at least 1', 'profile_sample_rate must be between 0 and 1',
+                    'feature_store_reload_seconds must not be negative'):
+        assert problem in message
+
+
+def test_library_defaults_follow_the_process_configuration(monkeypatch, tmp_path):
+    config = MLConfig.load(environ={'ROOTUIP_HOME': str(tmp_path), 'ROOTUIP_MODEL_FALLBACK': 'rules'})
+    monkeypatch.setattr(config_module, '_config', config)
+    index = HistoryIndex()
+    index.close()
+    assert HistoryWriter().history_dir == index.history_dir == config.history_dir
+    assert FleetStore().path == config.fleet_db and RiskEventLog().events_dir == config.risk_events_dir
+    assert ModelRegistry().live_path == config.model_path
+    assert DDPredictor().fallback == 'rules'
+
+
+def test_unwritable_locations_fail_the_check(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    config = MLConfig(home_dir=str(tmp_path), history_dir=str(blocker / 'history'))
+    assert [p.split(':')[0] for p in config.path_problems()] == ['history_dir']
+    with pytest.raises(ConfigError):
+        config.check()
+    assert MLConfig(home_dir=str(tmp_path)).check().path_problems() == []
+
+
+def test_buffered_history_writes_on_flush(tmp_path):
+    writer = HistoryWriter(str(tmp_path), flush_interval=60.0, max_buffered=3)
+    writer.write([({'a': 1}, {'prediction_id': 'p1'})])
+    assert os.listdir(tmp_path) == []
+    writer.write([({'a': 2}, {'prediction_id': 'p2'}), ({'a': 3}, {'prediction_id': 'p3'})])
+    # max_buffered reached: flushed on the request path without waiting for the interval
+    (name,) = os.listdir(tmp_path)
+    assert len((tmp_path / name).read_text().splitlines()) == 3
+    writer.write([({'a': 4}, {'prediction_id': 'p4'})])
+    writer.flush()
+    assert len((tmp_path / name).read_text().splitlines()) == 4
@@ -0,0 +1,77 @@
+"""
+Drift monitor: PSI and KS against the training reference, streamed moments and out-of-range counts.
+"""
+
+import numpy as np
+import pytest
+
+from ml_system.drift import DriftMonitor, build_reference, ks_binned, psi
+
+NAMES = ['transit_time_days', 'documentation_completeness']
+
+
+@pytest.fixture(scope='module')
+def reference():
+    rng = np.random.default_rng(3)
+    return build_reference(rng.normal(size=(5000, 2)), NAMES)
+
+
+def monitor_for(reference, feature_names=NAMES):
+    monitor = DriftMonitor(buffer_size=64, min_samples=10, check_interval=3600.0)
+    monitor.set_reference(reference, feature_names)
+    return monitor
+
+
+def test_psi_and_ks_of_known_proportions():
+    expected, actual = np.array([0.5, 0.5]), np.array([0.9, 0.1])
+    assert psi(expected, expected) == 0.0 and ks_binned(expected, expected) == 0.0
+    assert psi(expected, actual) == pytest.approx(0.4 * np.log(1.8) - 0.4 * np.log(0.2))
+    assert ks_binned(expected, actual) == pytest.approx(0.4)
+
+
+def test_reference_bins_hold_equal_shares(reference):
+    proportions = np.asarray(reference['features']['transit_time_days']['proportions'])
+    assert proportions.sum() == pytest.approx(1.0)
+    assert np.allclose(proportions, 0.1, atol=0.002)
+
+
+def test_same_distribution_is_stable_and_moments_match(reference):
+    rng = np.random.default_rng(11)
+    rows = rng.normal(size=(3000, 2))
+    monitor = monitor_for(reference)
+    for start in range(0, len(rows), 100):
+        monitor.observe_many(rows[start:start + 100].tolist())
+    monitor.observe(rows[0].tolist())
+    seen = np.vstack([rows, rows[:1]])
+
+    report = monitor.report()
+    assert report['samples'] == len(seen)
+    for i, name in enumerate(NAMES):
+        score = report['features'][name]
+        assert score['status'] == 'stable' and score['psi'] < 0.02 and score['ks'] < 0.05
+        assert score['mean'] == pytest.approx(seen[:, i].mean(), abs=1e-4)
+        assert score['std'] == pytest.approx(seen[:, i].std(), abs=1e-4)
+
+
+def test_shifted_feature_is_significant(reference):
+    rng = np.random.default_rng(12)
+    rows = rng.normal(size=(2000, 2))
+    rows[:, 0] += 1.5
+    monitor = monitor_for(reference)
+    monitor.observe_many(rows.tolist())
+
+    features = monitor.report()['features']
+    shifted = features['transit_time_days']
+    assert shifted['status'] == 'significant' and shifted['ks'] > 0.4
+    assert shifted['out_of_range_fraction'] == pytest.approx(
+        np.mean(rows[:, 0] > reference['features']['transit_time_days']['max']), abs=1e-4)
+    assert features['documentation_completeness']['status'] == 'stable'
+
+
+def test_only_referenced_features_are_tracked(reference):
+    monitor = monitor_for(reference, ['days_until_eta'] + NAMES)
+    monitor.observe_many(np.column_stack([np.full(200, 99.0), np.zeros((200, 2))]).tolist())
+    assert set(monitor.report()['features']) == set(NAMES)
+
+    monitor.set_reference(None, NAMES)
+    assert monitor.report()['active'] is False
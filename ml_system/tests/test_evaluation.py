@@ -0,0 +1,67 @@
+"""
+Model evaluation: point metrics against sklearn, and bootstrap resamples as weight rows.
+"""
+
+import numpy as np
+import pytest
+
+from ml_system.evaluation import CI_METRICS, _Scores, evaluate_probabilities
+
+
+@pytest.fixture(scope='module')
+def scored():
+    rng = np.random.default_rng(5)
+    y_true = rng.integers(0, 2, size=400)
+    # Rounded so several scores tie, which AUC must count half
+    y_proba = np.round(np.clip(0.35 * y_true + rng.uniform(0, 0.65, size=400), 0, 1), 2)
+    return y_true, y_proba
+
+
+def sklearn_metrics(y_true, y_proba, threshold=0.5):
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    y_pred = (y_proba > threshold).astype(int)
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'precision': precision_score(y_true, y_pred, zero_division=0),
+        'recall': recall_score(y_true, y_pred, zero_division=0),
+        'f1_score': f1_score(y_true, y_pred, zero_division=0),
+        'auc_roc': roc_auc_score(y_true, y_proba)
+    }
+
+
+def test_point_metrics_match_sklearn(scored):
+    from sklearn.metrics import confusion_matrix
+
+    y_true, y_proba = scored
+    for threshold in (0.5, 0.3):
+        report = evaluate_probabilities(y_true, y_proba, threshold=threshold, n_resamples=0)
+        assert 'bootstrap' not in report
+        assert report['metrics'] == pytest.approx(sklearn_metrics(y_true, y_proba, threshold))
+        expected = confusion_matrix(y_true, (y_proba > threshold).astype(int)).tolist()
+        assert report['confusion_matrix'] == expected
+
+
+def test_weight_row_equals_scoring_the_resample(scored):
+    y_true, y_proba = scored
+    rng = np.random.default_rng(8)
+    sample = rng.integers(0, len(y_true), size=len(y_true))
+    weights = np.bincount(sample, minlength=len(y_true)).astype(np.float64)[None, :]
+
+    metrics = _Scores(y_true, y_proba, 0.5).metrics(weights)
+    expected = sklearn_metrics(y_true[sample], y_proba[sample])
+    assert {name: float(value[0]) for name, value in metrics.items()} == pytest.approx(expected)
+
+
+def test_bootstrap_depends_only_on_the_seed(scored):
+    y_true, y_proba = scored
+    serial = evaluate_probabilities(y_true, y_proba, n_resamples=600, n_jobs=1, seed=3)
+    parallel = evaluate_probabilities(y_true, y_proba, n_resamples=600, n_jobs=4, seed=3)
+    assert serial['bootstrap'] == parallel['bootstrap']
+    assert evaluate_probabilities(y_true, y_proba, n_resamples=600, seed=4)['bootstrap'] != serial['bootstrap']
+
+    intervals = serial['bootstrap']['intervals']
+    assert set(intervals) == set(CI_METRICS)
+    for interval in intervals.values():
+        assert interval['lower'] <= interval['estimate'] <= interval['upper']
+        assert interval['std_error'] > 0
@@ -0,0 +1,93 @@
+"""
+Fallback models: the rule-based scorer's calibration, the synthetic forest's on-disk cache
+and the 'fail' policy.
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from ml_system import fallback
+from ml_system.fallback import RuleBasedScorer, load_or_build_synthetic_model, synthetic_model_key
+from ml_system.features import FEATURE_NAMES, RISK_SCORE_WEIGHTS, risk_score
+from ml_system.predict import DDPredictor, ModelUnavailableError
+
+
+def test_rule_based_scorer_is_calibrated_to_the_synthetic_positive_rate():
+    from ml_system.train_model import DDModelTrainer
+
+    df = DDModelTrainer().generate_synthetic_data(50000)
+    scores = risk_score(df)
+    # threshold is the documented 94th percentile, so the scorer flags the same ~6% the labels do
+    assert np.percentile(scores, 94) == pytest.approx(RuleBasedScorer.threshold, abs=1e-3)
+    scorer = RuleBasedScorer()
+    probabilities = scorer.predict_proba(df[FEATURE_NAMES].values)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert scorer.predict(df[FEATURE_NAMES].values).mean() == pytest.approx(df['dd_occurred'].mean(), abs=0.01)
+
+    # A logistic of width scale centred on the threshold
+    offsets = np.array([-2, 0, 2]) * RuleBasedScorer.scale
+    expected = 1 / (1 + np.exp(-offsets / RuleBasedScorer.scale))
+    rows = df[FEATURE_NAMES].values[:3].copy()
+    column = FEATURE_NAMES.index('seasonal_risk_factor')
+    for row, offset in zip(rows, offsets):
+        row[column] += (RuleBasedScorer.threshold + offset - risk_score(dict(zip(FEATURE_NAMES, row)))) \
+            / RISK_SCORE_WEIGHTS['seasonal_risk_factor']
+    assert np.allclose(scorer.predict_proba(rows)[:, 1], expected)
+
+    importances = dict(zip(FEATURE_NAMES, scorer.feature_importances_))
+    assert sum(importances.values()) == pytest.approx(1.0)
+    assert importances['transit_time_days'] == 0 and importances['risk_composite_score'] > 0
+
+
+def test_synthetic_model_is_cached_by_content_hash_and_reused(monkeypatch, tmp_path):
+    builds = []
+
+    def build():
+        builds.append(1)
+        return 'forest', 'scaler'
+
+    monkeypatch.setattr(fallback, 'build_synthetic_model', build)
+    key = synthetic_model_key()
+    assert key == synthetic_model_key() and len(key) == 16
+
+    model_data = load_or_build_synthetic_model(str(tmp_path))
+    assert model_data['model_version'] == f"fallback-{key[:8]}" and len(builds) == 1
+    # Written atomically: only the final file is left behind
+    assert os.listdir(tmp_path) == [f"dnd_fallback_{key}.pkl"]
+    assert load_or_build_synthetic_model(str(tmp_path)) == model_data and len(builds) == 1
+
+    # Any change to the spec is a new key, so a stale forest is never reused
+    monkeypatch.setitem(fallback.SYNTHETIC_SPEC, 'n_samples', 2000)
+    assert synthetic_model_key() != key
+    load_or_build_synthetic_model(str(tmp_path))
+    assert len(builds) == 2 and len(os.listdir(tmp_path)) == 2
+
+
+def test_unreadable_or_unwritable_cache_falls_back_to_building(monkeypatch, tmp_path):
+    monkeypatch.setattr(fallback, 'build_synthetic_model', lambda: ('forest', 'scaler'))
+    path = tmp_path / f"dnd_fallback_{synthetic_model_key()}.pkl"
+    path.write_bytes(b'not a pickle')
+    assert load_or_build_synthetic_model(str(tmp_path))['model'] == 'forest'
+    assert pickle.loads(path.read_bytes())['model'] == 'forest'
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    path.unlink()
+    monkeypatch.setattr(fallback.pickle, 'dump', fail)
+    assert load_or_build_synthetic_model(str(tmp_path))['model'] == 'forest'
+    assert os.listdir(tmp_path) == []
+
+
+def test_fail_policy_raises_instead_of_serving_a_fallback(tmp_path):
+    with pytest.raises(ModelUnavailableError):
+        DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'), fallback='fail')
+    corrupt = tmp_path / 'dnd_model.pkl'
+    corrupt.write_bytes(b'not a pickle')
+    with pytest.raises(ModelUnavailableError):
+        DDPredictor(model_path=str(corrupt), history_dir=str(tmp_path / 'history'), fallback='fail')
+    with pytest.raises(ValueError):
+        DDPredictor(model_path=str(corrupt), history_dir=str(tmp_path / 'history'), fallback='retry')
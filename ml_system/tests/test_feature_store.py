@@ -0,0 +1,84 @@
+"""
+Feature store: smoothed aggregates from shipment events, incremental refresh and request enrichment.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from ml_system.feature_store import SMOOTHING, FeatureStore, refresh
+from ml_system.features import DEFAULT_FEATURE_VALUES
+from ml_system.predict import DDPredictor
+
+EVENTS = [
+    {'carrier_scac': 'MAEU', 'pol_locode': 'CNSHA', 'pod_locode': 'USLAX', 'on_time': 1, 'dd_occurred': 0,
+     'dwell_days': 2.0},
+    {'carrier_scac': 'maeu ', 'pol_locode': 'CNSHA', 'pod_locode': 'USLAX', 'on_time': 0, 'dd_occurred': 1,
+     'dwell_days': 6.5},
+    {'carrier_scac': 'MSCU', 'pol_locode': 'SGSIN', 'pod_locode': 'NLRTM', 'on_time': 1, 'dd_occurred': 0},
+]
+
+
+def smoothed(count: float, shipments: float, feature: str) -> float:
+    return (count + SMOOTHING * DEFAULT_FEATURE_VALUES[feature]) / (shipments + SMOOTHING)
+
+
+def test_lookup_serves_smoothed_rates(tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'), reload_interval=0.0)
+    assert store.ingest(EVENTS) == 3
+    found = store.lookup({'carrier_scac': 'MAEU', 'pol_locode': 'cnsha', 'pod_locode': 'USLAX'})
+    assert found == pytest.approx({
+        'carrier_reliability_score': smoothed(1, 2, 'carrier_reliability_score'),
+        'historical_dd_rate': smoothed(1, 2, 'historical_dd_rate'),
+        'port_congestion_index': smoothed(1, 2, 'port_congestion_index'),
+        # A shipment that was late or incurred D&D counts as a lane disruption
+        'route_risk_score': smoothed(1, 2, 'route_risk_score'),
+    })
+    assert store.lookup({'carrier_scac': 'ZZZZ'}) == {}
+
+    columns = store.lookup_columns({'carrier_scac': ['MSCU', 'ZZZZ'], 'lane': ['SGSIN-NLRTM', None]}, 2)
+    assert columns['historical_dd_rate'][0] == pytest.approx(smoothed(0, 1, 'historical_dd_rate'))
+    assert np.isnan(columns['historical_dd_rate'][1]) and np.isnan(columns['port_congestion_index']).all()
+    assert columns['route_risk_score'][0] == pytest.approx(smoothed(0, 1, 'route_risk_score'))
+
+
+def test_ingest_bumps_the_version_and_counters_accumulate(tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'), reload_interval=0.0)
+    store.ingest(EVENTS[:1])
+    assert store.lookup({'carrier_scac': 'MAEU'})['historical_dd_rate'] == pytest.approx(
+        smoothed(0, 1, 'historical_dd_rate'))
+    version = store.version
+    store.ingest(EVENTS[1:2])
+    assert store.lookup({'carrier_scac': 'MAEU'})['historical_dd_rate'] == pytest.approx(
+        smoothed(1, 2, 'historical_dd_rate'))
+    assert store.version == version + 1
+    with pytest.raises(ValueError):
+        store.ingest([{'carrier_scac': 'MAEU'}])
+
+
+def test_refresh_reads_only_new_complete_lines(tmp_path):
+    events_dir = tmp_path / 'events'
+    events_dir.mkdir()
+    path = str(tmp_path / 'features.sqlite')
+    log = events_dir / 'shipment_events_2026-10-01.jsonl'
+    lines = [json.dumps(event) for event in EVENTS]
+    log.write_text(lines[0] + '\n' + lines[1] + '\n' + lines[2][:10])
+
+    assert refresh(path, str(events_dir)) == 2
+    assert refresh(path, str(events_dir)) == 0
+    log.write_text(lines[0] + '\n' + lines[1] + '\n' + lines[2] + '\n')
+    assert refresh(path, str(events_dir)) == 1
+    assert FeatureStore(path).stats()['carriers'] == 2
+
+
+def test_predictor_fills_missing_features_from_the_store(tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'), reload_interval=0.0)
+    store.ingest(EVENTS)
+    predictor = DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                            fallback='rules', feature_store=store)
+    enriched = predictor.enrich({'carrier_scac': 'MAEU', 'historical_dd_rate': 0.9})
+    assert enriched['carrier_reliability_score'] == pytest.approx(smoothed(1, 2, 'carrier_reliability_score'))
+    # Values the caller sent win over the store
+    assert enriched['historical_dd_rate'] == 0.9
+    assert enriched['port_congestion_index'] == DEFAULT_FEATURE_VALUES['port_congestion_index']
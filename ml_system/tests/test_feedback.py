@@ -0,0 +1,134 @@
+"""
+Outcome feedback: the outcome-to-history join, the labelled set, and the retrain-then-promote gate.
+"""
+
+import asyncio
+import pickle
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_system import transport
+from ml_system.feedback import build_training_set, retrain_from_outcomes
+from ml_system.features import DEFAULT_FEATURE_VALUES, DERIVED_FEATURES, FEATURE_NAMES
+from ml_system.history import HistoryIndex, HistoryWriter
+from ml_system.predict import DDPredictor
+from ml_system.registry import ModelRegistry
+
+BASE_FEATURES = [name for name in FEATURE_NAMES if name not in DERIVED_FEATURES]
+
+
+def shipments(n, seed=0):
+    """Base features and carriers for n shipments; D&D happens when documentation is poor"""
+    rng = np.random.default_rng(seed)
+    inputs, labels = [], []
+    for i in range(n):
+        data = {name: DEFAULT_FEATURE_VALUES[name] * rng.uniform(0.5, 1.5) for name in BASE_FEATURES}
+        data.update(shipment_id=f"S{i}", carrier_scac=['MAEU', 'MSCU'][i % 2])
+        inputs.append(data)
+        labels.append(int(data['documentation_completeness'] < 0.9))
+    return inputs, labels
+
+
+def write_history(history_dir, inputs):
+    HistoryWriter(str(history_dir)).write(
+        (data, {'prediction_id': f"p{i}", 'prediction': 0, 'risk_probability': 0.5})
+        for i, data in enumerate(inputs))
+
+
+def outcomes(rows):
+    return pd.DataFrame(rows, columns=['prediction_id', 'shipment_id', 'dd_occurred'])
+
+
+def test_outcomes_join_history_by_prediction_or_shipment_id(tmp_path):
+    inputs, _ = shipments(3)
+    write_history(tmp_path, inputs)
+    # The same shipment scored again later: a shipment id resolves to its latest prediction
+    HistoryWriter(str(tmp_path)).write([(dict(inputs[2], documentation_completeness=0.2),
+                                         {'prediction_id': 'p2-again', 'timestamp': '2999-01-01T00:00:00'})])
+    index = HistoryIndex(str(tmp_path))
+    try:
+        X, y, stats = build_training_set(outcomes([('p0', None, 1), (None, 'S2', 0), ('missing', None, 1)]), index)
+    finally:
+        index.close()
+
+    assert stats == {'outcomes': 3, 'matched': 2, 'unmatched': 1}
+    assert X['prediction_id'].tolist() == ['p0', 'p2-again'] and y.tolist() == [1, 0]
+    assert X['documentation_completeness'].tolist() == [inputs[0]['documentation_completeness'], 0.2]
+    assert X['carrier_scac'].tolist() == ['MAEU', 'MAEU']
+    # Derived features are rebuilt from the stored base values
+    assert X[list(DERIVED_FEATURES)].notna().all().all()
+    assert X['risk_composite_score'].nunique() == 2
+
+
+def test_msgpack_history_keeps_raw_identifiers(monkeypatch, tmp_path):
+    pytest.importorskip('fastapi')
+    if not transport.msgpack_available():
+        pytest.skip('msgpack not installed')
+    from ml_system import api
+
+    history_dir = tmp_path / 'history'
+    predictor = DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(history_dir), fallback='rules')
+    monkeypatch.setattr(api, 'predictor', predictor)
+    monkeypatch.setattr(api, 'tenant_models', None)
+    body = transport.encode_request(np.tile([21.0, 0.7], (2, 1)), ['transit_time_days', 'documentation_completeness'],
+                                    ids=['S1', 'S2'], categorical={'carrier_scac': ['MAEU', None],
+                                                                   'lane': ['CNSHA-NLRTM', 'CNSHA-USLAX']})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            return await client.post('/predict/batch/msgpack', content=body,
+                                     headers={'Content-Type': transport.CONTENT_TYPE})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    index = HistoryIndex(str(history_dir))
+    try:
+        X, _, stats = build_training_set(outcomes([(None, 'S1', 1), (None, 'S2', 0)]), index)
+    finally:
+        index.close()
+    assert stats['matched'] == 2
+    assert X['carrier_scac'].iloc[0] == 'MAEU' and pd.isna(X['carrier_scac'].iloc[1])
+    assert X['lane'].tolist() == ['CNSHA-NLRTM', 'CNSHA-USLAX']
+
+
+def test_candidate_is_promoted_only_when_it_beats_the_live_model(tmp_path):
+    from sklearn.ensemble import RandomForestClassifier
+
+    inputs, labels = shipments(400, seed=1)
+    history_dir, models_dir = tmp_path / 'history', tmp_path / 'models'
+    write_history(history_dir, inputs)
+    outcomes_path = tmp_path / 'outcomes.csv'
+    outcomes([(f"p{i}", None, label) for i, label in enumerate(labels)]).to_csv(outcomes_path, index=False)
+
+    # The live model learned noise, so trees grown on the outcomes beat it on the holdout
+    rng = np.random.default_rng(2)
+    noise = RandomForestClassifier(n_estimators=3, max_depth=2, random_state=0).fit(
+        rng.normal(size=(100, len(FEATURE_NAMES))), rng.integers(0, 2, 100))
+    live = {'model': noise, 'scaler': None, 'feature_names': list(FEATURE_NAMES), 'model_version': 'live'}
+    live_path = models_dir / 'dnd_model.pkl'
+    models_dir.mkdir()
+    live_path.write_bytes(pickle.dumps(live))
+
+    def retrain(**kwargs):
+        return retrain_from_outcomes(str(outcomes_path), history_dir=str(history_dir), models_dir=str(models_dir),
+                                     data_dir=str(tmp_path / 'data'), extra_trees=30, min_samples=100, **kwargs)
+
+    report = retrain(dry_run=True)
+    assert report['candidate_auc'] > report['live_auc'] and not report['promoted']
+    assert pickle.loads(live_path.read_bytes())['model_version'] == 'live'
+
+    report = retrain()
+    assert report['promoted'] and report['join'] == {'outcomes': 400, 'matched': 400, 'unmatched': 0}
+    registry = ModelRegistry(str(models_dir))
+    assert registry.current()['version'] == report['version']
+    assert registry.current()['parent'] == 'live'
+    assert pickle.loads(live_path.read_bytes())['model_version'] == report['version']
+
+    # Against the promoted model a further candidate cannot clear the required margin
+    report = retrain(min_improvement=0.5)
+    assert not report['promoted'] and 'version' not in report
+    assert registry.current()['version'] == pickle.loads(live_path.read_bytes())['model_version']
+    assert len(registry.versions()) == 1
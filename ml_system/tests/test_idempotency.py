@@ -0,0 +1,205 @@
+"""
+Idempotency-Key handling: the replay store, the API endpoints and history dedup.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ml_system.history import HistoryIndex, HistoryWriter
+from ml_system.idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+
+SHIPMENT = {
+    'shipment_id': 'MSKU1234565', 'transit_time_days': 21.0, 'documentation_completeness': 0.7,
+    'customs_complexity_score': 0.5, 'container_value_usd': 60000.0, 'days_until_eta': 6.0,
+    'seasonal_risk_factor': 0.8
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_duplicates_compute_once():
+    store = IdempotencyStore()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'prediction_id': 'p1'}
+
+    async def scenario():
+        digest = fingerprint({'a': 1})
+        results = await asyncio.gather(*(store.run('k', digest, compute) for _ in range(5)))
+        later = await store.run('k', digest, compute)
+        return results, later
+
+    results, later = run(scenario())
+    assert len(calls) == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert later == ({'prediction_id': 'p1'}, True)
+
+
+def test_reused_key_with_different_body_conflicts():
+    store = IdempotencyStore()
+
+    async def compute():
+        return 'ok'
+
+    async def scenario():
+        await store.run('k', fingerprint({'a': 1}), compute)
+        await store.run('k', fingerprint({'a': 2}), compute)
+
+    with pytest.raises(IdempotencyConflict):
+        run(scenario())
+
+
+def test_failures_and_unkept_responses_are_not_stored():
+    store = IdempotencyStore()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise RuntimeError('boom')
+
+    async def failed_result():
+        calls.append(1)
+        return {'status': 'failed'}
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await store.run('a', b'x', failing)
+        for _ in range(2):
+            await store.run('b', b'x', failed_result, keep=lambda r: r.get('status') != 'failed')
+
+    run(scenario())
+    assert len(calls) == 4 and store.stats()['entries'] == 0
+
+
+def test_entries_expire_and_respect_the_size_cap():
+    store = IdempotencyStore(max_entries=2, ttl_seconds=0.0)
+
+    async def compute():
+        return 'ok'
+
+    async def scenario():
+        _, first = await store.run('k', b'x', compute)
+        _, second = await store.run('k', b'x', compute)
+        return first, second
+
+    assert run(scenario()) == (False, False)
+
+    store = IdempotencyStore(max_entries=2)
+
+    async def fill():
+        for key in 'abc':
+            await store.run(key, b'x', compute)
+
+    run(fill())
+    assert store.stats()['entries'] == 2
+
+
+def test_history_writer_and_index_skip_repeated_request_ids(tmp_path):
+    writer = HistoryWriter(str(tmp_path))
+    records = [({'shipment_id': 's1'}, {'prediction_id': 'p1', 'risk_level': 'LOW'}),
+               ({'shipment_id': 's2'}, {'prediction_id': 'p2', 'risk_level': 'HIGH'})]
+    writer.write(records, request_id='req-1')
+    writer.write(records, request_id='req-1')
+    # Another worker answering the same retry writes new prediction ids for the same request
+    HistoryWriter(str(tmp_path)).write(
+        [({'shipment_id': 's1'}, {'prediction_id': 'p3', 'risk_level': 'LOW'}),
+         ({'shipment_id': 's2'}, {'prediction_id': 'p4', 'risk_level': 'HIGH'})], request_id='req-1')
+
+    lines = [json.loads(line) for path in tmp_path.glob('predictions_*.jsonl') for line in path.open()]
+    assert [(line['request_id'], line['request_seq']) for line in lines] == [('req-1', 0), ('req-1', 1)] * 2
+
+    index = HistoryIndex(str(tmp_path))
+    try:
+        assert index.refresh() == 2
+        assert set(index.lookup(prediction_ids=['p1', 'p2', 'p3', 'p4'])) == {'p1', 'p2'}
+    finally:
+        index.close()
+
+
+def test_failed_history_write_does_not_claim_the_request_id(tmp_path):
+    blocker = tmp_path / 'history'
+    blocker.write_text('')
+    records = [({'shipment_id': 's1'}, {'prediction_id': 'p1', 'risk_level': 'LOW'})]
+    writer = HistoryWriter(str(blocker))
+    with pytest.raises(OSError):
+        writer.write(records, request_id='req-1')
+
+    blocker.unlink()
+    writer.write(records, request_id='req-1')
+    (path,) = blocker.glob('predictions_*.jsonl')
+    assert [json.loads(line)['request_id'] for line in path.open()] == ['req-1']
+
+
+def test_api_replays_the_first_response():
+    pytest.importorskip('fastapi')
+    from ml_system.api import app
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            headers = {'Idempotency-Key': 'retry-test-1'}
+            first, second = await asyncio.gather(
+                client.post('/predict', json=SHIPMENT, headers=headers),
+                client.post('/predict', json=SHIPMENT, headers=headers))
+            third = await client.post('/predict', json=SHIPMENT, headers=headers)
+            other = await client.post('/predict', json=dict(SHIPMENT, days_until_eta=1.0), headers=headers)
+            batch = await client.post('/predict/batch', json={'shipments': [SHIPMENT]},
+                                      headers={'X-Request-ID': 'retry-test-2'})
+            batch_again = await client.post('/predict/batch', json={'shipments': [SHIPMENT]},
+                                            headers={'X-Request-ID': 'retry-test-2'})
+            return first, second, third, other, batch, batch_again
+
+    first, second, third, other, batch, batch_again = run(scenario())
+    assert first.status_code == second.status_code == third.status_code == 200
+    assert first.json()['prediction_id'] == second.json()['prediction_id'] == third.json()['prediction_id']
+    assert third.headers['Idempotent-Replayed'] == 'true'
+    assert other.status_code == 422
+    assert batch.json() == batch_again.json()
+    assert 'Idempotent-Replayed' not in batch.headers and batch_again.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_retry_after_a_failed_chunk_returns_the_recorded_prediction_ids(tmp_path, monkeypatch):
+    pytest.importorskip('fastapi')
+    from ml_system import api
+    from ml_system.predict import DDPredictor
+    from ml_system.scheduler import InferenceScheduler
+
+    predictor = DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                            fallback='rules')
+    monkeypatch.setattr(api, 'predictor', predictor)
+    monkeypatch.setattr(api, 'tenant_models', None)
+    monkeypatch.setattr(api, 'scheduler', InferenceScheduler(workers=1, chunk_size=2))
+    predict_batch = predictor.predict_batch
+    failed = []
+
+    def second_chunk_fails_once(*args, request_id=None, **kwargs):
+        if request_id.endswith('@2') and not failed:
+            failed.append(request_id)
+            raise RuntimeError('chunk dropped')
+        return predict_batch(*args, request_id=request_id, **kwargs)
+
+    monkeypatch.setattr(predictor, 'predict_batch', second_chunk_fails_once)
+    shipments = [dict(SHIPMENT, shipment_id=f'MSKU{n}', days_until_eta=float(n)) for n in range(4)]
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            headers = {'Idempotency-Key': 'chunk-retry-1'}
+            first = await client.post('/predict/batch', json={'shipments': shipments}, headers=headers)
+            retry = await client.post('/predict/batch', json={'shipments': shipments}, headers=headers)
+            return first, retry
+
+    first, retry = run(scenario())
+    assert first.status_code == 400 and retry.status_code == 200
+    returned = [p['prediction_id'] for p in retry.json()['predictions']]
+    recorded = [json.loads(line)['result']['prediction_id']
+                for path in (tmp_path / 'history').glob('predictions_*.jsonl') for line in path.open()]
+    # The first chunk was recorded by the failed attempt and skipped on the retry
+    assert len(recorded) == 4 and sorted(recorded) == sorted(returned)
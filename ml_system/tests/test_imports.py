@@ -0,0 +1,57 @@
+"""
+Import-time budget for the ml_system package.
+
+Each check runs in a fresh interpreter so modules cached by the test process
+do not hide import costs. Budgets can be relaxed on slow CI hosts with
+ROOTUIP_IMPORT_BUDGET_SCALE.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BUDGET_SCALE = float(os.environ.get('ROOTUIP_IMPORT_BUDGET_SCALE', '1'))
+HEAVY_MODULES = ('pandas', 'sklearn', 'fastapi', 'scipy')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': sorted(m for m in sys.modules if '.' not in m)}}))
+"""
+
+
+def _probe(module):
+    output = subprocess.check_output(
+        [sys.executable, '-c', PROBE.format(module=module)], cwd=REPO_ROOT, text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module, budget_seconds', [
+    ('ml_system', 0.05),
+    ('ml_system.features', 0.05),
+    ('ml_system.train_model', 0.5),
+    ('ml_system.predict', 0.5),
+])
+def test_import_is_lazy_and_within_budget(module, budget_seconds):
+    result = _probe(module)
+    heavy = [m for m in HEAVY_MODULES if m in result['loaded']]
+    assert not heavy, f"import {module} pulled in {heavy}"
+    assert result['seconds'] < budget_seconds * BUDGET_SCALE, (
+        f"import {module} took {result['seconds'] * 1000:.1f}ms (budget {budget_seconds * 1000:.0f}ms)"
+    )
+
+
+def test_package_exports_resolve_lazily():
+    import ml_system
+
+    assert 'DDPredictor' in dir(ml_system)
+    assert ml_system.FEATURE_NAMES[0] == 'transit_time_days'
+    with pytest.raises(AttributeError):
+        ml_system.does_not_exist
@@ -0,0 +1,50 @@
+"""
+Logging: arguments are merged when the call is made, and idle summaries still get written.
+"""
+
+import logging
+import queue
+import time
+
+from ml_system.logging_config import JsonFormatter, PredictionEventAggregator, _DeferredQueueHandler
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_queued_record_keeps_the_arguments_as_logged():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger('test_logging_config.queued')
+    logger.propagate = False
+    logger.handlers = [_DeferredQueueHandler(log_queue)]
+    shipment = {'risk_level': 'LOW'}
+    logger.warning('scored %s', shipment, extra={'event': 'scored'})
+    shipment['risk_level'] = 'CRITICAL'
+
+    record = log_queue.get_nowait()
+    assert record.args is None and record.getMessage() == "scored {'risk_level': 'LOW'}"
+    line = JsonFormatter().format(record)
+    assert '"msg": "scored {\'risk_level\': \'LOW\'}"' in line and '"event": "scored"' in line
+
+
+def test_summary_is_logged_when_traffic_goes_idle():
+    logger = logging.getLogger('test_logging_config.summary')
+    logger.propagate = False
+    handler = ListHandler()
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    events = PredictionEventAggregator(logger, interval=0.05)
+    events.record('LOW', 0.1)
+    events.record('HIGH', 0.7)
+
+    deadline = time.monotonic() + 2.0
+    while not handler.records and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (record,) = handler.records
+    assert record.predictions == 2 and record.by_risk_level == {'LOW': 1, 'HIGH': 1}
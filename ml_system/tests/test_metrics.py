@@ -0,0 +1,66 @@
+"""
+Prometheus exposition: histogram buckets, label output and the /metrics endpoint.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from ml_system.metrics import CONTENT_TYPE_LATEST, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets_per_label_set():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('stage_seconds', 'Stage time', ['stage'], buckets=(0.1, 0.01, 1.0))
+    for value in (0.005, 0.01, 0.5, 3.0):
+        histogram.labels('score').observe(value)
+    histogram.labels('parse').observe(0.2)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP stage_seconds Stage time', '# TYPE stage_seconds histogram']
+    # Label sets are sorted; buckets are sorted, cumulative, inclusive of their bound and end with +Inf
+    assert lines[2:] == [
+        'stage_seconds_bucket{stage="parse",le="0.01"} 0',
+        'stage_seconds_bucket{stage="parse",le="0.1"} 0',
+        'stage_seconds_bucket{stage="parse",le="1"} 1',
+        'stage_seconds_bucket{stage="parse",le="+Inf"} 1',
+        'stage_seconds_sum{stage="parse"} 0.2',
+        'stage_seconds_count{stage="parse"} 1',
+        'stage_seconds_bucket{stage="score",le="0.01"} 2',
+        'stage_seconds_bucket{stage="score",le="0.1"} 2',
+        'stage_seconds_bucket{stage="score",le="1"} 3',
+        'stage_seconds_bucket{stage="score",le="+Inf"} 4',
+        'stage_seconds_sum{stage="score"} 3.515',
+        'stage_seconds_count{stage="score"} 4',
+    ]
+
+
+def test_counters_gauges_and_label_escaping():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests', 'Requests', ['path'])
+    counter.labels('/a"b\\c\nd').inc(2)
+    registry.gauge('in_flight', 'In flight').set(3)
+
+    text = registry.render()
+    assert 'requests_total{path="/a\\"b\\\\c\\nd"} 2\n' in text
+    assert '# TYPE requests counter' in text and 'in_flight 3\n' in text
+    with pytest.raises(ValueError):
+        counter.labels('a', 'b')
+    with pytest.raises(ValueError):
+        registry.counter('requests', 'Registered twice')
+
+
+def test_metrics_endpoint_serves_the_exposition():
+    pytest.importorskip('fastapi')
+    from ml_system import api
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            await client.get('/health')
+            return await client.get('/metrics')
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200 and response.headers['content-type'] == CONTENT_TYPE_LATEST
+    assert '# TYPE rootuip_ml_request_seconds histogram' in response.text
+    assert 'rootuip_ml_batch_size_bucket{le="16384"}' in response.text
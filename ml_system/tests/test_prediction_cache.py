@@ -0,0 +1,70 @@
+"""
+PredictionCache: hits and misses through DDPredictor, reload invalidation and the LRU bounds.
+"""
+
+import pytest
+
+from ml_system.predict import DDPredictor
+from ml_system.prediction_cache import PredictionCache
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    return DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                       fallback='rules', cache=PredictionCache(max_entries=100))
+
+
+def test_repeated_request_is_served_from_the_cache(predictor):
+    first = predictor.predict(dict(SHIPMENT))
+    second = predictor.predict(dict(SHIPMENT))
+    assert (predictor.cache.hits, predictor.cache.misses) == (1, 1)
+    assert second['risk_probability'] == first['risk_probability']
+    # Every answer is its own prediction, cached or not
+    assert second['prediction_id'] != first['prediction_id']
+
+    predictor.predict(dict(SHIPMENT, transit_time_days=30.0))
+    predictor.predict(dict(SHIPMENT), use_cache=False)
+    assert (predictor.cache.hits, predictor.cache.misses) == (1, 2)
+
+
+def test_batch_scores_only_the_misses(predictor):
+    predictor.predict(dict(SHIPMENT), response_profile='minimal')
+    results = predictor.predict_batch([dict(SHIPMENT), dict(SHIPMENT, transit_time_days=30.0)],
+                                      response_profile='minimal')
+    assert len(results) == 2
+    assert (predictor.cache.hits, predictor.cache.misses) == (1, 2)
+
+
+def test_model_reload_invalidates_cached_results(predictor):
+    predictor.predict(dict(SHIPMENT))
+    token = predictor.model_token
+    predictor.load_model()
+    assert predictor.model_token != token and predictor.cache.stats()['entries'] == 0
+
+    predictor.predict(dict(SHIPMENT))
+    assert (predictor.cache.hits, predictor.cache.misses) == (0, 2)
+
+    features = [1.0, 2.0]
+    assert predictor.cache.key(features, 'v1:1') != predictor.cache.key(features, 'v1:2')
+    # Differences below the quantization step share an entry
+    assert predictor.cache.key([1.00001, -0.0], 'v1') == predictor.cache.key([1.0, 0.0], 'v1')
+
+
+def test_entries_expire_and_least_recently_used_is_evicted(monkeypatch):
+    cache = PredictionCache(max_entries=2, ttl_seconds=10.0)
+    now = [1000.0]
+    monkeypatch.setattr('ml_system.prediction_cache.time.monotonic', lambda: now[0])
+    for name in (b'a', b'b'):
+        cache.put(name, {'risk_probability': 0.1})
+    assert cache.get(b'a') is not None
+    cache.put(b'c', {'risk_probability': 0.2})
+    assert cache.get(b'b') is None and cache.get(b'a') is not None
+
+    now[0] += 11.0
+    assert cache.get(b'c') is None
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,68 @@
+"""
+RequestProfiler: who may trigger a profile, how many dumps are kept, and where sampled requests run.
+"""
+
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+
+from ml_system.profiling import RequestProfiler
+from ml_system.scheduler import InferenceScheduler
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+
+def test_debug_header_is_off_by_default(tmp_path):
+    assert RequestProfiler(reports_dir=str(tmp_path)).trigger_for('1') is None
+
+
+def test_debug_header_needs_the_admin_token(tmp_path):
+    profiler = RequestProfiler(reports_dir=str(tmp_path), allow_header=True, header_token='s3cret')
+    assert profiler.trigger_for('1') is None
+    assert profiler.trigger_for('s3cret') == 'header'
+    assert RequestProfiler(reports_dir=str(tmp_path), allow_header=True).trigger_for('anything') is None
+
+
+def test_only_the_newest_dumps_are_kept(tmp_path):
+    profiler = RequestProfiler(reports_dir=str(tmp_path), max_captures=3)
+    ids = []
+    for _ in range(5):
+        with profiler.capture('sampled') as capture:
+            ids.append(capture.id)
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 3
+    assert [name.rsplit('_', 1)[1][:-5] for name in names] == ids[2:]
+
+
+def test_sampled_stage_captures_run_on_the_inference_threads(tmp_path, monkeypatch):
+    pytest.importorskip('fastapi')
+    from ml_system import api
+
+    profiler = RequestProfiler(sample_rate=1.0, reports_dir=str(tmp_path))
+    monkeypatch.setattr(api, 'profiler', profiler)
+    monkeypatch.setattr(api, 'scheduler', InferenceScheduler(workers=1))
+    threads = []
+    predict = api._predict
+
+    def recording_predict(*args):
+        threads.append(threading.get_ident())
+        return predict(*args)
+
+    monkeypatch.setattr(api, '_predict', recording_predict)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            response = await client.post('/predict', json=SHIPMENT)
+            return response, threading.get_ident()
+
+    response, loop_thread = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert len(threads) == 1 and threads[0] != loop_thread
+    capture = profiler.get_capture(response.headers['X-Profile-Id'])
+    assert capture['mode'] == 'stages' and 'parse' in [stage['stage'] for stage in capture['stages']]
@@ -0,0 +1,94 @@
+"""
+Model reloads: scoring threads never see a half-swapped model, and a snapshot outlives a reload.
+"""
+
+import asyncio
+import pickle
+import threading
+
+import httpx
+import numpy as np
+import pytest
+
+from ml_system.features import FEATURE_NAMES
+from ml_system.predict import DDPredictor
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+
+def model_data(feature_names, version):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(len(feature_names))
+    X = rng.normal(size=(200, len(feature_names)))
+    y = (X[:, 0] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=0).fit(scaler.transform(X), y)
+    return pickle.dumps({'model': model, 'scaler': scaler, 'feature_names': list(feature_names),
+                         'model_version': version})
+
+
+def test_scoring_during_reloads_never_mixes_models(tmp_path):
+    # Different widths: a new scaler paired with the old model (or feature order) fails loudly
+    narrow, wide = model_data(FEATURE_NAMES[:6], 'narrow'), model_data(FEATURE_NAMES, 'wide')
+    model_path = tmp_path / 'dnd_model.pkl'
+    model_path.write_bytes(narrow)
+    predictor = DDPredictor(model_path=str(model_path), history_dir=str(tmp_path / 'history'))
+    errors = []
+    done = threading.Event()
+
+    def score():
+        while not done.is_set():
+            try:
+                predictor.predict_batch([dict(SHIPMENT)] * 4, response_profile='minimal')
+                predictor.score_matrix(np.asarray([predictor.feature_row(dict(SHIPMENT))]))
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=score) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for n in range(30):
+        model_path.write_bytes(wide if n % 2 == 0 else narrow)
+        predictor.load_model()
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_snapshot_scores_with_its_own_model_after_a_reload(tmp_path):
+    model_path = tmp_path / 'dnd_model.pkl'
+    model_path.write_bytes(model_data(FEATURE_NAMES[:6], 'narrow'))
+    predictor = DDPredictor(model_path=str(model_path), history_dir=str(tmp_path / 'history'))
+    loaded = predictor.current
+    row = predictor.feature_row(dict(SHIPMENT), loaded)
+
+    model_path.write_bytes(model_data(FEATURE_NAMES, 'wide'))
+    predictor.load_model()
+    assert predictor.model_version == 'wide' and predictor.model_token != loaded.token
+    _, probabilities, _ = predictor.score_matrix(np.asarray([row]), loaded)
+    assert len(row) == 6 and 0.0 <= probabilities[0] <= 1.0
+
+
+def test_admin_reload_runs_off_the_event_loop(monkeypatch):
+    pytest.importorskip('fastapi')
+    from ml_system import api
+
+    loop_threads = []
+    monkeypatch.setattr(api, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(api.predictor, 'load_model', lambda: loop_threads.append(threading.get_ident()))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            response = await client.post('/admin/model/reload', headers={'X-Admin-Token': 'secret'})
+            return response, threading.get_ident()
+
+    response, loop_thread = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert len(loop_threads) == 1 and loop_threads[0] != loop_thread
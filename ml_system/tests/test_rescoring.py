@@ -0,0 +1,97 @@
+"""
+Fleet re-scoring: only affected rows are re-scored and only level changes are emitted.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from ml_system.feature_store import FeatureStore
+from ml_system.predict import DDPredictor
+from ml_system.rescoring import SECONDS_PER_DAY, FleetRescorer, FleetStore, RiskEventLog
+
+NOW = 1_800_000_000.0
+FEATURES = ['days_until_eta', 'documentation_completeness', 'historical_dd_rate']
+
+
+def make_rescorer(tmp_path, feature_store=None) -> FleetRescorer:
+    from sklearn.tree import DecisionTreeClassifier
+
+    # Certain D&D within 5 days of arrival, none before: the level only depends on the clock
+    days = np.linspace(0, 20, 81)[:, None]
+    X = np.hstack([days, np.full_like(days, 0.9), np.full_like(days, 0.15)])
+    model = DecisionTreeClassifier(max_depth=1).fit(X, (days[:, 0] < 5).astype(int))
+    model_path = tmp_path / 'dnd_model.pkl'
+    model_path.write_bytes(pickle.dumps({'model': model, 'feature_names': FEATURES, 'scaler': None}))
+    predictor = DDPredictor(model_path=str(model_path), history_dir=str(tmp_path / 'history'),
+                            feature_store=feature_store)
+    fleet = FleetStore(str(tmp_path / 'fleet.sqlite'))
+    return FleetRescorer(predictor, fleet, RiskEventLog(str(tmp_path / 'events')), eta_resolution_hours=6.0)
+
+
+@pytest.fixture
+def rescorer(tmp_path):
+    return make_rescorer(tmp_path)
+
+
+def track(rescorer, shipment_id, days, **features):
+    rescorer.fleet.track([{'shipment_id': shipment_id, 'documentation_completeness': 0.9,
+                           'eta': NOW + days * SECONDS_PER_DAY, **features}])
+
+
+def test_first_scores_and_unchanged_rows_emit_nothing(rescorer):
+    track(rescorer, 'far', 10)
+    track(rescorer, 'near', 2)
+    assert rescorer.tick(NOW) == {'open': 2, 'rescored': {'update': 2}, 'crossings': 0}
+    assert rescorer.fleet.get('far')['risk_level'] == 'VERY_LOW'
+    assert rescorer.fleet.get('near')['risk_level'] == 'CRITICAL'
+
+    assert rescorer.tick(NOW + 3600) == {'open': 2, 'rescored': {}, 'crossings': 0}
+    # Re-tracking with the same features re-scores the row, but its level did not move
+    track(rescorer, 'far', 10)
+    assert rescorer.tick(NOW) == {'open': 2, 'rescored': {'update': 1}, 'crossings': 0}
+
+
+def test_clock_crossing_is_emitted_once(rescorer, tmp_path):
+    received = []
+    rescorer.subscribe(received.extend)
+    track(rescorer, 'far', 10)
+    rescorer.tick(NOW)
+
+    # Still 7 days out: re-scored for the clock, same level
+    assert rescorer.tick(NOW + 3 * SECONDS_PER_DAY) == {'open': 1, 'rescored': {'clock': 1}, 'crossings': 0}
+    assert rescorer.tick(NOW + 6 * SECONDS_PER_DAY)['crossings'] == 1
+    assert rescorer.tick(NOW + 6.5 * SECONDS_PER_DAY)['crossings'] == 0
+
+    (event,) = received
+    assert (event['shipment_id'], event['previous_level'], event['risk_level']) == ('far', 'VERY_LOW', 'CRITICAL')
+    assert (event['direction'], event['reason']) == ('up', 'clock')
+    (log,) = (tmp_path / 'events').glob('risk_events_*.jsonl')
+    assert len(log.read_text().splitlines()) == 1
+
+
+def test_closed_shipments_leave_and_a_reload_rescores_the_rest(rescorer):
+    for shipment_id, days in (('a', 10), ('b', 2), ('c', 12)):
+        track(rescorer, shipment_id, days)
+    rescorer.tick(NOW)
+    assert rescorer.fleet.close(['a']) == 1
+    assert rescorer.tick(NOW)['open'] == 2 and len(rescorer) == 2
+
+    rescorer.predictor.load_model()
+    assert rescorer.tick(NOW) == {'open': 2, 'rescored': {'model': 2}, 'crossings': 0}
+    assert rescorer.fleet.get('c')['risk_level'] == 'VERY_LOW'
+
+
+def test_store_refresh_rescores_only_rows_whose_features_changed(tmp_path):
+    store = FeatureStore(str(tmp_path / 'features.sqlite'), reload_interval=3600.0)
+    store.ingest([{'carrier_scac': carrier, 'on_time': 1, 'dd_occurred': 0} for carrier in ('MAEU', 'MSCU')])
+    rescorer = make_rescorer(tmp_path, feature_store=store)
+    for n in range(10):
+        track(rescorer, f's{n}', 8 + n * 0.37, carrier_scac='MAEU' if n % 2 else 'MSCU')
+    rescorer.tick(NOW)
+
+    store.ingest([{'carrier_scac': 'MAEU', 'on_time': 0, 'dd_occurred': 1}])
+    # An hour later: under the clock resolution, so only the refreshed carrier's rows are re-scored
+    assert rescorer.tick(NOW + 3600) == {'open': 10, 'rescored': {'feature_store': 5}, 'crossings': 0}
+    assert rescorer.tick(NOW + 7200) == {'open': 10, 'rescored': {}, 'crossings': 0}
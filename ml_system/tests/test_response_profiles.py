@@ -0,0 +1,66 @@
+"""
+Response profiles: the fields minimal, standard and full results carry, directly and through the API.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from ml_system.predict import DDPredictor
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+MINIMAL = {'prediction', 'risk_probability', 'risk_level', 'prediction_id'}
+STANDARD = MINIMAL | {'risk_percentage', 'will_have_dd', 'prevention_confidence', 'recommendation'}
+FULL = STANDARD | {'timestamp', 'top_risk_factors', 'model_info'}
+FIELDS = {'minimal': MINIMAL, 'standard': STANDARD, 'full': FULL}
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    return DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                       fallback='rules')
+
+
+def test_each_profile_returns_exactly_its_fields(predictor):
+    probabilities = set()
+    for profile, fields in FIELDS.items():
+        result = predictor.predict(dict(SHIPMENT), use_cache=False, response_profile=profile)
+        assert set(result) == fields
+        (row,) = predictor.predict_batch([dict(SHIPMENT)], use_cache=False, response_profile=profile)
+        assert set(row) == fields
+        probabilities.update((result['risk_probability'], row['risk_probability']))
+    # The profile only changes what is reported, not the score
+    assert len(probabilities) == 1
+
+    full = predictor.predict(dict(SHIPMENT), use_cache=False)
+    assert full['risk_percentage'] == round(full['risk_probability'] * 100, 2)
+    assert full['model_info']['version'] == 'rules' and len(full['top_risk_factors']) <= 5
+    with pytest.raises(ValueError):
+        predictor.predict(dict(SHIPMENT), response_profile='compact')
+
+
+def test_profile_query_parameter_selects_the_result_shape(monkeypatch, predictor):
+    pytest.importorskip('fastapi')
+    from ml_system import api
+
+    monkeypatch.setattr(api, 'predictor', predictor)
+    monkeypatch.setattr(api, 'tenant_models', None)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            single = await client.post('/predict?profile=minimal', json=SHIPMENT)
+            batch = await client.post('/predict/batch?profile=standard', json={'shipments': [SHIPMENT, SHIPMENT]})
+            unknown = await client.post('/predict?profile=compact', json=SHIPMENT)
+            return single, batch, unknown
+
+    single, batch, unknown = asyncio.run(scenario())
+    assert single.status_code == 200 and set(single.json()) == MINIMAL
+    assert batch.status_code == 200
+    assert [set(row) for row in batch.json()['predictions']] == [STANDARD, STANDARD]
+    assert {'model_version', 'timestamp'} <= set(batch.json())
+    assert unknown.status_code == 422
@@ -0,0 +1,105 @@
+"""
+InferenceScheduler: priority order between chunks, class limits and deadline drops.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ml_system.scheduler import DeadlineExceeded, InferenceScheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_interactive_work_runs_between_bulk_chunks():
+    scheduler = InferenceScheduler(workers=1, chunk_size=10)
+    order = []
+
+    def bulk_chunk(start, stop):
+        time.sleep(0.01)
+        order.append(('bulk', start))
+        return list(range(start, stop))
+
+    def interactive(i):
+        order.append(('interactive', i))
+        return i
+
+    async def scenario():
+        bulk = asyncio.ensure_future(scheduler.run_chunked('bulk', bulk_chunk, 50))
+        await asyncio.sleep(0.015)
+        singles = await asyncio.gather(*(scheduler.run('interactive', interactive, i) for i in range(3)))
+        return await bulk, singles
+
+    chunks, singles = run(scenario())
+    assert [row for chunk in chunks for row in chunk] == list(range(50))
+    assert singles == [0, 1, 2]
+    # All three interactive calls ran before the bulk job's last chunk
+    assert order.index(('interactive', 2)) < order.index(('bulk', 40))
+
+
+def test_bulk_concurrency_leaves_a_thread_for_interactive_work():
+    scheduler = InferenceScheduler(workers=2)
+    release = threading.Event()
+
+    def blocked():
+        release.wait(5)
+        return 'bulk'
+
+    async def scenario():
+        bulk = [asyncio.ensure_future(scheduler.run('bulk', blocked)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        bulk_class = scheduler.stats()['classes']['bulk']
+        assert (bulk_class['running'], bulk_class['queued']) == (1, 2)
+        interactive = await asyncio.wait_for(scheduler.run('interactive', lambda: 'ui'), 1.0)
+        release.set()
+        return interactive, await asyncio.gather(*bulk)
+
+    assert run(scenario()) == ('ui', ['bulk'] * 3)
+
+
+def test_work_queued_past_its_deadline_is_dropped():
+    scheduler = InferenceScheduler(workers=1, max_wait={'interactive': 0.05})
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        busy = asyncio.ensure_future(scheduler.run('interactive', release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run('interactive', ran.append, 1)
+        release.set()
+        await busy
+
+    run(scenario())
+    assert ran == []
+
+
+def test_single_worker_keeps_interactive_work_off_the_bulk_thread():
+    scheduler = InferenceScheduler(workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        bulk = [asyncio.ensure_future(scheduler.run('bulk', release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        bulk_class = scheduler.stats()['classes']['bulk']
+        assert (bulk_class['running'], bulk_class['queued']) == (1, 1)
+        interactive = await asyncio.wait_for(scheduler.run('interactive', lambda: 'ui'), 1.0)
+        release.set()
+        await asyncio.gather(*bulk)
+        return interactive
+
+    assert run(scenario()) == 'ui'
+    assert scheduler.stats()['threads'] == 2
+
+
+def test_priority_defaults_and_validation():
+    scheduler = InferenceScheduler(chunk_size=100)
+    assert scheduler.priority_for(None, 1) == 'interactive'
+    assert scheduler.priority_for(None, 101) == 'bulk'
+    assert scheduler.priority_for('BULK', 1) == 'bulk'
+    with pytest.raises(ValueError):
+        scheduler.priority_for('urgent', 1)
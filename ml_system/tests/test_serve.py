@@ -0,0 +1,115 @@
+"""
+Pre-fork supervisor: the shared worker board, reaping and restarts, hung-worker kills and
+argument parsing, exercised with fork, waitpid and kill replaced.
+"""
+
+import signal
+import time
+
+import pytest
+
+from ml_system import serve
+from ml_system.serve import MIN_WORKER_LIFETIME, Supervisor, WorkerBoard, parse_args
+
+
+class FakeProcesses:
+    """Exit statuses handed out by waitpid, and signals sent with kill"""
+
+    def __init__(self, monkeypatch):
+        self.exits = []
+        self.signals = []
+        self.sleeps = []
+        monkeypatch.setattr(serve.os, 'waitpid', self.waitpid)
+        monkeypatch.setattr(serve.os, 'kill', lambda pid, signum: self.signals.append((pid, signum)))
+        monkeypatch.setattr(serve.time, 'sleep', self.sleeps.append)
+
+    def waitpid(self, pid, options):
+        return self.exits.pop(0) if self.exits else (0, 0)
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    supervisor = Supervisor(workers=2, timeout=30.0)
+    spawned = []
+    next_pid = iter(range(200, 300))
+
+    def spawn(index, restarted=False):
+        # Bookkeeping of Supervisor._spawn without the fork
+        pid = next(next_pid)
+        supervisor._pids[pid] = index
+        supervisor.board.slot(index).started(pid, restarted)
+        spawned.append((index, restarted))
+
+    monkeypatch.setattr(supervisor, '_spawn', spawn)
+    for index in range(2):
+        supervisor._spawn(index)
+    spawned.clear()
+    supervisor.spawned = spawned
+    return supervisor
+
+
+def exit_status(code):
+    return code << 8
+
+
+def test_worker_board_reports_each_slot():
+    board = WorkerBoard(2)
+    slot = board.slot(1)
+    slot.started(4242, restarted=False)
+    slot.record_request()
+    slot.record_request()
+    assert board.snapshot()[1]['heartbeat_age_seconds'] is None
+    slot.beat()
+    slot.started(4243, restarted=True)
+    slot.beat()
+    slot.record_request()
+
+    worker = board.snapshot()[1]
+    assert (worker['index'], worker['pid'], worker['requests'], worker['restarts']) == (1, 4243, 1, 1)
+    assert 0 <= worker['heartbeat_age_seconds'] < 1 and worker['uptime_seconds'] < 1
+    assert board.snapshot()[0]['pid'] == 0
+
+
+def test_reaped_workers_are_respawned_with_a_delay_only_after_fast_crashes(monkeypatch, supervisor):
+    processes = FakeProcesses(monkeypatch)
+    supervisor.board._set(0, 'started', time.time() - 100)
+    processes.exits = [(200, exit_status(0)), (201, exit_status(1))]
+    supervisor._reap()
+
+    assert supervisor.spawned == [(0, True), (1, True)]
+    # Only worker 1 died within MIN_WORKER_LIFETIME of starting
+    assert processes.sleeps == [MIN_WORKER_LIFETIME]
+    assert sorted(supervisor._pids.values()) == [0, 1] and 200 not in supervisor._pids
+    assert supervisor.board.snapshot()[0]['restarts'] == 1
+
+    # Unknown children are skipped, and nothing is respawned while stopping
+    supervisor._stopping = True
+    processes.exits = [(999, exit_status(0)), (202, exit_status(1))]
+    supervisor._reap()
+    assert len(supervisor.spawned) == 2 and 202 not in supervisor._pids
+
+
+def test_workers_without_recent_heartbeats_are_killed(monkeypatch, supervisor):
+    processes = FakeProcesses(monkeypatch)
+    now = time.time()
+    # Worker 0 beat long ago; worker 1 never beat but started recently
+    supervisor.board.slot(0).beat()
+    supervisor.board._set(0, 'heartbeat', now - 60)
+    supervisor.board._set(1, 'started', now - 5)
+    supervisor._kill_hung_workers()
+    assert processes.signals == [(200, signal.SIGKILL)]
+
+    # A worker that never beat is judged from its start time
+    supervisor.board._set(1, 'started', now - 60)
+    supervisor.board._set(0, 'heartbeat', now)
+    processes.signals.clear()
+    supervisor._kill_hung_workers()
+    assert processes.signals == [(201, signal.SIGKILL)]
+
+
+def test_parse_args():
+    args = parse_args(['--workers', '3', '--port', '9000', '--max-requests', '500', '--timeout', '5'])
+    assert (args.workers, args.port, args.max_requests, args.timeout) == (3, 9000, 500, 5.0)
+    defaults = parse_args([])
+    assert defaults.workers >= 1 and defaults.host == '0.0.0.0' and defaults.max_requests == 0
+    assert (defaults.backlog, defaults.graceful_timeout) == (2048, 30.0)
@@ -0,0 +1,64 @@
+"""
+RiskStreamHub: tailing the re-scorer's event log and fanning events out to subscriptions.
+"""
+
+import asyncio
+
+import pytest
+
+from ml_system.rescoring import RiskEventLog
+from ml_system.streaming import RiskStreamHub, StreamFull
+
+
+def crossing(shipment_id, previous, level, previous_probability=0.3, probability=0.5):
+    return {'event': 'risk_band_crossing', 'shipment_id': shipment_id, 'previous_level': previous,
+            'risk_level': level, 'previous_probability': previous_probability, 'risk_probability': probability}
+
+
+def test_subscribers_get_only_new_events_for_their_shipments(tmp_path):
+    log = RiskEventLog(str(tmp_path))
+    log.write([crossing('A', 'LOW', 'MODERATE')])  # before anyone subscribed
+    hub = RiskStreamHub(str(tmp_path), poll_interval=0.01)
+
+    async def scenario():
+        a = hub.subscribe(['A'])
+        both = hub.subscribe(['A', 'B'])
+        log.write([crossing('B', 'LOW', 'HIGH'), crossing('C', 'LOW', 'HIGH')])
+        return await a.next(0.05), await both.next(1.0)
+
+    only_a, both = asyncio.run(scenario())
+    assert only_a == []
+    assert [event['shipment_id'] for event in both] == ['B']
+
+
+def test_unread_updates_are_coalesced_per_shipment(tmp_path):
+    hub = RiskStreamHub(str(tmp_path))
+
+    async def scenario():
+        subscription = hub.subscribe(['A', 'B'])
+        hub.publish([crossing('A', 'LOW', 'MODERATE', 0.3, 0.5), crossing('A', 'MODERATE', 'HIGH', 0.5, 0.7),
+                     crossing('B', 'LOW', 'MODERATE'), crossing('B', 'MODERATE', 'LOW')])
+        events = await subscription.next(0.01)
+        hub.unsubscribe(subscription)
+        return events
+
+    events = asyncio.run(scenario())
+    assert len(events) == 1
+    assert (events[0]['previous_level'], events[0]['risk_level'], events[0]['previous_probability']) == \
+        ('LOW', 'HIGH', 0.3)
+    assert hub.stats()['subscribers'] == 0 and hub.stats()['shipments'] == 0
+
+
+def test_subscription_limits(tmp_path):
+    hub = RiskStreamHub(str(tmp_path), max_subscribers=1, max_shipments=2)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            hub.subscribe([])
+        with pytest.raises(ValueError):
+            hub.subscribe(['A', 'B', 'C'])
+        hub.subscribe(['A'])
+        with pytest.raises(StreamFull):
+            hub.subscribe(['B'])
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+"""
+Tenant models: routing to a tenant's own model and a resident LRU that stays within max_bytes.
+"""
+
+import asyncio
+import os
+import pickle
+
+import pytest
+
+from ml_system.fallback import RuleBasedScorer
+from ml_system.features import FEATURE_NAMES
+from ml_system.predict import DDPredictor
+from ml_system.tenancy import TenantModels
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    for tenant in ('acme', 'globex', 'initech'):
+        path = tmp_path / 'models' / 'tenants' / tenant / 'dnd_model.pkl'
+        path.parent.mkdir(parents=True)
+        path.write_bytes(pickle.dumps({'model': RuleBasedScorer(FEATURE_NAMES), 'feature_names': list(FEATURE_NAMES),
+                                       'scaler': None, 'model_version': f'{tenant}-1'}))
+    return tmp_path / 'models'
+
+
+def tenant_models(models_dir, tmp_path, models_fit: float = 10.0) -> TenantModels:
+    default = DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                          fallback='rules')
+    size = os.path.getsize(models_dir / 'tenants' / 'acme' / 'dnd_model.pkl')
+    return TenantModels(default, models_dir=str(models_dir), max_bytes=int(size * models_fit))
+
+
+def test_tenants_get_their_own_model_and_others_the_default(models_dir, tmp_path):
+    models = tenant_models(models_dir, tmp_path)
+    assert models.get('acme').model_version == 'acme-1'
+    assert asyncio.run(models.acquire('globex')).model_version == 'globex-1'
+    for tenant in (None, 'unknown', '../acme'):
+        assert models.get(tenant) is models.default
+    assert models.label('acme') == 'acme' and models.label('unknown') == 'default'
+
+
+def test_least_recently_used_tenant_is_evicted_within_max_bytes(models_dir, tmp_path):
+    models = tenant_models(models_dir, tmp_path, models_fit=2.5)
+    acme = models.get('acme')
+    models.get('globex')
+    assert models.get('acme') is acme  # now most recently used
+    models.get('initech')
+
+    stats = models.stats()
+    assert [entry['tenant'] for entry in stats['resident']] == ['initech', 'acme']
+    assert stats['bytes'] <= stats['max_bytes']
+    assert stats['bytes'] == sum(entry['bytes'] for entry in stats['resident'])
+    # An evicted tenant is loaded again on its next request
+    assert models.get('globex').model_version == 'globex-1'
+    assert 'acme' not in [entry['tenant'] for entry in models.stats()['resident']]
+
+
+def test_reload_drops_tenants_whose_model_was_removed(models_dir, tmp_path):
+    models = tenant_models(models_dir, tmp_path)
+    models.preload(['acme', 'globex'], wait=True)
+    os.remove(models_dir / 'tenants' / 'globex' / 'dnd_model.pkl')
+    models.reload(wait=True)
+    stats = models.stats()
+    assert [entry['tenant'] for entry in stats['resident']] == ['acme']
+    assert stats['bytes'] == stats['resident'][0]['bytes']
@@ -0,0 +1,47 @@
+"""
+msgpack batch transport through the API.
+"""
+
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from ml_system import transport
+from ml_system.features import FEATURE_NAMES
+
+
+def post_msgpack(body: bytes) -> httpx.Response:
+    from ml_system.api import app
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            return await client.post('/predict/batch/msgpack', content=body,
+                                     headers={'Content-Type': transport.CONTENT_TYPE})
+
+    return asyncio.run(scenario())
+
+
+def test_empty_batch_gets_an_empty_response():
+    pytest.importorskip('fastapi')
+    if not transport.msgpack_available():
+        pytest.skip('msgpack not installed')
+    response = post_msgpack(transport.encode_request(np.empty((0, len(FEATURE_NAMES))), FEATURE_NAMES, ids=[]))
+    assert response.status_code == 200
+    message = transport.decode_response(response.content)
+    assert message['n'] == 0 and message['prediction_id'] == [] and len(message['risk_probability']) == 0
+
+
+def test_batch_scores_every_row():
+    pytest.importorskip('fastapi')
+    if not transport.msgpack_available():
+        pytest.skip('msgpack not installed')
+    matrix = np.tile([21.0, 0.7, 0.5, 60000.0, 6.0, 0.8], (3, 1))
+    features = ['transit_time_days', 'documentation_completeness', 'customs_complexity_score',
+                'container_value_usd', 'days_until_eta', 'seasonal_risk_factor']
+    response = post_msgpack(transport.encode_request(matrix, features, ids=['a', 'b', 'c']))
+    assert response.status_code == 200
+    message = transport.decode_response(response.content)
+    assert message['ids'] == ['a', 'b', 'c'] and len(set(message['prediction_id'])) == 3
+    assert np.all((message['risk_probability'] >= 0) & (message['risk_probability'] <= 1))
@@ -0,0 +1,81 @@
+"""
+Per-tree spread: one vectorized pass matches the forest, and ?interval= on the predict API.
+"""
+
+import asyncio
+import pickle
+
+import httpx
+import numpy as np
+import pytest
+
+from ml_system.features import FEATURE_NAMES
+from ml_system.predict import DDPredictor
+from ml_system.uncertainty import tree_forest, tree_spread
+
+SHIPMENT = {
+    'transit_time_days': 21.0, 'documentation_completeness': 0.7, 'customs_complexity_score': 0.5,
+    'container_value_usd': 60000.0, 'days_until_eta': 6.0, 'seasonal_risk_factor': 0.8
+}
+
+
+@pytest.fixture(scope='module')
+def forest():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(600, len(FEATURE_NAMES)))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.8, size=600) > 0).astype(int)
+    return RandomForestClassifier(n_estimators=25, max_depth=6, random_state=0).fit(X, y), X
+
+
+def test_tree_spread_matches_the_forest(forest):
+    model, X = forest
+    per_tree = tree_forest(model).tree_probabilities(X[:50])
+    expected = np.stack([tree.predict_proba(X[:50].astype(np.float32))[:, 1] for tree in model.estimators_], axis=1)
+    assert np.allclose(per_tree, expected, atol=1e-6)
+
+    spread = tree_spread(per_tree, 0.8)
+    assert np.allclose(spread['mean'], model.predict_proba(X[:50])[:, 1], atol=1e-6)
+    assert np.all(spread['lower'] <= spread['upper'])
+    assert np.allclose(spread['lower'], np.quantile(expected, 0.1, axis=1), atol=1e-6)
+    assert spread['trees'] == 25
+
+
+def test_predictor_reports_spread_only_when_asked(forest, tmp_path):
+    model, _ = forest
+    model_path = tmp_path / 'dnd_model.pkl'
+    model_path.write_bytes(pickle.dumps({'model': model, 'feature_names': list(FEATURE_NAMES), 'scaler': None}))
+    predictor = DDPredictor(model_path=str(model_path), history_dir=str(tmp_path / 'history'))
+
+    plain = predictor.predict(dict(SHIPMENT), response_profile='minimal')
+    result = predictor.predict(dict(SHIPMENT), response_profile='minimal', interval=0.9)
+    assert 'uncertainty' not in plain
+    assert result['risk_probability'] == pytest.approx(plain['risk_probability'], abs=1e-6)
+    uncertainty = result['uncertainty']
+    assert uncertainty['coverage'] == 0.9 and uncertainty['trees'] == 25
+    assert uncertainty['interval'][0] <= uncertainty['interval'][1]
+    assert 0.5 <= uncertainty['tree_agreement'] <= 1.0
+
+    batch = predictor.predict_batch([dict(SHIPMENT)] * 3, response_profile='minimal', interval=0.9)
+    assert [row['uncertainty'] for row in batch] == [uncertainty] * 3
+
+    rules = DDPredictor(model_path=str(tmp_path / 'missing.pkl'), history_dir=str(tmp_path / 'history'),
+                        fallback='rules')
+    assert rules.predict(dict(SHIPMENT), interval=0.8)['uncertainty'] is None
+
+
+def test_api_interval_parameter():
+    pytest.importorskip('fastapi')
+    from ml_system.api import app
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            ok = await client.post('/predict', params={'profile': 'minimal', 'interval': 0.8}, json=SHIPMENT)
+            bad = await client.post('/predict', params={'interval': 1.5}, json=SHIPMENT)
+            return ok, bad
+
+    ok, bad = asyncio.run(scenario())
+    assert ok.status_code == 200 and ok.json()['uncertainty']['coverage'] == 0.8
+    assert bad.status_code == 422
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Binary Batch Transport
+Compact msgpack messages for service-to-service scoring: features travel as one
+row-major float64 matrix and results come back as packed arrays, so neither
+side builds per-shipment dicts or pydantic models.
+
+Request  {'v': 1, 'features': [names], 'matrix': <float64 LE, n x len(features)>, 'ids': [...]?,
+          'categorical': {'carrier_scac': [str|None x n], ...}?}
+Response {'v': 1, 'n': n, 'model_version': str, 'timestamp': iso,
+          'prediction': <uint8 x n>, 'risk_probability': <float32 LE x n>,
+          'risk_level': <uint8 x n>, 'risk_levels': [names],
+          'prediction_id': <16 bytes x n>, 'ids': [...]?}
+
+'ids' are the caller's shipment ids; they are stored with each prediction in
+the history so outcomes can be reported against either id. The raw
+'categorical' identifiers are stored too, so retraining on outcomes can
+re-encode them.
+
+Base features missing from 'features' take the predictor's defaults; derived
+features are computed with the shared formulas. 'categorical' carries raw
+carrier/port/lane identifiers, used by a CategoricalEncoder and the feature
+store. msgpack is optional; the API answers 501 when it is not installed.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import DEFAULT_FEATURE_VALUES, DERIVED_FEATURES, derive_features
+
+CONTENT_TYPE = 'application/x-msgpack'
+PROTOCOL_VERSION = 1
+
+
+class TransportError(ValueError):
+    """Malformed or unsupported binary payload"""
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def msgpack_available() -> bool:
+    return _msgpack() is not None
+
+
+def _require_msgpack():
+    msgpack = _msgpack()
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed (pip install msgpack)")
+    return msgpack
+
+
+def encode_request(matrix: np.ndarray, features: Sequence[str], ids: Optional[List[Any]] = None,
+                   categorical: Optional[Dict[str, List[Optional[str]]]] = None) -> bytes:
+    """Client side: pack an n x len(features) matrix"""
+    matrix = np.ascontiguousarray(matrix, dtype='<f8')
+    if matrix.ndim != 2 or matrix.shape[1] != len(features):
+        raise TransportError(f"matrix shape {matrix.shape} does not match {len(features)} features")
+    message = {'v': PROTOCOL_VERSION, 'features': list(features), 'matrix': matrix.tobytes()}
+    if ids is not None:
+        message['ids'] = list(ids)
+    if categorical:
+        message['categorical'] = {name: list(values) for name, values in categorical.items()}
+    return _require_msgpack().packb(message, use_bin_type=True)
+
+
+def decode_request(payload: bytes, feature_names: Sequence[str], defaults: Optional[Dict[str, float]] = None,
+                   encoder=None, feature_store=None
+                   ) -> Tuple[np.ndarray, Optional[List[Any]], Optional[Dict[str, List[Optional[str]]]]]:
+    """Server side: unpack a request into a matrix in feature_names order, the ids
+    and the raw 'categorical' identifiers (None when absent).
+
+    defaults fills missing base features (DEFAULT_FEATURE_VALUES if None);
+    encoder, a CategoricalEncoder, turns 'categorical' identifiers into encoded
+    columns, and feature_store fills features the caller did not send from them.
+    """
+    defaults = DEFAULT_FEATURE_VALUES if defaults is None else defaults
+    msgpack = _require_msgpack()
+    try:
+        message = msgpack.unpackb(payload, raw=False)
+    except Exception as e:
+        raise TransportError(f"invalid msgpack payload: {e}")
+    if not isinstance(message, dict) or message.get('v') != PROTOCOL_VERSION:
+        raise TransportError(f"expected a protocol v{PROTOCOL_VERSION} message")
+
+    features = message.get('features')
+    blob = message.get('matrix')
+    if not isinstance(features, list) or not isinstance(blob, bytes) or not features:
+        raise TransportError("'features' (list) and 'matrix' (bin) are required")
+    if len(blob) % (8 * len(features)):
+        raise TransportError(f"matrix is not a whole number of {len(features)}-column float64 rows")
+    matrix = np.frombuffer(blob, dtype='<f8').reshape(-1, len(features))
+    ids = message.get('ids')
+    if ids is not None and len(ids) != len(matrix):
+        raise TransportError(f"{len(ids)} ids for {len(matrix)} rows")
+
+    n = len(matrix)
+    columns: Dict[str, Any] = {name: matrix[:, i] for i, name in enumerate(features)}
+    categorical = message.get('categorical')
+    if categorical is not None:
+        if not isinstance(categorical, dict) or any(len(v) != n for v in categorical.values()):
+            raise TransportError(f"'categorical' must map names to {n}-element lists")
+        if encoder is not None:
+            encoded = encoder.transform(categorical)
+            for j, name in enumerate(encoder.feature_names):
+                columns.setdefault(name, encoded[:, j])
+        if feature_store is not None:
+            for name, values in feature_store.lookup_columns(categorical, n).items():
+                if name not in columns:
+                    columns[name] = np.where(np.isnan(values), defaults.get(name, 0.0), values)
+    # Base features first, so derived ones are computed from what the caller sent
+    for name in feature_names:
+        if name not in columns and name not in DERIVED_FEATURES:
+            columns[name] = np.full(n, defaults.get(name, 0.0))
+    derive_features(columns)
+    if not n:
+        return np.empty((0, len(feature_names))), ids, categorical
+    return np.column_stack([columns[name] for name in feature_names]), ids, categorical
+
+
+def encode_response(predictions: np.ndarray, risk_probabilities: np.ndarray, levels: np.ndarray,
+                    risk_levels: Sequence[str], model_version: str, timestamp: str,
+                    prediction_ids: Sequence[str], ids: Optional[List[Any]] = None) -> bytes:
+    message = {
+        'v': PROTOCOL_VERSION,
+        'n': len(risk_probabilities),
+        'model_version': model_version,
+        'timestamp': timestamp,
+        'prediction': np.asarray(predictions, dtype=np.uint8).tobytes(),
+        'risk_probability': np.asarray(risk_probabilities, dtype='<f4').tobytes(),
+        'risk_level': np.asarray(levels, dtype=np.uint8).tobytes(),
+        'risk_levels': list(risk_levels),
+        'prediction_id': bytes.fromhex(''.join(prediction_ids))
+    }
+    if ids is not None:
+        message['ids'] = ids
+    return _require_msgpack().packb(message, use_bin_type=True)
+
+
+def decode_response(payload: bytes) -> Dict[str, Any]:
+    """Client side: unpack a response into numpy arrays"""
+    message = _require_msgpack().unpackb(payload, raw=False)
+    message['prediction'] = np.frombuffer(message['prediction'], dtype=np.uint8)
+    message['risk_probability'] = np.frombuffer(message['risk_probability'], dtype='<f4')
+    message['risk_level'] = np.frombuffer(message['risk_level'], dtype=np.uint8)
+    blob = message['prediction_id']
+    message['prediction_id'] = [blob[i:i + 16].hex() for i in range(0, len(blob), 16)]
+    return message
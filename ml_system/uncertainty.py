@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+ROOTUIP Forest Uncertainty
+How far the trees of the forest agree on a shipment's risk, so borderline
+cases can be told apart from confident ones with the same risk_probability.
+
+Every tree's probability comes from one vectorized walk over all trees
+(CompactForest.tree_probabilities) and their mean is the forest's
+risk_probability, so asking for the spread replaces the usual predict_proba
+pass instead of adding a second one. A fitted sklearn forest is flattened into
+a CompactForest once per loaded model.
+
+    POST /predict?interval=0.8
+
+adds, next to risk_probability:
+
+    "uncertainty": {"std": 0.071, "interval": [0.41, 0.63], "coverage": 0.8,
+                    "tree_agreement": 0.71, "trees": 100}
+
+interval holds the 10th and 90th percentile of the per-tree probabilities and
+tree_agreement the share of trees on the same side of 0.5 as the forest.
+Models without trees (the 'rules' fallback) report "uncertainty": null.
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .compaction import CompactForest
+
+DEFAULT_COVERAGE = 0.8
+
+
+def tree_forest(model) -> Optional[CompactForest]:
+    """model as a CompactForest (flattening a fitted sklearn forest); None for models without trees"""
+    if isinstance(model, CompactForest):
+        return model
+    if not type(model).__module__.startswith('sklearn.'):
+        return None
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)) and len(model.classes_) == 2:
+        return CompactForest.from_sklearn(model)
+    return None
+
+
+def check_coverage(coverage: float) -> float:
+    coverage = float(coverage)
+    if not 0.0 < coverage < 1.0:
+        raise ValueError(f"Interval coverage must be between 0 and 1, got {coverage}")
+    return coverage
+
+
+def tree_spread(tree_probabilities: np.ndarray, coverage: float = DEFAULT_COVERAGE) -> Dict[str, np.ndarray]:
+    """Per-row mean, std, central coverage interval and tree agreement of a (rows, trees) matrix"""
+    mean = tree_probabilities.mean(axis=1, dtype=np.float64)
+    tail = (1.0 - coverage) / 2
+    lower, upper = np.quantile(tree_probabilities, [tail, 1.0 - tail], axis=1)
+    agreement = ((tree_probabilities > 0.5) == (mean > 0.5)[:, None]).mean(axis=1)
+    return {
+        'mean': mean,
+        'std': tree_probabilities.std(axis=1, dtype=np.float64),
+        'lower': lower.astype(np.float64),
+        'upper': upper.astype(np.float64),
+        'agreement': agreement,
+        'coverage': coverage,
+        'trees': tree_probabilities.shape[1]
+    }
+
+
+def spread_fields(spread: Optional[Dict[str, Any]], i: int) -> Optional[Dict[str, Any]]:
+    """The 'uncertainty' object of row i"""
+    if spread is None:
+        return None
+    return {
+        'std': float(spread['std'][i]),
+        'interval': [float(spread['lower'][i]), float(spread['upper'][i])],
+        'coverage': spread['coverage'],
+        'tree_agreement': float(spread['agreement'][i]),
+        'trees': spread['trees']
+    }
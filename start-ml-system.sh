@@ -26,8 +26,8 @@ if lsof -i :8000 > /dev/null 2>&1; then
     echo "✓ Python prediction API already running on port 8000"
 else
     echo "Starting Python prediction API on port 8000..."
-    cd /home/iii/ROOTUIP/ml-system
-    nohup python3 -m uvicorn predict:app --host 0.0.0.0 --port 8000 > /home/iii/ROOTUIP/logs/python-api.log 2>&1 &
+    cd /home/iii/ROOTUIP
+    nohup python3 -m ml_system.serve --workers "${ML_API_WORKERS:-$(nproc)}" --host 0.0.0.0 --port 8000 > /home/iii/ROOTUIP/logs/python-api.log 2>&1 &
     sleep 3
     if lsof -i :8000 > /dev/null 2>&1; then
         echo "✓ Python prediction API started successfully"
@@ -61,7 +61,7 @@ fi
 echo ""
 echo "Running ML Services:"
 echo "==================="
-ps aux | grep -E "ml-processing-server|uvicorn" | grep -v grep
+ps aux | grep -E "ml-processing-server|uvicorn|ml_system.serve" | grep -v grep
 
 echo ""
 echo "ML System Status:"